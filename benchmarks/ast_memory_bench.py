@@ -0,0 +1,23 @@
+"""Measures the memory and construction time of the AST of a large generated module.
+
+Run from the repository root: python benchmarks/ast_memory_bench.py
+"""
+import sys
+import tracemalloc
+from common import best_time, generate_module
+from compiler import ast
+from compiler.parser import parse
+from compiler.tokenizer import TokenStream
+
+
+if __name__ == '__main__':
+    tokens = TokenStream(generate_module(2000))
+    tracemalloc.start()
+    module = parse(tokens, parallel_threshold=sys.maxsize)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    n_nodes = sum(1 for _ in ast.walk(module))
+    parse_time = best_time(lambda: parse(tokens, parallel_threshold=sys.maxsize))
+    print(f'{len(tokens)} tokens, {n_nodes} nodes')
+    print(f'{"retained MB":>12} {"peak MB":>10} {"B/node":>8} {"parse s":>8}')
+    print(f'{retained / 1e6:>12.1f} {peak / 1e6:>10.1f} {retained / n_nodes:>8.1f} {parse_time:>8.3f}')
@@ -0,0 +1,71 @@
+"""Compares running a program over many inputs in one batch with running it once per input.
+
+Run from the repository root: python benchmarks/batch_interpreter_bench.py
+Needs NumPy. The per-process column needs 'as' and 'ld'; it is skipped when those are missing.
+"""
+import contextlib
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from common import best_time
+from compiler import ast, asm_generator, batch_interpreter, closure_compiler, ir_generator, assembler, parser, type_checker
+from compiler.tokenizer import TokenStream
+
+source = '''
+fun collatz(n: Int): Int {
+    var steps = 0;
+    while n != 1 do {
+        if n % 2 == 0 then n = n / 2 else n = 3 * n + 1;
+        steps = steps + 1;
+    }
+    return steps;
+}
+var n = read_int();
+var longest = 0;
+var i = 1;
+while i <= n do {
+    var s = collatz(i);
+    if s > longest then longest = s;
+    i = i + 1;
+}
+longest
+'''
+
+
+def run_each(module: ast.Module, inputs: list[list[int]]) -> list[str]:
+    outputs = []
+    for numbers in inputs:
+        out = io.StringIO()
+        sys.stdin = io.StringIO(''.join(f'{n}\n' for n in numbers))
+        with contextlib.redirect_stdout(out):
+            closure_compiler.compile_module(module)()
+        outputs.append(out.getvalue())
+    sys.stdin = sys.__stdin__
+    return outputs
+
+
+def run_processes(executable: str, inputs: list[list[int]]) -> list[str]:
+    return [subprocess.run([executable], input=''.join(f'{n}\n' for n in numbers), capture_output=True, text=True).stdout
+            for numbers in inputs]
+
+
+if __name__ == '__main__':
+    module = parser.parse(TokenStream(source))
+    type_checker.typecheck_module(module)
+    native = shutil.which('as') is not None and shutil.which('ld') is not None
+    with tempfile.TemporaryDirectory() as workdir:
+        executable = os.path.join(workdir, 'program')
+        if native:
+            assembler.assemble(asm_generator.generate_asm(ir_generator.generate_ir(module)), executable)
+        print(f'{"inputs":>7} {"batch s":>8} {"closures s":>11} {"processes s":>12}')
+        for lanes in [10, 100, 1000]:
+            inputs = [[30 + i % 50] for i in range(lanes)]
+            expected = run_each(module, inputs)
+            assert batch_interpreter.run_batch(module, inputs) == expected
+            batch = best_time(lambda: batch_interpreter.run_batch(module, inputs), repeat=1)
+            each = best_time(lambda: run_each(module, inputs), repeat=1)
+            processes = best_time(lambda: run_processes(executable, inputs), repeat=1) if native else float('nan')
+            print(f'{lanes:>7} {batch:>8.3f} {each:>11.3f} {processes:>12.3f}')
@@ -0,0 +1,77 @@
+import gc
+import math
+import sys
+import time
+from typing import Callable
+
+sys.path.append('src')
+
+
+def best_time(f: Callable[[], object], repeat: int = 3) -> float:
+    """Returns the fastest of `repeat` runs of f, in seconds.
+
+    The garbage collector is disabled while timing, like timeit does.
+    """
+    best = math.inf
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            f()
+            best = min(best, time.perf_counter() - start)
+        finally:
+            gc.enable()
+    return best
+
+
+def scaling_exponent(sizes: list[int], times: list[float]) -> float:
+    """Least squares slope of log(time) against log(size). 1.0 means linear, 2.0 quadratic."""
+    xs = [math.log(n) for n in sizes]
+    ys = [math.log(t) for t in times]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    num = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    den = sum((x - mean_x) ** 2 for x in xs)
+    return num / den
+
+
+def report_scaling(name: str, sizes: list[int], run: Callable[[int], Callable[[], object]], max_exponent: float = 1.25) -> bool:
+    """Times run(n)() for every size and prints a table and the fitted scaling exponent.
+
+    Returns whether the exponent stays below max_exponent.
+    """
+    times: list[float] = []
+    print(f'{name}')
+    print(f'{"size":>10} {"seconds":>10} {"us/unit":>10}')
+    for n in sizes:
+        t = best_time(run(n))
+        times.append(t)
+        print(f'{n:>10} {t:>10.4f} {t / n * 1e6:>10.3f}')
+    exponent = scaling_exponent(sizes, times)
+    ok = exponent < max_exponent
+    print(f'scaling exponent: {exponent:.2f} ({"ok" if ok else "superlinear"})')
+    print()
+    return ok
+
+
+def generate_function(i: int, body_lines: int = 8) -> str:
+    """A small function in the style of our generated programs, roughly body_lines + 4 lines long."""
+    lines = [f'fun f{i}(a: Int, b: Int): Int {{', '    var acc = a;']
+    for j in range(body_lines):
+        if j % 4 == 0:
+            lines.append(f'    if acc > {j} then {{ acc = acc - b * {j + 1}; }} else {{ acc = acc + {j}; }} # branch {j}')
+        elif j % 4 == 1:
+            lines.append(f'    while acc < {j * 10} and not (acc == b) do {{ acc = acc + 1; }}')
+        else:
+            lines.append(f'    acc = acc * {j} % 1000 + b / {j} - (a + {j});')
+    lines.append('    return acc;')
+    lines.append('}')
+    return '\n'.join(lines)
+
+
+def generate_module(n_functions: int, body_lines: int = 8) -> str:
+    """A module of n_functions functions followed by a main expression calling each of them once."""
+    funs = [generate_function(i, body_lines) for i in range(n_functions)]
+    calls = [f'    print_int(f{i}({i}, {i + 1}));' for i in range(n_functions)]
+    return '\n'.join(funs + ['{', *calls, '}'])
@@ -0,0 +1,76 @@
+"""Checks that building CFGs and solving dataflow problems, and the passes built on them, scale
+linearly-ish in the size of a function, up to functions of about 100k IR instructions.
+
+Run from the repository root: python benchmarks/dataflow_bench.py
+"""
+import sys
+from typing import Callable
+from common import generate_function, report_scaling
+from collections import Counter
+from compiler import cfg, copy_propagation, dataflow, gvn, ir, ir_generator, parser, sccp, ssa, type_checker
+from compiler.tokenizer import TokenStream
+
+# IR instructions per body line of generate_function, roughly
+INSTRUCTIONS_PER_LINE = 14.5
+
+
+def function_ir(n_instructions: int) -> list[ir.Instruction]:
+    body_lines = int(n_instructions / INSTRUCTIONS_PER_LINE)
+    module = parser.parse(TokenStream(generate_function(0, body_lines) + '\n1'))
+    type_checker.typecheck_module(module)
+    return ir_generator.generate_ir(module)['f0']
+
+
+def run_cfg(n_instructions: int) -> Callable[[], object]:
+    instructions = function_ir(n_instructions)
+    return lambda: cfg.build_cfg(instructions)
+
+
+def run_liveness(n_instructions: int) -> Callable[[], object]:
+    graph = cfg.build_cfg(function_ir(n_instructions))
+    return lambda: dataflow.liveness(graph)
+
+
+def run_reaching_definitions(n_instructions: int) -> Callable[[], object]:
+    graph = cfg.build_cfg(function_ir(n_instructions))
+    return lambda: dataflow.reaching_definitions(graph)
+
+
+def run_copy_propagation(n_instructions: int) -> Callable[[], object]:
+    instructions = function_ir(n_instructions)
+    return lambda: copy_propagation.propagate_copies(instructions, Counter())
+
+
+def run_coalescing(n_instructions: int) -> Callable[[], object]:
+    instructions = function_ir(n_instructions)
+    return lambda: copy_propagation.coalesce(instructions, Counter())
+
+
+def run_ssa(n_instructions: int) -> Callable[[], object]:
+    instructions = function_ir(n_instructions)
+    return lambda: ssa.from_ssa(ssa.to_ssa(instructions))
+
+
+def run_sccp(n_instructions: int) -> Callable[[], object]:
+    instructions = function_ir(n_instructions)
+    return lambda: sccp.propagate_constants(instructions, Counter())
+
+
+def run_gvn(n_instructions: int) -> Callable[[], object]:
+    instructions = function_ir(n_instructions)
+    return lambda: gvn.number_values(instructions, Counter())
+
+
+if __name__ == '__main__':
+    sizes = [12500, 25000, 50000, 100000]
+    print(f'{len(function_ir(sizes[-1]))} IR instructions in the largest function\n')
+    ok = report_scaling('build CFG (size = IR instructions)', sizes, run_cfg)
+    # Dense bitsets make the solvers' set operations grow with the function, so allow some slack
+    ok &= report_scaling('liveness (size = IR instructions)', sizes, run_liveness, max_exponent=1.6)
+    ok &= report_scaling('reaching definitions (size = IR instructions)', sizes, run_reaching_definitions, max_exponent=1.6)
+    ok &= report_scaling('copy propagation (size = IR instructions)', sizes, run_copy_propagation, max_exponent=1.6)
+    ok &= report_scaling('coalescing (size = IR instructions)', sizes, run_coalescing, max_exponent=1.6)
+    ok &= report_scaling('SSA construction and destruction (size = IR instructions)', sizes, run_ssa, max_exponent=1.6)
+    ok &= report_scaling('SCCP (size = IR instructions)', sizes, run_sccp, max_exponent=1.6)
+    ok &= report_scaling('GVN (size = IR instructions)', sizes, run_gvn, max_exponent=1.6)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,24 @@
+"""Checks that parsing long binary operator chains with mixed precedence scales linearly.
+
+Run from the repository root: python benchmarks/expression_bench.py
+"""
+import sys
+from typing import Callable
+from common import report_scaling
+from compiler.parser import parse
+from compiler.tokenizer import TokenStream
+
+ops = ['+', '*', '-', '/', '<', '%', 'and', '==', 'or']
+
+
+def run(n_operands: int) -> Callable[[], object]:
+    # a0 + a1 * a2 - a3 / a4 < ...: precedence goes up and down all along the chain
+    source = ' '.join(f'{ops[i % len(ops)]} a{i}' for i in range(1, n_operands))
+    tokens = TokenStream(f'a0 {source}')
+    return lambda: parse(tokens)
+
+
+if __name__ == '__main__':
+    sizes = [1250, 2500, 5000, 10000, 20000]
+    ok = report_scaling('parse expression (size = operands)', sizes, run)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,23 @@
+"""Compares reparsing a module from scratch with reparsing it incrementally after a small edit.
+
+Run from the repository root: python benchmarks/incremental_bench.py
+"""
+from common import best_time, generate_module
+from compiler.incremental import Edit, parse_source, reparse
+
+
+if __name__ == '__main__':
+    print(f'{"functions":>10} {"tokens":>8} {"full s":>8} {"keystroke s":>12} {"newline s":>10}')
+    for n in [250, 500, 1000, 2000]:
+        source = generate_module(n)
+        prev = parse_source(source)
+        # Edits in the middle of a function halfway through the module
+        pos = source.index('acc = acc *', source.index(f'fun f{n // 2}('))
+        keystroke = Edit(pos + 3, pos + 3, 'x')
+        newline = Edit(pos + 3, pos + 3, '\n')
+        full_time = best_time(lambda: parse_source(source), repeat=1)
+        keystroke_time = best_time(lambda: reparse(prev, keystroke))
+        # A new line moves the locations of everything after it in place, so every run gets a fresh parse
+        fresh = [parse_source(source) for _ in range(3)]
+        newline_time = best_time(lambda: reparse(fresh.pop(), newline))
+        print(f'{n:>10} {len(prev.tokens):>8} {full_time:>8.3f} {keystroke_time:>12.4f} {newline_time:>10.4f}')
@@ -0,0 +1,31 @@
+"""Checks that IR generation scales linearly in the number of functions and in the size of a function.
+
+Run from the repository root: python benchmarks/ir_generator_bench.py
+"""
+import sys
+from typing import Callable
+from common import generate_function, report_scaling
+from compiler import ir_generator, parser, type_checker
+from compiler.tokenizer import TokenStream
+
+
+def run(n_functions: int) -> Callable[[], object]:
+    # Small bodies, so that the time goes to setting up each function's view of the global scope
+    funs = [generate_function(i, body_lines=1) for i in range(n_functions)]
+    module = parser.parse(TokenStream('\n'.join(funs) + '\n1'))
+    type_checker.typecheck_module(module)
+    return lambda: ir_generator.generate_ir(module)
+
+
+def run_temporaries(n_statements: int) -> Callable[[], object]:
+    # One function with a temporary and a label or two per statement
+    body = '\n'.join(f'    if acc > {i} then {{ acc = acc - {i}; }}' for i in range(n_statements))
+    module = parser.parse(TokenStream(f'fun f(acc: Int): Int {{\n{body}\n    return acc;\n}}\n1'))
+    type_checker.typecheck_module(module)
+    return lambda: ir_generator.generate_ir(module)
+
+
+if __name__ == '__main__':
+    ok = report_scaling('generate IR (size = functions)', [625, 1250, 2500, 5000], run)
+    ok &= report_scaling('generate IR (size = statements in one function)', [2500, 5000, 10000, 20000], run_temporaries)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,63 @@
+"""Compares running a program's IR directly with assembling, linking and running its executable.
+
+Run from the repository root: python benchmarks/ir_interpreter_bench.py
+The native columns need 'as' and 'ld'; they are skipped when those are missing.
+"""
+import contextlib
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+from common import best_time
+from compiler import asm_generator, assembler, ir_generator, ir_interpreter, parser, type_checker
+from compiler.tokenizer import TokenStream
+
+programs = {
+    'short': '''
+fun square(x: Int): Int { return x * x; }
+print_int(square(12) + 3)
+''',
+    'recursive calls': '''
+fun fib(n: Int): Int { if n < 2 then return n; return fib(n - 1) + fib(n - 2); }
+fib(20)
+''',
+    'counting loop': '''{
+    var i = 0;
+    var s = 0;
+    while i < 200000 do {
+        var j = i % 7;
+        if j < 3 then { s = s + j * 2; } else { s = s - 1; }
+        i = i + 1;
+    }
+    s
+}''',
+}
+
+
+def interpret(program: dict) -> str:
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        ir_interpreter.run_program(program)
+    return out.getvalue()
+
+
+if __name__ == '__main__':
+    native = shutil.which('as') is not None and shutil.which('ld') is not None
+    print(f'{"program":>16} {"interpret s":>12} {"build s":>8} {"execute s":>10}')
+    for name, source in programs.items():
+        module = parser.parse(TokenStream(source))
+        type_checker.typecheck_module(module)
+        ir = ir_generator.generate_ir(module)
+        interpreted = best_time(lambda: interpret(ir))
+        if not native:
+            print(f'{name:>16} {interpreted:>12.4f} {"-":>8} {"-":>10}')
+            continue
+        asm = asm_generator.generate_asm(ir)
+        with tempfile.TemporaryDirectory() as workdir:
+            executable = os.path.join(workdir, 'program')
+            build = best_time(lambda: assembler.assemble(asm, executable))
+            output = subprocess.run([executable], capture_output=True, text=True).stdout
+            assert output == interpret(ir), (output, interpret(ir))
+            execute = best_time(lambda: subprocess.run([executable], capture_output=True))
+        print(f'{name:>16} {interpreted:>12.4f} {build:>8.4f} {execute:>10.4f}')
@@ -0,0 +1,90 @@
+"""Compares the code generated with and without the IR optimizer's passes.
+
+Run from the repository root: python benchmarks/optimizer_bench.py
+For each program of the corpus it prints the IR instructions, Copy instructions among them, assembly
+lines, executable size and run time of both builds, and then what every pass did over the whole corpus. The size and time
+columns need 'as' and 'ld'; they are skipped when those are missing.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+from common import best_time, generate_module
+from compiler import asm_generator, assembler, ir, ir_generator, ir_optimizer, parser, type_checker
+from compiler.tokenizer import TokenStream
+
+programs = {
+    'constant loop': '''{
+    var size = 1000 * 10000;
+    var step = 2 + 1;
+    var debug = 3 < 2;
+    var i = 0;
+    var s = 0;
+    while i < size do {
+        if debug then print_int(i);
+        s = s + i % step * (step - 1);
+        i = i + 1;
+    }
+    s
+}''',
+    'early returns': '''
+fun clamp(x: Int, low: Int, high: Int): Int {
+    if x < low then { return low; print_int(x); }
+    if x > high then { return high; print_int(x); }
+    return x;
+    0
+}
+var i = 0;
+var s = 0;
+while i < 10000000 do { s = s + clamp(i % 100, 20, 80); i = i + 1; }
+s
+''',
+    'recursive calls': '''
+fun fib(n: Int): Int { var unused = n * 2; if n < 2 then return n; return fib(n - 1) + fib(n - 2); }
+fib(32)
+''',
+    'generated module': generate_module(40),
+}
+
+
+def build(program: dict[str, list[ir.Instruction]], workdir: str, name: str) -> dict[str, float]:
+    asm = asm_generator.generate_asm(program)
+    result: dict[str, float] = {
+        'ir': sum(len(instructions) for instructions in program.values()),
+        'copies': sum(isinstance(insn, ir.Copy) for instructions in program.values() for insn in instructions),
+        'asm': asm.count('\n'),
+    }
+    if native:
+        executable = os.path.join(workdir, name)
+        assembler.assemble(asm, executable)
+        result['bytes'] = os.path.getsize(executable)
+        result['seconds'] = best_time(lambda: subprocess.run([executable], capture_output=True))
+    return result
+
+
+if __name__ == '__main__':
+    native = shutil.which('as') is not None and shutil.which('ld') is not None
+    total = ir_optimizer.PassStats()
+    columns = ['ir', 'copies', 'asm', 'bytes', 'seconds']
+    print(f'{"program":>17} ' + ' '.join(f'{c + " before":>14} {c + " after":>13}' for c in columns))
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, source in programs.items():
+            module = parser.parse(TokenStream(source))
+            type_checker.typecheck_module(module)
+            program = ir_generator.generate_ir(module)
+            before = build(program, workdir, 'before')
+            after = build(ir_optimizer.optimize(program, total), workdir, 'after')
+            if native:
+                outputs = [subprocess.run([os.path.join(workdir, b)], capture_output=True).stdout for b in ('before', 'after')]
+                assert outputs[0] == outputs[1], outputs
+            cells = []
+            for c in columns:
+                if c not in before:
+                    cells.append(f'{"-":>14} {"-":>13}')
+                elif c == 'seconds':
+                    cells.append(f'{before[c]:>14.4f} {after[c]:>13.4f}')
+                else:
+                    cells.append(f'{before[c]:>14.0f} {after[c]:>13.0f}')
+            print(f'{name:>17} ' + ' '.join(cells))
+    print()
+    print(total)
@@ -0,0 +1,19 @@
+"""Compares serial parsing with parsing the function definitions in a process pool.
+
+Run from the repository root: python benchmarks/parallel_parse_bench.py
+"""
+import os
+import sys
+from common import best_time, generate_module
+from compiler.parser import parse
+from compiler.tokenizer import TokenStream
+
+
+if __name__ == '__main__':
+    print(f'{os.cpu_count()} CPUs')
+    print(f'{"functions":>10} {"tokens":>8} {"serial s":>9} {"parallel s":>11} {"speedup":>8}')
+    for n in [1000, 2000, 4000]:
+        tokens = TokenStream(generate_module(n))
+        serial = best_time(lambda: parse(tokens, parallel_threshold=sys.maxsize), repeat=1)
+        parallel = best_time(lambda: parse(tokens, parallel_threshold=0), repeat=1)
+        print(f'{n:>10} {len(tokens):>8} {serial:>9.3f} {parallel:>11.3f} {serial / parallel:>8.2f}')
@@ -0,0 +1,22 @@
+"""Compares serial type checking with checking the function definitions in a process pool.
+
+Run from the repository root: python benchmarks/parallel_typecheck_bench.py
+"""
+import os
+import sys
+from common import best_time, generate_module
+from compiler import type_checker
+from compiler.parser import parse
+from compiler.tokenizer import TokenStream
+
+
+if __name__ == '__main__':
+    print(f'{os.cpu_count()} CPUs')
+    # At least two workers, as typecheck_module doesn't go parallel on one CPU
+    type_checker.parallel_workers = max(os.cpu_count() or 1, 2)
+    print(f'{"functions":>10} {"serial s":>9} {"parallel s":>11} {"speedup":>8}')
+    for n in [1000, 2000, 4000]:
+        module = parse(TokenStream(generate_module(n)))
+        serial = best_time(lambda: type_checker.typecheck_module(module, parallel_threshold=sys.maxsize), repeat=1)
+        parallel = best_time(lambda: type_checker.typecheck_module(module, parallel_threshold=0), repeat=1)
+        print(f'{n:>10} {serial:>9.3f} {parallel:>11.3f} {serial / parallel:>8.2f}')
@@ -0,0 +1,32 @@
+"""Compares loading a serialized typed AST with parsing and type checking the source again.
+
+Run from the repository root: python benchmarks/serializer_bench.py
+"""
+import os
+import sys
+import tempfile
+from common import best_time, generate_module
+from compiler import ast, serializer
+from compiler.parser import parse
+from compiler.tokenizer import TokenStream
+from compiler.type_checker import typecheck_module
+
+
+def front_end(source: str) -> ast.Module:
+    module = parse(TokenStream(source), parallel_threshold=sys.maxsize)
+    typecheck_module(module)
+    return module
+
+
+if __name__ == '__main__':
+    print(f'{"functions":>10} {"file MB":>8} {"front end s":>12} {"write s":>8} {"read s":>8} {"speedup":>8}')
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'module.ast')
+        for n in [250, 1000, 2000]:
+            source = generate_module(n)
+            module = front_end(source)
+            front_time = best_time(lambda: front_end(source), repeat=1)
+            write_time = best_time(lambda: serializer.write_module(module, path))
+            read_time = best_time(lambda: serializer.read_module(path))
+            size = os.path.getsize(path)
+            print(f'{n:>10} {size / 1e6:>8.1f} {front_time:>12.3f} {write_time:>8.3f} {read_time:>8.3f} {front_time / read_time:>8.1f}')
@@ -0,0 +1,36 @@
+"""Compares the memory and time cost of a list of Token dataclasses and a TokenStream.
+
+Run from the repository root: python benchmarks/token_memory_bench.py
+"""
+import tracemalloc
+from typing import Callable
+from common import best_time, generate_module
+from compiler.parser import parse
+from compiler.tokenizer import TokenStream, tokenize
+
+
+def retained_bytes(build: Callable[[], object]) -> tuple[int, int]:
+    """Returns the bytes still allocated after build() returns and the peak during it."""
+    tracemalloc.start()
+    result = build()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return retained, peak
+
+
+if __name__ == '__main__':
+    source = generate_module(2000)
+    n_tokens = len(TokenStream(source))
+    print(f'{len(source.splitlines())} lines, {n_tokens} tokens')
+    print(f'{"layout":<22} {"retained MB":>12} {"peak MB":>10} {"B/token":>8} {"tokenize s":>11} {"parse s":>8}')
+    layouts: list[tuple[str, Callable[[], object]]] = [
+        ('list[Token]', lambda: tokenize(source)),
+        ('TokenStream', lambda: TokenStream(source)),
+    ]
+    for name, build in layouts:
+        retained, peak = retained_bytes(build)
+        tokens = build()
+        build_time = best_time(build)
+        parse_time = best_time(lambda: parse(tokens)) # type: ignore[arg-type]
+        print(f'{name:<22} {retained / 1e6:>12.1f} {peak / 1e6:>10.1f} {retained / n_tokens:>8.1f} {build_time:>11.3f} {parse_time:>8.3f}')
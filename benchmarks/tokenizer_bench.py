@@ -0,0 +1,19 @@
+"""Checks that tokenizing scales linearly with the length of the source code.
+
+Run from the repository root: python benchmarks/tokenizer_bench.py
+"""
+import sys
+from typing import Callable
+from common import generate_module, report_scaling
+from compiler.tokenizer import tokenize
+
+
+def run(n_functions: int) -> Callable[[], object]:
+    source = generate_module(n_functions)
+    return lambda: tokenize(source)
+
+
+if __name__ == '__main__':
+    sizes = [250, 500, 1000, 2000, 4000]  # 4000 functions is roughly 50k lines
+    ok = report_scaling('tokenize (size = functions, 12 lines each)', sizes, run)
+    sys.exit(0 if ok else 1)
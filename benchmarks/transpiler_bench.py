@@ -0,0 +1,48 @@
+"""Compares the tree-walking interpreter with running programs translated to Python.
+
+Run from the repository root: python benchmarks/transpiler_bench.py
+"""
+from common import best_time
+from compiler import interpreter, parser, transpiler, type_checker
+from compiler.tokenizer import TokenStream
+
+# Loop-heavy programs without functions, as the tree-walking interpreter has no support for them
+programs = {
+    'counting loop': '''{
+    var i = 0;
+    var s = 0;
+    while i < 200000 do {
+        var j = i % 7;
+        if j < 3 then { s = s + j * 2; } else { s = s - 1; }
+        i = i + 1;
+    }
+}''',
+    'nested loops': '''{
+    var i = 0;
+    var s = 0;
+    while i < 400 do {
+        var j = 0;
+        while j < 400 do {
+            if (i + j) % 3 == 0 and j > i then { s = s + 1; }
+            j = j + 1;
+        }
+        i = i + 1;
+    }
+}''',
+}
+
+
+if __name__ == '__main__':
+    print(f'{"program":>15} {"tree s":>8} {"compile s":>10} {"cached s":>9} {"python s":>9} {"speedup":>8}')
+    for name, source in programs.items():
+        module = parser.parse(TokenStream(source))
+        type_checker.typecheck_module(module)
+        assert module.expr is not None
+        expr = module.expr
+        tree = best_time(lambda: interpreter.interpret(expr), repeat=1)
+        transpiler._code_cache.clear()
+        compile_time = best_time(lambda: transpiler.compile_module(module), repeat=1)
+        cached = best_time(lambda: transpiler.compile_module(module))
+        program = transpiler.compile_module(module)
+        python = best_time(program)
+        print(f'{name:>15} {tree:>8.3f} {compile_time:>10.5f} {cached:>9.5f} {python:>9.3f} {tree / python:>8.2f}')
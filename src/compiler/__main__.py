@@ -1,18 +1,29 @@
 from base64 import b64encode
+from concurrent.futures import ProcessPoolExecutor
 import json
+import multiprocessing
+import os
 import re
 import sys
-from socketserver import ForkingTCPServer, StreamRequestHandler
+from socketserver import ThreadingTCPServer, StreamRequestHandler
+import tempfile
 from traceback import format_exception
 from typing import Any
-from compiler import tokenizer, parser, type_checker, ir_generator, builtins, asm_generator, assembler
+from compiler import tokenizer, parser, type_checker, ir_generator, builtins, asm_generator, assembler, closure_compiler, ir_optimizer, transpiler
+from compiler.compile_cache import CompileCache, cache_key
+from compiler.incremental_build import IncrementalBuild
 
 
-def call_compiler(source_code: str, input_file_name: str) -> bytes:
-    tokens = tokenizer.tokenize(source_code, input_file_name)
+def call_compiler(
+        source_code: tokenizer.TokenSource,
+        input_file_name: str,
+        pass_stats: ir_optimizer.PassStats | None = None
+) -> bytes:
+    tokens = tokenizer.iter_tokens(source_code, input_file_name)
     ast = parser.parse(tokens)
     type_checker.typecheck_module(ast)
     ir = ir_generator.generate_ir(ast)
+    ir = ir_optimizer.optimize(ir, pass_stats)
     asm = asm_generator.generate_asm(ir)
 
     return assembler.assemble_and_get_executable(asm)
@@ -25,6 +36,10 @@ def main() -> int:
     output_file: str | None = None
     host = "127.0.0.1"
     port = 3000
+    cache_dir = os.path.join(tempfile.gettempdir(), 'compiler-cache')
+    incremental_dir: str | None = None
+    engine = 'closures'
+    pass_stats: ir_optimizer.PassStats | None = None
     for arg in sys.argv[1:]:
         if (m := re.fullmatch(r'--output=(.+)', arg)) is not None:
             output_file = m[1]
@@ -32,6 +47,14 @@ def main() -> int:
             host = m[1]
         elif (m := re.fullmatch(r'--port=(.+)', arg)) is not None:
             port = int(m[1])
+        elif (m := re.fullmatch(r'--cache-dir=(.+)', arg)) is not None:
+            cache_dir = m[1]
+        elif (m := re.fullmatch(r'--incremental-dir=(.+)', arg)) is not None:
+            incremental_dir = m[1]
+        elif (m := re.fullmatch(r'--engine=(closures|python)', arg)) is not None:
+            engine = m[1]
+        elif arg == '--pass-stats':
+            pass_stats = ir_optimizer.PassStats()
         elif arg.startswith('-'):
             raise Exception(f"Unknown argument: {arg}")
         elif command is None:
@@ -45,25 +68,44 @@ def main() -> int:
         print(f"Error: command argument missing", file=sys.stderr)
         return 1
 
-    def read_source_code() -> str:
-        if input_file is not None:
-            with open(input_file) as f:
-                return f.read()
-        else:
-            return sys.stdin.read()
-
     # === Command implementations ===
 
     if command == 'compile':
-        source_code = read_source_code()
         if output_file is None:
             raise Exception("Output file flag --output=... required")
-        executable = call_compiler(source_code, input_file or '(source code)')
+        if incremental_dir is not None:
+            # Unchanged functions are reused from the previous builds in incremental_dir
+            if input_file is not None:
+                with open(input_file) as f:
+                    executable = IncrementalBuild(incremental_dir, pass_stats=pass_stats).compile(f.read(), input_file)
+            else:
+                executable = IncrementalBuild(incremental_dir, pass_stats=pass_stats).compile(sys.stdin.read())
+        # The source is tokenized straight from the file while parsing, never read in whole
+        elif input_file is not None:
+            with open(input_file, 'rb') as f:
+                executable = call_compiler(f, input_file, pass_stats)
+        else:
+            executable = call_compiler(sys.stdin, '(source code)', pass_stats)
         with open(output_file, 'wb') as f:
             f.write(executable)
+        if pass_stats is not None:
+            print(pass_stats, file=sys.stderr)
+    elif command == 'run':
+        # Runs the program in this process, without assembling it
+        if input_file is not None:
+            with open(input_file) as f:
+                source_code = f.read()
+        else:
+            source_code, input_file = sys.stdin.read(), '(source code)'
+        module = parser.parse(tokenizer.TokenStream(source_code, input_file))
+        type_checker.typecheck_module(module)
+        if engine == 'python':
+            transpiler.compile_module(module)()
+        else:
+            closure_compiler.compile_module(module)()
     elif command == 'serve':
         try:
-            run_server(host, port)
+            run_server(host, port, cache_dir)
         except KeyboardInterrupt:
             pass
     else:
@@ -72,11 +114,18 @@ def main() -> int:
     return 0
 
 
-def run_server(host: str, port: int) -> None:
-    class Server(ForkingTCPServer):
+def run_server(host: str, port: int, cache_dir: str | None = None) -> None:
+    # Requests are handled in threads sharing one compile cache, compiles run in forked worker processes
+    class Server(ThreadingTCPServer):
         allow_reuse_address = True
+        daemon_threads = True
         request_queue_size = 32
 
+    cache = CompileCache(cache_dir)
+    workers = ProcessPoolExecutor(mp_context=multiprocessing.get_context('fork'))
+    # With fork, the first task starts every worker; do it before any request threads exist
+    workers.submit(int).result()
+
     class Handler(StreamRequestHandler):
         def handle(self) -> None:
             result: dict[str, Any] = {}
@@ -85,10 +134,14 @@ def run_server(host: str, port: int) -> None:
                 input = json.loads(input_str)
                 if input["command"] == "compile":
                     source_code = input["code"]
-                    executable = call_compiler(source_code, "(source code)")
+                    key = cache_key(source_code, {'input_file_name': "(source code)"})
+                    executable = cache.get_or_compile(
+                        key, lambda: workers.submit(call_compiler, source_code, "(source code)").result())
                     result["program"] = b64encode(executable).decode()
                 elif input["command"] == "ping":
                     pass
+                elif input["command"] == "stats":
+                    result["stats"] = cache.stats()
                 else:
                     result["error"] = "Unknown command: " + input['command']
             except Exception as e:
@@ -97,7 +150,7 @@ def run_server(host: str, port: int) -> None:
             self.request.sendall(str.encode(result_str))
 
     print(f"Starting TCP server at {host}:{port}")
-    with Server((host, port), Handler) as server:
+    with workers, Server((host, port), Handler) as server:
         server.serve_forever()
 
 
@@ -48,6 +48,10 @@ def generate_asm(modules: dict[str, list[ir.Instruction]]) -> str:
     emit('.section .text') # Declarations and init
 
     def parse_module(instructions: list[ir.Instruction]) -> None:
+        # IR labels are only unique within a function, so local labels are prefixed with its name
+        fun_name = ''
+        def label(name: str) -> str: return f'.L{fun_name}.{name}'
+
         local_vars = get_all_ir_variables(instructions)
         locals = Locals(local_vars)
         emit(f'# Stack used: {locals.stack_used()}')
@@ -62,6 +66,7 @@ def generate_asm(modules: dict[str, list[ir.Instruction]]) -> str:
             emit(f'# {insn}')
             match insn:
                 case ir.Fun():
+                    fun_name = insn.name
                     emit(f'.global {insn.name}')
                     emit(f'.type {insn.name}, @function')
                     emit(f'{insn.name}:')
@@ -83,10 +88,10 @@ def generate_asm(modules: dict[str, list[ir.Instruction]]) -> str:
 
                 case ir.Label():
                     emit('')
-                    emit(f'.L{insn.name}:')
+                    emit(f'{label(insn.name)}:')
 
                 case ir.LoadIntConst():
-                    if -2**32 <= insn.value < 2**31:
+                    if -2**31 <= insn.value < 2**31: # movq sign-extends a 32-bit immediate
                         emit(f'movq ${insn.value}, {locals.get_ref(insn.dest)}')
                     else:
                         emit(f'movabsq ${insn.value}, %rax')
@@ -105,11 +110,11 @@ def generate_asm(modules: dict[str, list[ir.Instruction]]) -> str:
                 case ir.CondJump():
                     emit(f'movq {locals.get_ref(insn.cond)}, %rax')
                     emit(f'cmpq $0, %rax') # 1 if %rax == 0, 0 otherwise (%rax > 0). Stored in EFLAGS (not sure what that is)
-                    emit(f'jne .L{insn.then_label.name}') # %rax != 0 -> Comparison was true
-                    emit(f'jmp .L{insn.else_label.name}') # %rax == 0 -> Comparison was false
+                    emit(f'jne {label(insn.then_label.name)}') # %rax != 0 -> Comparison was true
+                    emit(f'jmp {label(insn.else_label.name)}') # %rax == 0 -> Comparison was false
 
                 case ir.Jump():
-                    emit(f'jmp .L{insn.label.name}')
+                    emit(f'jmp {label(insn.label.name)}')
 
                 case ir.Call():
                     f_name = insn.fun.name
@@ -76,25 +76,31 @@ def _assemble_impl(
     extra_libraries: list[str],
     take_output: Callable[[str], T],
 ) -> T:
-    stdlib_asm = path.join(workdir, 'stdlib.s')
     stdlib_obj = path.join(workdir, 'stdlib.o')
-    program_asm = path.join(workdir, f'{tempfile_basename}.s')
     program_obj = path.join(workdir, f'{tempfile_basename}.o')
     output_file = path.join(workdir, 'a.out')
 
-    if link_with_c:
-        final_stdlib_asm_code = drop_start_symbol(stdlib_asm_code)
-    else:
-        final_stdlib_asm_code = stdlib_asm_code
+    assemble_object(stdlib_code(link_with_c), stdlib_obj)
+    assemble_object(assembly_code, program_obj)
+    link([stdlib_obj, program_obj], output_file, link_with_c, extra_libraries)
+    return take_output(output_file)
+
 
-    with open(stdlib_asm, 'w') as f:
-        f.write(final_stdlib_asm_code)
-    with open(program_asm, 'w') as f:
+def assemble_object(assembly_code: str, output_file: str) -> None:
+    """Invokes 'as' to assemble Assembly code into an object file at the given path."""
+    asm_file = path.splitext(output_file)[0] + '.s'
+    with open(asm_file, 'w') as f:
         f.write(assembly_code)
-    subprocess.run(['as', '-g', '-o' +
-                    stdlib_obj, stdlib_asm], check=True)
-    subprocess.run(['as', '-g', '-o' +
-                    program_obj, program_asm], check=True)
+    subprocess.run(['as', '-g', '-o' + output_file, asm_file], check=True)
+
+
+def link(
+    object_files: list[str],
+    output_file: str,
+    link_with_c: bool = False,
+    extra_libraries: list[str] = [],
+) -> None:
+    """Links object files, one of which must be the assembled stdlib_code(), into an executable."""
     linker_flags = ['-static', *[f'-l{lib}' for lib in extra_libraries]]
     if link_with_c:
         # Linking with the C standard library correctly is complicated,
@@ -102,11 +108,16 @@ def _assemble_impl(
         # Instead of trying to build the right `ld` command ourselves, we use the C compiler
         # to do the linking.
         subprocess.run(
-            ['cc', '-o' + output_file, *linker_flags, stdlib_obj, program_obj], check=True)
+            ['cc', '-o' + output_file, *linker_flags, *object_files], check=True)
     else:
         subprocess.run(
-            ['ld', '-o' + output_file, *linker_flags, stdlib_obj, program_obj], check=True)
-    return take_output(output_file)
+            ['ld', '-o' + output_file, *linker_flags, *object_files], check=True)
+
+
+def stdlib_code(link_with_c: bool = False) -> str:
+    if link_with_c:
+        return drop_start_symbol(stdlib_asm_code)
+    return stdlib_asm_code
 
 
 def drop_start_symbol(code: str) -> str:
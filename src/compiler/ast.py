@@ -1,14 +1,15 @@
 from __future__ import annotations
 from dataclasses import dataclass, field, fields
-from typing import Any
-from compiler.classes import Location, DummyLocation
+from typing import Any, Iterator
+from compiler.classes import Location, DUMMY_LOCATION
 from compiler.types import Type, Unit, FnType
 
 
-@dataclass
+@dataclass(slots=True)
 class Node:
-    location: Location = field(kw_only=True, default_factory=lambda: DummyLocation(), compare=False)
-    type: Type = field(kw_only=True, default_factory=lambda: Unit(), compare=False)
+    # The defaults are shared immutable instances, so nodes that keep them allocate nothing extra
+    location: Location = field(kw_only=True, default=DUMMY_LOCATION, compare=False)
+    type: Type = field(kw_only=True, default=Unit(), compare=False)
     
     def __str__(self) -> str:
         def format_value(v: Any) -> str:
@@ -19,80 +20,110 @@ class Node:
         args = ', '.join(
             format_value(getattr(self, field.name))
             for field in fields(self)
-            if field.name != 'location'
+            if field.name not in _annotation_fields
         )
         return f'{type(self).__name__}(\n{args}\n)'
 
-@dataclass
+@dataclass(slots=True)
 class Module(Node):
     defs: list[Definition]
     expr: Expression | None
+    scope_size: int = field(kw_only=True, default=0, compare=False) # Variables declared in its scope, set by the resolver
 
-@dataclass
+@dataclass(slots=True)
 class Definition(Node):
     name: str
     params: list[Identifier]
     block: Block
-    type: FnType = field(kw_only=True, default_factory=lambda: FnType([], Unit()), compare=False)
+    type: FnType = field(kw_only=True, default=FnType([], Unit()), compare=False)
+    scope_size: int = field(kw_only=True, default=0, compare=False)
 
-@dataclass
+@dataclass(slots=True)
 class Expression(Node):
     pass
 
-@dataclass
+@dataclass(slots=True)
 class Literal(Expression):
     value: int | bool | None
 
-@dataclass
+@dataclass(slots=True)
 class Identifier(Expression):
     name: str
+    # Set by the resolver: the nesting depth of the scope declaring the variable and its index there
+    depth: int = field(kw_only=True, default=-1, compare=False)
+    slot: int = field(kw_only=True, default=-1, compare=False)
     
-@dataclass
+@dataclass(slots=True)
 class BinaryOp(Expression):
     left: Expression
     op: str
     right: Expression
 
-@dataclass
+@dataclass(slots=True)
 class UnaryOp(Expression):
     op: str
     param: Expression
 
-@dataclass
+@dataclass(slots=True)
 class If(Expression):
     condition: Expression
     true_branch: Expression
     false_branch: None | Expression = None
 
-@dataclass
+@dataclass(slots=True)
 class Function(Expression):
     id: Identifier
     args: list[Expression] = field(default_factory=list)
 
-@dataclass
+@dataclass(slots=True)
 class Block(Expression):
     exprs: list[Expression]
     res: Expression | None = None
+    scope_size: int = field(kw_only=True, default=0, compare=False)
 
-@dataclass
+@dataclass(slots=True)
 class While(Expression):
     condition: Expression
     expr: Expression
 
-@dataclass
+@dataclass(slots=True)
 class Var(Expression):
     id: Identifier
     expr: Expression
     typed: bool = False
 
-@dataclass
+@dataclass(slots=True)
 class Break(Expression):
     pass
 
-@dataclass
+@dataclass(slots=True)
 class Continue(Expression):
     pass
 
-@dataclass
+@dataclass(slots=True)
 class Return(Expression):
-    expr: Expression | None
\ No newline at end of file
+    expr: Expression | None
+
+# Fields that annotate a node, left out of its string form
+_annotation_fields = {'location', 'depth', 'slot', 'scope_size'}
+
+# Names of the fields that can hold child nodes, per node class
+_child_fields: dict[type, tuple[str, ...]] = {}
+
+def walk(root: Node) -> Iterator[Node]:
+    """Yields root and every node below it in preorder. Uses an explicit stack, so depth is not limited."""
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        yield node
+        names = _child_fields.get(type(node))
+        if names is None:
+            names = _child_fields[type(node)] = tuple(f.name for f in fields(node) if f.name not in _annotation_fields | {'type'})
+        children: list[Node] = []
+        for name in names:
+            value = getattr(node, name)
+            if isinstance(value, Node):
+                children.append(value)
+            elif isinstance(value, list):
+                children.extend(v for v in value if isinstance(v, Node))
+        stack.extend(reversed(children))
@@ -0,0 +1,300 @@
+"""Runs a type checked module over many inputs at once, with NumPy arrays holding one lane per input.
+
+Every Int or Bool value is an int64 or bool array with an element for each input, so one pass over
+the program does the work of a run per input. Lanes go separate ways at if, while, and, or and the
+jumps: a mask of the lanes still running is kept per call, each branch runs only if some lane takes
+it, and assignments only change the active lanes. Lanes that break, continue or return leave the
+mask until their loop or call picks them up again. What each lane prints is buffered separately.
+
+Values in lanes that are not active are left unspecified, so operations never fail on them;
+division by zero only raises if an active lane divides by zero. Int arithmetic wraps to 64 bits,
+with the semantics of the generated machine code (see runtime).
+
+NumPy is only a development dependency, so callers of this module must install it themselves.
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Any, Sequence
+import numpy as np
+from numpy.typing import NDArray
+from compiler import ast, resolver, trampoline
+from compiler.runtime import wrap64
+from compiler.trampoline import Step
+from compiler.types import Bool, Int
+
+type Mask = NDArray[np.bool_]
+type Value = NDArray[Any] | None
+
+
+def run_batch(module: ast.Module, inputs: Sequence[Sequence[int]]) -> list[str]:
+    """Runs the module once for each list of numbers read_int reads, returning what each run prints."""
+    interpreter = _BatchInterpreter(module, inputs)
+    if module.expr is not None:
+        trampoline.run(interpreter.run_main(module.expr))
+    return [''.join(lane) for lane in interpreter.output]
+
+
+@dataclass
+class _Loop:
+    breaks: Mask
+    continues: Mask
+
+
+@dataclass
+class _Frame:
+    """A call of a function, or of main, running for the lanes in active."""
+    active: Mask
+    scopes: list[list[Value]]
+    result: Value = None
+    loops: list[_Loop] = field(default_factory=list)
+
+
+class _BatchInterpreter:
+    def __init__(self, module: ast.Module, inputs: Sequence[Sequence[int]]) -> None:
+        self.lanes = len(inputs)
+        self.output: list[list[str]] = [[] for _ in inputs]
+        width = max((len(numbers) for numbers in inputs), default=0)
+        self.inputs = np.zeros((self.lanes, width), dtype=np.int64)
+        for lane, numbers in enumerate(inputs):
+            self.inputs[lane, :len(numbers)] = [wrap64(n) for n in numbers]
+        self.input_lengths = np.array([len(numbers) for numbers in inputs], dtype=np.int64)
+        self.input_positions = np.zeros(self.lanes, dtype=np.int64)
+
+        self.names = resolver.global_names(module)
+        first_function = len(self.names) - len(module.defs)
+        self.functions = {first_function + i: d for i, d in enumerate(module.defs)}
+        self.globals: list[Value] = [None] * module.scope_size
+
+    def none(self) -> Mask:
+        return np.zeros(self.lanes, dtype=np.bool_)
+
+    def unspecified(self, t: Any) -> Value:
+        """A value of type t for code that ran in no lane."""
+        if t is Int():
+            return np.zeros(self.lanes, dtype=np.int64)
+        if t is Bool():
+            return self.none()
+        return None
+
+    def run_main(self, expr: ast.Expression) -> Step[None]:
+        frame = _Frame(np.ones(self.lanes, dtype=np.bool_), [self.globals])
+        value = yield self.eval(expr, frame)
+        if expr.type is Int() or expr.type is Bool():
+            self.print(value, frame.active, expr.type is Bool())
+
+    def print(self, value: Value, active: Mask, is_bool: bool) -> None:
+        assert value is not None
+        lanes = np.flatnonzero(active)
+        for lane, v in zip(lanes.tolist(), value[lanes].tolist()):
+            self.output[lane].append(('true\n' if v else 'false\n') if is_bool else f'{v}\n')
+
+    def read_int(self, active: Mask) -> Value:
+        lanes = np.flatnonzero(active)
+        positions = self.input_positions[lanes]
+        ended = positions >= self.input_lengths[lanes]
+        if ended.any():
+            raise EOFError(f'read_int: end of input in lane {lanes[ended][0]}')
+        value = np.zeros(self.lanes, dtype=np.int64)
+        value[lanes] = self.inputs[lanes, positions]
+        self.input_positions[lanes] += 1
+        return value
+
+    def call(self, callee: ast.Identifier, args: list[Value], frame: _Frame) -> Step[Value]:
+        if callee.depth != 0:
+            raise TypeError(f'{callee.location}: cannot call a function value in a batch')
+        if callee.slot in self.functions:
+            definition = self.functions[callee.slot]
+            if not frame.active.any():
+                return self.unspecified(definition.type.res)
+            # The body shares the scope of the parameters
+            scope = [*args, *[None] * (definition.scope_size - len(args))]
+            callee_frame = _Frame(frame.active.copy(), [self.globals, scope])
+            for expr in definition.block.exprs:
+                yield self.eval(expr, callee_frame)
+            if definition.block.res is not None:
+                yield self.eval(definition.block.res, callee_frame)
+            if callee_frame.result is None:
+                return self.unspecified(definition.type.res)
+            return callee_frame.result
+        match self.names[callee.slot]:
+            case 'print_int':
+                self.print(args[0], frame.active, False)
+            case 'print_bool':
+                self.print(args[0], frame.active, True)
+            case 'read_int':
+                return self.read_int(frame.active)
+            case name:
+                raise ValueError(f'{callee.location}: unsupported builtin "{name}"')
+        return None
+
+    def store(self, target: ast.Identifier, value: Value, frame: _Frame) -> None:
+        scope = frame.scopes[target.depth]
+        old = scope[target.slot]
+        if old is None or value is None:
+            scope[target.slot] = value
+        else:
+            scope[target.slot] = np.where(frame.active, value, old)
+
+    def eval(self, node: ast.Expression, frame: _Frame) -> Step[Value]:
+        match node:
+            case ast.Literal():
+                if node.value is None:
+                    return None
+                if type(node.value) is bool:
+                    return np.full(self.lanes, node.value, dtype=np.bool_)
+                return np.full(self.lanes, wrap64(node.value), dtype=np.int64)
+
+            case ast.Identifier():
+                return frame.scopes[node.depth][node.slot]
+
+            case ast.BinaryOp() if node.op == '=':
+                assert isinstance(node.left, ast.Identifier)
+                value = yield self.eval(node.right, frame)
+                self.store(node.left, value, frame)
+                return frame.scopes[node.left.depth][node.left.slot]
+
+            case ast.BinaryOp() if node.op in ('and', 'or'):
+                left = yield self.eval(node.left, frame)
+                assert left is not None
+                entry = frame.active
+                # The lanes whose left side decides the result skip the right side
+                decided = entry & ~left if node.op == 'and' else entry & left
+                frame.active = entry & ~decided
+                if not frame.active.any():
+                    frame.active = decided
+                    return left
+                right = yield self.eval(node.right, frame)
+                frame.active = frame.active | decided
+                return left & right if node.op == 'and' else left | right
+
+            case ast.BinaryOp():
+                a = yield self.eval(node.left, frame)
+                b = yield self.eval(node.right, frame)
+                return _binary(node.op, a, b, frame.active)
+
+            case ast.UnaryOp():
+                param = yield self.eval(node.param, frame)
+                assert param is not None or node.op == '()'
+                if node.op == 'unary_-':
+                    return -param
+                if node.op == 'unary_not':
+                    return ~param
+                return param
+
+            case ast.If():
+                condition = yield self.eval(node.condition, frame)
+                assert condition is not None
+                entry = frame.active
+                frame.active = entry & condition
+                then: Any = None
+                if frame.active.any():
+                    then = yield self.eval(node.true_branch, frame)
+                after_then = frame.active
+                frame.active = entry & ~condition
+                else_: Any = None
+                if node.false_branch is not None and frame.active.any():
+                    else_ = yield self.eval(node.false_branch, frame)
+                frame.active = after_then | frame.active
+                if node.false_branch is None:
+                    return None
+                if then is None:
+                    return else_ if else_ is not None else self.unspecified(node.type)
+                if else_ is None:
+                    return then
+                return np.where(condition, then, else_)
+
+            case ast.While():
+                loop = _Loop(self.none(), self.none())
+                frame.loops.append(loop)
+                exited = self.none()
+                while frame.active.any():
+                    condition = yield self.eval(node.condition, frame)
+                    assert condition is not None
+                    exited |= frame.active & ~condition
+                    frame.active = frame.active & condition
+                    if frame.active.any():
+                        yield self.eval(node.expr, frame)
+                    frame.active = frame.active | loop.continues
+                    loop.continues = self.none()
+                frame.loops.pop()
+                frame.active = exited | loop.breaks
+                return None
+
+            case ast.Function():
+                args = []
+                for arg in node.args:
+                    args.append((yield self.eval(arg, frame)))
+                result: Value = yield self.call(node.id, args, frame)
+                return result
+
+            case ast.Block():
+                frame.scopes.append([None] * node.scope_size)
+                for expr in node.exprs:
+                    yield self.eval(expr, frame)
+                value = None
+                if node.res is not None:
+                    value = yield self.eval(node.res, frame)
+                frame.scopes.pop()
+                return value
+
+            case ast.Var():
+                value = yield self.eval(node.expr, frame)
+                frame.scopes[node.id.depth][node.id.slot] = value
+                return None
+
+            case ast.Break() | ast.Continue():
+                if not frame.loops:
+                    raise SyntaxError(f'{node.location}: {type(node).__name__.lower()} called outside of a loop')
+                loop = frame.loops[-1]
+                if isinstance(node, ast.Break):
+                    loop.breaks = loop.breaks | frame.active
+                else:
+                    loop.continues = loop.continues | frame.active
+                frame.active = self.none()
+                return None
+
+            case ast.Return():
+                if node.expr is not None:
+                    value = yield self.eval(node.expr, frame)
+                    if frame.result is None or value is None:
+                        frame.result = value
+                    else:
+                        frame.result = np.where(frame.active, value, frame.result)
+                frame.active = self.none()
+                return None
+
+        raise TypeError(f'{node.location}: cannot interpret {type(node).__name__}')
+
+
+def _binary(op: str, a: Any, b: Any, active: Mask) -> Value:
+    match op:
+        case '+':
+            return a + b
+        case '-':
+            return a - b
+        case '*':
+            return a * b
+        case '/' | '%':
+            if (b[active] == 0).any():
+                raise ZeroDivisionError('integer division by zero')
+            # Truncating, like idivq: fmod's remainder has the sign of the dividend, and the dividend
+            # minus it divides exactly. Without abs(), which overflows for the smallest Int.
+            divisor = np.where(b == 0, 1, b)
+            r = np.fmod(a, divisor)
+            if op == '%':
+                return r
+            with np.errstate(over='ignore'): # The smallest Int / -1 wraps around, like runtime.div
+                return (a - r) // divisor
+        case '<':
+            return a < b
+        case '>':
+            return a > b
+        case '<=':
+            return a <= b
+        case '>=':
+            return a >= b
+        case '==':
+            return a == b
+        case '!=':
+            return a != b
+    raise ValueError(f'undefined operator {op}')
@@ -0,0 +1,136 @@
+"""Control-flow graphs of the IR that ir_generator generates for each function.
+
+A function's instructions are split into basic blocks: a block starts at a Label, or after a
+Jump, CondJump or Return, and ends before the next such point. The Fun instruction heading the
+function is kept apart from the blocks. Blocks are numbered in the order of the instructions, so
+the entry is block 0, and concatenating them gives back the function.
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from compiler import ir
+
+
+@dataclass
+class BasicBlock:
+    index: int
+    instructions: list[ir.Instruction] # Starting with its Label, if it has one
+    successors: list[int] = field(default_factory=list)
+    predecessors: list[int] = field(default_factory=list)
+
+    @property
+    def label(self) -> ir.Label | None:
+        first = self.instructions[0] if self.instructions else None
+        return first if type(first) is ir.Label else None
+
+
+@dataclass
+class CFG:
+    fun: ir.Fun
+    blocks: list[BasicBlock]
+
+    def instructions(self) -> list[ir.Instruction]:
+        """The function as a flat instruction list again, blocks in order."""
+        result: list[ir.Instruction] = [self.fun]
+        for block in self.blocks:
+            result += block.instructions
+        return result
+
+    def reverse_postorder(self) -> list[int]:
+        """Indices of the blocks reachable from the entry, each one before its successors except along back edges."""
+        if not self.blocks:
+            return []
+        order: list[int] = []
+        visited = [False] * len(self.blocks)
+        visited[0] = True
+        # Depth first without recursion: each entry is a block and how many successors it has left.
+        # The last successor is visited first, so that it comes after the others in the order: a
+        # CondJump's then-branch and a loop's body come before the code after the if or the loop.
+        stack = [(0, len(self.blocks[0].successors))]
+        while stack:
+            index, remaining = stack[-1]
+            if remaining > 0:
+                stack[-1] = (index, remaining - 1)
+                successor = self.blocks[index].successors[remaining - 1]
+                if not visited[successor]:
+                    visited[successor] = True
+                    stack.append((successor, len(self.blocks[successor].successors)))
+            else:
+                stack.pop()
+                order.append(index)
+        order.reverse()
+        return order
+
+
+def build_cfg(instructions: list[ir.Instruction]) -> CFG:
+    """The CFG of one function's instructions, which start with its Fun."""
+    fun = instructions[0]
+    if not isinstance(fun, ir.Fun):
+        raise ValueError(f'{fun.location}: function does not start with Fun')
+
+    blocks: list[BasicBlock] = []
+    current: list[ir.Instruction] = []
+    for insn in instructions[1:]:
+        if type(insn) is ir.Label and current:
+            blocks.append(BasicBlock(len(blocks), current))
+            current = []
+        current.append(insn)
+        if isinstance(insn, (ir.Jump, ir.CondJump, ir.Return)):
+            blocks.append(BasicBlock(len(blocks), current))
+            current = []
+    if current:
+        blocks.append(BasicBlock(len(blocks), current))
+
+    cfg = CFG(fun, blocks)
+    connect(cfg)
+    return cfg
+
+
+def build_cfgs(program: dict[str, list[ir.Instruction]]) -> dict[str, CFG]:
+    return {name: build_cfg(instructions) for name, instructions in program.items()}
+
+
+def remove_unreachable(cfg: CFG) -> list[BasicBlock]:
+    """Removes the blocks that can't be reached from the entry and renumbers the others, returning the removed ones."""
+    reachable = [False] * len(cfg.blocks)
+    for index in cfg.reverse_postorder():
+        reachable[index] = True
+    if all(reachable):
+        return []
+    kept: list[BasicBlock] = []
+    removed: list[BasicBlock] = []
+    for block in cfg.blocks:
+        if reachable[block.index]:
+            block.index = len(kept)
+            kept.append(block)
+        else:
+            removed.append(block)
+    cfg.blocks = kept
+    connect(cfg)
+    return removed
+
+
+def connect(cfg: CFG) -> None:
+    """Sets the successors and predecessors of every block from the instructions ending them."""
+    block_of_label: dict[str, int] = {}
+    for block in cfg.blocks:
+        block.successors = []
+        block.predecessors = []
+        if (label := block.label) is not None:
+            block_of_label[label.name] = block.index
+
+    for block in cfg.blocks:
+        last = block.instructions[-1] if block.instructions else None
+        match last:
+            case ir.Jump():
+                block.successors.append(block_of_label[last.label.name])
+            case ir.CondJump():
+                block.successors.append(block_of_label[last.then_label.name])
+                if last.else_label.name != last.then_label.name:
+                    block.successors.append(block_of_label[last.else_label.name])
+            case ir.Return():
+                pass
+            case _:
+                if block.index + 1 < len(cfg.blocks):
+                    block.successors.append(block.index + 1)
+        for successor in block.successors:
+            cfg.blocks[successor].predecessors.append(block.index)
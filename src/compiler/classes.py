@@ -1,6 +1,7 @@
 from dataclasses import dataclass
 
-@dataclass
+# Locations are immutable, so nodes and tokens can share them
+@dataclass(frozen=True, slots=True)
 class Location:
     file: str
     line: int
@@ -14,18 +15,24 @@ class Location:
         return (self.file == value.file and self.line == value.line and self.column == value.column)
     
 class DummyLocation(Location):
+    __slots__ = ()
+    __hash__ = Location.__hash__
+
     def __init__(self) -> None:
-        self.file = 'dummy'
-        self.line = -1
-        self.column = -1
+        object.__setattr__(self, 'file', 'dummy')
+        object.__setattr__(self, 'line', -1)
+        object.__setattr__(self, 'column', -1)
     
     def __eq__(self, value: object) -> bool:
         if not isinstance(value, Location):
             return NotImplemented
         return True
 
-@dataclass
+# Shared default for everything that has no location of its own
+DUMMY_LOCATION = DummyLocation()
+
+@dataclass(slots=True)
 class Token:
     text: str
     type: str
-    location: Location
\ No newline at end of file
+    location: Location
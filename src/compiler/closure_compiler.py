@@ -0,0 +1,358 @@
+"""Runs programs by compiling a type checked module once into a tree of Python closures.
+
+Every node becomes a closure taking the frame of the running call, so nothing is dispatched on
+node types or looked up by name at run time. A call keeps all of its variables in one list: the
+scopes open at a point are laid out one after another, turning the resolver's (depth, slot) into
+an index that is fixed at compile time, and entering a block allocates nothing. Variables in the
+module scope, the builtins and functions included, live in one list shared by all calls.
+
+break, continue and return set a signal in the frame rather than raising an exception. Only the
+closures of nodes containing such a jump check for it, so code without jumps doesn't pay for them.
+Semantics are those of the generated machine code, see runtime.
+"""
+from __future__ import annotations
+from operator import itemgetter
+from typing import Any, Callable
+from compiler import ast, resolver, runtime, trampoline
+from compiler.runtime import INT_MIN, INT_MAX, wrap64
+from compiler.trampoline import Step
+from compiler.types import Bool, Int
+
+type Frame = list[Any]
+type Code = Callable[[Frame], Any]
+
+# Frame layout: the signal, the return value, then the variables
+SIGNAL, RESULT, FIRST_VARIABLE = 0, 1, 2
+BREAK, CONTINUE, RETURN = 1, 2, 3
+
+# What a piece of code can jump out of: the innermost loop around it, and the function
+JUMPS_LOOP, JUMPS_FUNCTION = 1, 2
+
+
+def compile_module(module: ast.Module) -> Callable[[], Any]:
+    """Compiles a type checked module. The returned function runs the module like its executable
+    would, printing the result of the main expression if it is an Int or a Bool, and returns that result."""
+    names = resolver.global_names(module)
+    globals: list[Any] = [runtime.builtin_functions.get(name) for name in names]
+    globals += [None] * (module.scope_size - len(names))
+    first_function = len(names) - len(module.defs)
+    for i, d in enumerate(module.defs):
+        globals[first_function + i] = _compile_function(d, globals)
+
+    if module.expr is None:
+        return lambda: None
+    compiler = _Compiler(globals)
+    main, _ = trampoline.run(compiler.compile(module.expr))
+    frame_size = compiler.frame_size
+    result_type = module.expr.type
+
+    def run() -> Any:
+        frame: Frame = [0, None, *[None] * (frame_size - FIRST_VARIABLE)]
+        value = main(frame)
+        if frame[SIGNAL] == RETURN:
+            return None
+        if result_type is Int():
+            runtime.print_int(value)
+        elif result_type is Bool():
+            runtime.print_bool(value)
+        return value
+    return run
+
+
+def _compile_function(definition: ast.Definition, globals: list[Any]) -> Callable[..., Any]:
+    compiler = _Compiler(globals)
+    compiler.open_scope(definition.scope_size) # The parameters come first
+    body = definition.block
+    codes = [trampoline.run(compiler.compile(e)) for e in body.exprs]
+    if body.res is not None:
+        codes.append(trampoline.run(compiler.compile(body.res)))
+    run_body, _ = _sequence(codes)
+    padding = [None] * (compiler.frame_size - FIRST_VARIABLE - len(definition.params))
+
+    def call(*args: Any) -> Any:
+        frame = [0, None, *args, *padding]
+        run_body(frame)
+        return frame[RESULT]
+    return call
+
+
+def _sequence(codes: list[tuple[Code, int]]) -> tuple[Code, int]:
+    """Runs codes in order, returning the value of the last one."""
+    jumps = 0
+    for _, code_jumps in codes:
+        jumps |= code_jumps
+    if not codes:
+        return (lambda frame: None), 0
+    if len(codes) == 1:
+        return codes[0]
+    init = [code for code, _ in codes[:-1]]
+    last = codes[-1][0]
+    if not jumps:
+        def sequence(frame: Frame) -> Any:
+            for code in init:
+                code(frame)
+            return last(frame)
+    else:
+        def sequence(frame: Frame) -> Any:
+            for code in init:
+                code(frame)
+                if frame[SIGNAL]:
+                    return None
+            return last(frame)
+    return sequence, jumps
+
+
+class _Compiler:
+    """Compiles the nodes of one function, or of the main expression."""
+    def __init__(self, globals: list[Any]) -> None:
+        self.globals = globals
+        # Frame index after the last variable of each open scope, by depth; depth 0 is in globals
+        self.scope_ends = [FIRST_VARIABLE]
+        self.scope_starts = [0]
+        self.frame_size = FIRST_VARIABLE
+        self.loops = 0
+
+    def open_scope(self, size: int) -> None:
+        start = self.scope_ends[-1]
+        self.scope_starts.append(start)
+        self.scope_ends.append(start + size)
+        self.frame_size = max(self.frame_size, start + size)
+
+    def close_scope(self) -> None:
+        self.scope_starts.pop()
+        self.scope_ends.pop()
+
+    def index(self, identifier: ast.Identifier) -> int:
+        return self.scope_starts[identifier.depth] + identifier.slot
+
+    def compile(self, node: ast.Expression) -> Step[tuple[Code, int]]:
+        match node:
+            case ast.Literal():
+                value = wrap64(node.value) if type(node.value) is int else node.value
+                return (lambda frame: value), 0
+
+            case ast.Identifier():
+                return self.compile_identifier(node), 0
+
+            case ast.BinaryOp() if node.op == '=':
+                assert isinstance(node.left, ast.Identifier)
+                value, jumps = yield self.compile(node.right)
+                return self.store(node.left, value, jumps), jumps
+
+            case ast.BinaryOp():
+                left, left_jumps = yield self.compile(node.left)
+                right, right_jumps = yield self.compile(node.right)
+                return _binary(node.op, left, right, left_jumps, right_jumps), left_jumps | right_jumps
+
+            case ast.UnaryOp():
+                param, jumps = yield self.compile(node.param)
+                if node.op == '()':
+                    return param, jumps
+                op = runtime.builtin_functions[node.op]
+                if not jumps:
+                    return (lambda frame: op(param(frame))), 0
+                def unary(frame: Frame) -> Any:
+                    value = param(frame)
+                    if frame[SIGNAL]:
+                        return None
+                    return op(value)
+                return unary, jumps
+
+            case ast.If():
+                condition, condition_jumps = yield self.compile(node.condition)
+                then, then_jumps = yield self.compile(node.true_branch)
+                jumps = condition_jumps | then_jumps
+                if node.false_branch is None:
+                    if not condition_jumps:
+                        def if_then(frame: Frame) -> Any:
+                            if condition(frame):
+                                then(frame)
+                    else:
+                        def if_then(frame: Frame) -> Any:
+                            if condition(frame) and not frame[SIGNAL]:
+                                then(frame)
+                    return if_then, jumps
+                else_, else_jumps = yield self.compile(node.false_branch)
+                jumps |= else_jumps
+                if not condition_jumps:
+                    return (lambda frame: then(frame) if condition(frame) else else_(frame)), jumps
+                def if_then_else(frame: Frame) -> Any:
+                    value = condition(frame)
+                    if frame[SIGNAL]:
+                        return None
+                    return then(frame) if value else else_(frame)
+                return if_then_else, jumps
+
+            case ast.While():
+                self.loops += 1
+                condition, condition_jumps = yield self.compile(node.condition)
+                body, body_jumps = yield self.compile(node.expr)
+                self.loops -= 1
+                if not (condition_jumps | body_jumps):
+                    def loop(frame: Frame) -> Any:
+                        while condition(frame):
+                            body(frame)
+                    return loop, 0
+                def jumping_loop(frame: Frame) -> Any:
+                    while True:
+                        value = condition(frame)
+                        signal = frame[SIGNAL]
+                        if signal:
+                            if signal == RETURN:
+                                return None
+                            frame[SIGNAL] = 0
+                            if signal == BREAK:
+                                return None
+                            continue
+                        if not value:
+                            return None
+                        body(frame)
+                        signal = frame[SIGNAL]
+                        if signal:
+                            if signal == RETURN:
+                                return None
+                            frame[SIGNAL] = 0
+                            if signal == BREAK:
+                                return None
+                return jumping_loop, (condition_jumps | body_jumps) & ~JUMPS_LOOP
+
+            case ast.Function():
+                args: list[Code] = []
+                jumps = 0
+                for arg in node.args:
+                    code, arg_jumps = yield self.compile(arg)
+                    args.append(code)
+                    jumps |= arg_jumps
+                return self.call(node.id, args, jumps), jumps
+
+            case ast.Block():
+                self.open_scope(node.scope_size)
+                codes = []
+                for expr in node.exprs:
+                    codes.append((yield self.compile(expr)))
+                if node.res is not None:
+                    codes.append((yield self.compile(node.res)))
+                self.close_scope()
+                if node.res is None and codes:
+                    codes.append(((lambda frame: None), 0))
+                return _sequence(codes)
+
+            case ast.Var():
+                value, jumps = yield self.compile(node.expr)
+                return self.store(node.id, value, jumps), jumps
+
+            case ast.Break() | ast.Continue():
+                if not self.loops:
+                    raise SyntaxError(f'{node.location}: {type(node).__name__.lower()} called outside of a loop')
+                signal = BREAK if isinstance(node, ast.Break) else CONTINUE
+                def jump(frame: Frame) -> Any:
+                    frame[SIGNAL] = signal
+                return jump, JUMPS_LOOP
+
+            case ast.Return():
+                if node.expr is None:
+                    def return_(frame: Frame) -> Any:
+                        frame[SIGNAL] = RETURN
+                    return return_, JUMPS_FUNCTION
+                value, jumps = yield self.compile(node.expr)
+                def return_value(frame: Frame) -> Any:
+                    result = value(frame)
+                    if not frame[SIGNAL]:
+                        frame[RESULT] = result
+                        frame[SIGNAL] = RETURN
+                return return_value, jumps | JUMPS_FUNCTION
+
+        raise TypeError(f'{node.location}: cannot compile {type(node).__name__}')
+
+    def store(self, target: ast.Identifier, value: Code, jumps: int) -> Code:
+        variables = self.globals if target.depth == 0 else None
+        index = target.slot if target.depth == 0 else self.index(target)
+        if variables is not None:
+            def store_global(frame: Frame) -> Any:
+                result = value(frame)
+                if not frame[SIGNAL]:
+                    variables[index] = result
+                return result
+            return store_global
+        if not jumps:
+            def store_local(frame: Frame) -> Any:
+                frame[index] = result = value(frame)
+                return result
+            return store_local
+        def store_local_jumping(frame: Frame) -> Any:
+            result = value(frame)
+            if not frame[SIGNAL]:
+                frame[index] = result
+            return result
+        return store_local_jumping
+
+    def call(self, callee: ast.Identifier, args: list[Code], jumps: int) -> Code:
+        function = self.compile_identifier(callee)
+        if jumps:
+            def jumping_call(frame: Frame) -> Any:
+                f = function(frame)
+                values = []
+                for arg in args:
+                    values.append(arg(frame))
+                    if frame[SIGNAL]:
+                        return None
+                return f(*values)
+            return jumping_call
+        if callee.depth != 0:
+            return lambda frame: function(frame)(*[arg(frame) for arg in args])
+        # Functions are read from the module scope when called, as they are compiled one after another
+        globals, slot = self.globals, callee.slot
+        if len(args) == 0:
+            return lambda frame: globals[slot]()
+        if len(args) == 1:
+            arg, = args
+            return lambda frame: globals[slot](arg(frame))
+        if len(args) == 2:
+            first, second = args
+            return lambda frame: globals[slot](first(frame), second(frame))
+        return lambda frame: globals[slot](*[arg(frame) for arg in args])
+
+    def compile_identifier(self, identifier: ast.Identifier) -> Code:
+        if identifier.depth == 0:
+            globals, slot = self.globals, identifier.slot
+            return lambda frame: globals[slot]
+        return itemgetter(self.index(identifier))
+
+
+def _binary(op: str, left: Code, right: Code, left_jumps: int, right_jumps: int) -> Code:
+    if left_jumps or right_jumps:
+        function = runtime.builtin_functions[op]
+        # The value of the left side that decides the result of 'and' and 'or'
+        decisive = {'and': False, 'or': True}.get(op)
+        def jumping_binary(frame: Frame) -> Any:
+            a = left(frame)
+            if frame[SIGNAL]:
+                return None
+            if decisive is not None and a is decisive:
+                return a
+            b = right(frame)
+            if frame[SIGNAL]:
+                return None
+            return function(a, b)
+        return jumping_binary
+
+    # The most common operators are inlined, wrapping only when the result overflows
+    match op:
+        case 'and':
+            return lambda frame: left(frame) and right(frame)
+        case 'or':
+            return lambda frame: left(frame) or right(frame)
+        case '+':
+            def plus(frame: Frame) -> Any:
+                n = left(frame) + right(frame)
+                return n if INT_MIN <= n <= INT_MAX else wrap64(n)
+            return plus
+        case '-':
+            def minus(frame: Frame) -> Any:
+                n = left(frame) - right(frame)
+                return n if INT_MIN <= n <= INT_MAX else wrap64(n)
+            return minus
+        case '<':
+            return lambda frame: left(frame) < right(frame)
+    function = runtime.builtin_functions[op]
+    return lambda frame: function(left(frame), right(frame))
@@ -0,0 +1,171 @@
+"""Cache of compiled executables, keyed by a hash of the source, the compiler and the compile options.
+
+Entries live in a bounded in-memory LRU tier and, if a directory is given, in an on-disk tier
+shared by every process using the same directory. The disk tier is bounded too: reading an entry
+updates its modification time, and after writing one the least recently used entries are removed
+until the directory is within its budget. Concurrent requests for the same key are coalesced: one
+of them compiles, the others wait for its result. Within a process this is done with a future per
+key, across processes with lock files, shared by the keys hashing to the same one of 256.
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from concurrent.futures import Future
+import fcntl
+from functools import cache
+import hashlib
+import json
+import os
+from pathlib import Path
+import tempfile
+import threading
+from typing import Callable, Mapping
+
+
+@cache
+def compiler_version() -> str:
+    """Hash of the compiler's own source, so that any change to the compiler invalidates the cache."""
+    h = hashlib.sha256()
+    for path in sorted(Path(__file__).parent.glob('*.py')):
+        h.update(path.name.encode())
+        h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+def cache_key(source_code: str, options: Mapping[str, str | int | bool] = {}) -> str:
+    h = hashlib.sha256()
+    h.update(compiler_version().encode())
+    h.update(json.dumps(options, sort_keys=True).encode())
+    h.update(source_code.encode())
+    return h.hexdigest()
+
+
+class CompileCache:
+    def __init__(self, directory: str | None = None, max_memory_bytes: int = 64 << 20, max_disk_bytes: int = 1 << 30) -> None:
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_bytes = 0
+        self._in_flight: dict[str, Future[bytes]] = {}
+        self._lock = threading.Lock()
+        self._counts = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0, 'disk_evictions': 0}
+        if directory is not None:
+            os.makedirs(os.path.join(directory, 'locks'), exist_ok=True)
+
+    def get_or_compile(self, key: str, compile: Callable[[], bytes]) -> bytes:
+        """Returns the cached executable for key, calling compile() if no one has compiled it yet.
+
+        Failed compiles are not cached; callers waiting for one get its exception.
+        """
+        with self._lock:
+            executable = self._memory.get(key)
+            if executable is not None:
+                self._memory.move_to_end(key)
+                self._counts['memory_hits'] += 1
+                return executable
+            future = self._in_flight.get(key)
+            leader = future is None
+            if future is None:
+                future = self._in_flight[key] = Future()
+            else:
+                self._counts['coalesced'] += 1
+        if not leader:
+            return future.result()
+
+        try:
+            executable = self._load_or_compile(key, compile)
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._store_in_memory(key, executable)
+            del self._in_flight[key]
+        future.set_result(executable)
+        return executable
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return self._counts | {'memory_entries': len(self._memory), 'memory_bytes': self._memory_bytes}
+
+    def _load_or_compile(self, key: str, compile: Callable[[], bytes]) -> bytes:
+        if self.directory is None:
+            return self._compile(compile)
+        path = os.path.join(self.directory, key)
+        executable = self._read(path)
+        if executable is not None:
+            return executable
+        # Other processes compiling the same key hold its lock file until the entry is written
+        lock_path = os.path.join(self.directory, 'locks', hashlib.sha256(key.encode()).hexdigest()[:2])
+        with open(lock_path, 'ab') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                executable = self._read(path)
+                if executable is not None:
+                    return executable
+                executable = self._compile(compile)
+                # Written under a temporary name and renamed, so readers never see a partial entry
+                fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=key, suffix='.tmp')
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(executable)
+                os.replace(tmp_path, path)
+                self._evict_from_disk()
+                return executable
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self, path: str) -> bytes | None:
+        try:
+            with open(path, 'rb') as f:
+                executable = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass # Evicted meanwhile, or a directory this process may only read
+        with self._lock:
+            self._counts['disk_hits'] += 1
+        return executable
+
+    def _evict_from_disk(self) -> None:
+        assert self.directory is not None
+        entries: list[tuple[int, str, int]] = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.is_file() or entry.name.endswith('.tmp'):
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime_ns, entry.path, st.st_size))
+                total += st.st_size
+        entries.sort()
+        for _, path, size in entries:
+            if total <= self.max_disk_bytes:
+                break
+            total -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue # Another process evicted it first
+            with self._lock:
+                self._counts['disk_evictions'] += 1
+
+    def _compile(self, compile: Callable[[], bytes]) -> bytes:
+        with self._lock:
+            self._counts['misses'] += 1
+        return compile()
+
+    def _store_in_memory(self, key: str, executable: bytes) -> None:
+        if len(executable) > self.max_memory_bytes:
+            return
+        self._memory[key] = executable
+        self._memory_bytes += len(executable)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self._counts['evictions'] += 1
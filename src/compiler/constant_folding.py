@@ -0,0 +1,117 @@
+"""Constant folding and propagation on a function's IR.
+
+A Call to an operator whose arguments all have known constant values is replaced by loading its
+result, a Copy of a constant becomes a load of it, and a CondJump on a constant becomes a Jump.
+A variable has a known value at a use if every definition of it reaching the use loads the same
+constant, so constants propagate across blocks along the reaching definitions. Folding one
+instruction can make the values of others known, so the pass repeats until nothing changes.
+
+Results are computed with the semantics of the intrinsics (see runtime). Operations that trap at
+run time, division by zero and dividing the smallest Int by -1, are left for the program to do.
+"""
+from __future__ import annotations
+from collections import Counter
+from typing import Callable
+from compiler import cfg, dataflow, intrinsics, ir, runtime
+from compiler.classes import Location
+from compiler.runtime import INT_MIN
+
+type Constant = int | bool
+
+_operators: dict[str, Callable[..., Constant]] = {
+    name: f for name, f in runtime.builtin_functions.items() if name in intrinsics.all_intrinsics
+}
+
+
+def fold_constants(instructions: list[ir.Instruction], stats: Counter[str]) -> list[ir.Instruction]:
+    while True:
+        graph = cfg.build_cfg(instructions)
+        if not _fold(graph, stats):
+            return instructions
+        instructions = graph.instructions()
+
+
+def evaluate(op: str, args: list[Constant]) -> Constant | None:
+    """The value of an operator applied to constants, or None if it has to be left to run time."""
+    f = _operators.get(op)
+    if f is None:
+        return None
+    if op in ('/', '%') and (args[1] == 0 or (args[0] == INT_MIN and args[1] == -1)):
+        return None
+    return f(*args)
+
+
+def load(location: Location, value: Constant, dest: ir.IRVar) -> ir.Instruction:
+    if type(value) is bool:
+        return ir.LoadBoolConst(location, value, dest)
+    return ir.LoadIntConst(location, value, dest)
+
+
+def _fold(graph: cfg.CFG, stats: Counter[str]) -> bool:
+    """Folds what the current reaching definitions allow, returning whether anything changed."""
+    reach = dataflow.reaching_definitions(graph)
+    written = {d.var for d in reach.definitions}
+    # The value each definition gives its variable, if it is a constant
+    constants: list[Constant | None] = []
+    of_var: dict[ir.IRVar, int] = {}
+    for i, d in enumerate(reach.definitions):
+        insn = graph.blocks[d.block].instructions[d.index] if d.block >= 0 else None
+        constants.append(insn.value if isinstance(insn, (ir.LoadIntConst, ir.LoadBoolConst)) else None)
+        of_var[d.var] = of_var.get(d.var, 0) | 1 << i
+    # Definitions are numbered parameters first, then block by block in instruction order
+    first_definition = [0] * len(graph.blocks)
+    n = len(graph.fun.params or [])
+    for block in graph.blocks:
+        first_definition[block.index] = n
+        n += sum(1 for insn in block.instructions if dataflow.written(insn) is not None)
+
+    changed = False
+    for index in graph.reverse_postorder():
+        block = graph.blocks[index]
+        # The variables defined in this block so far, with the constant they hold if any
+        local: dict[ir.IRVar, Constant | None] = {}
+        definition = first_definition[index]
+
+        def value(var: ir.IRVar) -> Constant | None:
+            if var in local:
+                return local[var]
+            if var not in written:
+                return None
+            reaching = reach.reach_in[index] & of_var[var]
+            result: Constant | None = None
+            for i in dataflow.bits(reaching):
+                c = constants[i]
+                if c is None or (result is not None and (c != result or type(c) is not type(result))):
+                    return None
+                result = c
+            return result
+
+        for position, insn in enumerate(block.instructions):
+            new: ir.Instruction | None = None
+            match insn:
+                case ir.Call() if insn.fun not in written:
+                    args = [c for arg in insn.args if (c := value(arg)) is not None]
+                    if len(args) == len(insn.args):
+                        result = evaluate(insn.fun.name, args)
+                        if result is not None:
+                            new = load(insn.location, result, insn.dest)
+                            stats['folded'] += 1
+                case ir.Copy():
+                    source = value(insn.source)
+                    if source is not None:
+                        new = load(insn.location, source, insn.dest)
+                        stats['propagated'] += 1
+                case ir.CondJump():
+                    condition = value(insn.cond)
+                    if condition is not None:
+                        new = ir.Jump(insn.location, insn.then_label if condition else insn.else_label)
+                        stats['branches'] += 1
+            if new is not None:
+                block.instructions[position] = insn = new
+                changed = True
+            if (var := dataflow.written(insn)) is not None:
+                c = insn.value if isinstance(insn, (ir.LoadIntConst, ir.LoadBoolConst)) else None
+                local[var] = c
+                constants[definition] = c
+                definition += 1
+    return changed
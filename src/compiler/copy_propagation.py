@@ -0,0 +1,176 @@
+"""Copy propagation and coalescing on a function's IR.
+
+ir_generator goes through a Copy for every var, assignment, and if, and or or result, and each one
+costs the generated code two movqs through %rax.
+
+propagate_copies() makes instructions read the source of a Copy instead of its destination,
+wherever the Copy is available: it is on every path to the use, with neither variable written
+since. Copies of copies are followed over several rounds, and Copies left without readers are then
+removed by dead_code.
+
+coalesce() merges the two variables of a Copy into one when they don't interfere, that is, when
+neither is written while the other is live, other than by the Copy itself. The Copy then copies a
+variable onto itself and is removed, and the function needs fewer variables, so fewer stack slots.
+Parameters keep their names: a variable merged with one takes the parameter's name, and two
+parameters are never merged.
+"""
+from __future__ import annotations
+from collections import Counter
+import operator
+from typing import Iterable
+from compiler import cfg, dataflow, ir
+
+
+def propagate_copies(instructions: list[ir.Instruction], stats: Counter[str]) -> list[ir.Instruction]:
+    while True:
+        graph = cfg.build_cfg(instructions)
+        if not _propagate(graph, stats):
+            return instructions
+        instructions = graph.instructions()
+
+
+def _propagate(graph: cfg.CFG, stats: Counter[str]) -> bool:
+    """Propagates the copies available in the current instructions, returning whether any use changed."""
+    # Copies are numbered in instruction order, as bit positions
+    copies: list[ir.Copy] = []
+    involving: dict[ir.IRVar, int] = {} # The copies from or to each variable
+    to_var: dict[ir.IRVar, int] = {}
+    for block in graph.blocks:
+        for insn in block.instructions:
+            if isinstance(insn, ir.Copy) and insn.source != insn.dest:
+                bit = 1 << len(copies)
+                copies.append(insn)
+                involving[insn.source] = involving.get(insn.source, 0) | bit
+                involving[insn.dest] = involving.get(insn.dest, 0) | bit
+                to_var[insn.dest] = to_var.get(insn.dest, 0) | bit
+    if not copies:
+        return False
+
+    # Per block, the copies available at its end that it makes so, and those writing a variable kills
+    generated = [0] * len(graph.blocks)
+    killed = [0] * len(graph.blocks)
+    first_copy = [0] * len(graph.blocks)
+    n = 0
+    for block in graph.blocks:
+        first_copy[block.index] = n
+        for insn in block.instructions:
+            if (var := dataflow.written(insn)) is not None:
+                generated[block.index] &= ~involving.get(var, 0)
+                killed[block.index] |= involving.get(var, 0)
+            if isinstance(insn, ir.Copy) and insn.source != insn.dest:
+                generated[block.index] |= 1 << n
+                n += 1
+    available_in, _ = dataflow.solve(
+        graph,
+        lambda i, facts: generated[i] | (facts & ~killed[i]),
+        forward=True,
+        meet=operator.and_,
+        initial=(1 << len(copies)) - 1,
+    )
+
+    changed = False
+    for index in graph.reverse_postorder():
+        block = graph.blocks[index]
+        available = available_in[index]
+        n = first_copy[index]
+
+        def source(var: ir.IRVar) -> ir.IRVar:
+            nonlocal changed
+            copy = available & to_var.get(var, 0)
+            if not copy:
+                return var
+            # Writing a variable kills the copies to it, so only one can be available
+            changed = True
+            stats['propagated'] += 1
+            return copies[copy.bit_length() - 1].source
+
+        for position, insn in enumerate(block.instructions):
+            block.instructions[position] = dataflow.rename(insn, source)
+            # What is available follows the original instructions, whose copies the bits stand for
+            if (var := dataflow.written(insn)) is not None:
+                available &= ~involving.get(var, 0)
+            if isinstance(insn, ir.Copy) and insn.source != insn.dest:
+                available |= 1 << n
+                n += 1
+    return changed
+
+
+def coalesce(instructions: list[ir.Instruction], stats: Counter[str]) -> list[ir.Instruction]:
+    graph = cfg.build_cfg(instructions)
+    live = dataflow.liveness(graph)
+    index = live.vars.index
+    params = {index[param] for param in graph.fun.params or []}
+
+    # The variables each one interferes with. Sets of indices rather than bitsets, as each holds
+    # few of a function's variables.
+    conflicts: list[set[int]] = [set() for _ in live.vars.vars]
+
+    def interfere(var: int, alive: Iterable[int]) -> None:
+        for other in alive:
+            if other != var:
+                conflicts[var].add(other)
+                conflicts[other].add(var)
+
+    for param in params:
+        interfere(param, dataflow.bits(live.live_in[0] if graph.blocks else 0))
+    for block in graph.blocks:
+        alive = set(dataflow.bits(live.live_out[block.index]))
+        for insn in reversed(block.instructions):
+            if (var := dataflow.written(insn)) is not None:
+                dest = index[var]
+                alive.discard(dest)
+                if isinstance(insn, ir.Copy) and (source := index.get(insn.source)) in alive:
+                    # The Copy leaves both variables with the same value
+                    alive.remove(source)
+                    interfere(dest, alive)
+                    alive.add(source)
+                else:
+                    interfere(dest, alive)
+            alive.update(i for var in dataflow.reads(insn) if (i := index.get(var)) is not None)
+
+    # Union-find over the variables, with the members and conflicts of each class kept at its root
+    parent = list(range(len(live.vars.vars)))
+    members = [[i] for i in parent]
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for block in graph.blocks:
+        for insn in block.instructions:
+            if not isinstance(insn, ir.Copy) or insn.source not in index or insn.dest not in index:
+                continue
+            a, b = find(index[insn.source]), find(index[insn.dest])
+            if a == b or (a in params and b in params):
+                continue
+            small, large = (a, b) if len(members[a]) < len(members[b]) else (b, a)
+            if any(m in conflicts[large] for m in members[small]):
+                continue
+            if b in params:
+                a, b = b, a
+            parent[b] = a
+            # The smaller class is added to the larger, keeping merges O(n log n) in all
+            if len(members[a]) < len(members[b]):
+                members[a], members[b] = members[b], members[a]
+            if len(conflicts[a]) < len(conflicts[b]):
+                conflicts[a], conflicts[b] = conflicts[b], conflicts[a]
+            members[a] += members[b]
+            conflicts[a] |= conflicts[b]
+            members[b] = []
+            conflicts[b] = set()
+            stats['coalesced'] += 1
+
+    def name(var: ir.IRVar) -> ir.IRVar:
+        i = index.get(var)
+        return var if i is None else live.vars.vars[find(i)]
+
+    result: list[ir.Instruction] = [graph.fun]
+    for insn in graph.instructions()[1:]:
+        insn = dataflow.rename(insn, name, name)
+        if isinstance(insn, ir.Copy) and insn.source == insn.dest:
+            stats['copies'] += 1
+            continue
+        result.append(insn)
+    return result
@@ -0,0 +1,147 @@
+"""Removes code from a function's IR that can't run or whose results are never used.
+
+In order, the pass
+- retargets jumps that land on a block doing nothing but going on to another, to that block,
+- removes blocks that can't be reached from the entry, such as code after a Return or a break,
+- removes instructions whose only effect is writing a variable that is dead afterwards: loads,
+  Copies and Calls to operators, except / and % which trap when dividing by zero,
+- removes Jumps to the instruction right after them, and the Labels no jump refers to.
+Calls to other functions, print_int, print_bool and read_int included, are always kept.
+"""
+from __future__ import annotations
+from collections import Counter
+from compiler import cfg, dataflow, intrinsics, ir
+
+_pure_operators = frozenset(intrinsics.all_intrinsics) - {'/', '%'}
+
+
+def eliminate_dead_code(instructions: list[ir.Instruction], stats: Counter[str]) -> list[ir.Instruction]:
+    graph = cfg.build_cfg(instructions)
+    # Removing instructions can leave blocks empty, making more jumps to thread
+    changed = True
+    while changed:
+        changed = _thread_jumps(graph, stats)
+        _remove_unreachable_blocks(graph, stats)
+        while _remove_dead_instructions(graph, stats):
+            changed = True
+    return _remove_labels(_remove_jumps_to_next(graph.instructions(), stats), stats)
+
+
+def is_pure(insn: ir.Instruction, written: set[ir.IRVar] | frozenset[ir.IRVar] = frozenset()) -> bool:
+    """Whether removing the instruction changes nothing but the variable it writes.
+
+    written holds the variables the function writes, which a Call can't be calling an operator through.
+    """
+    if isinstance(insn, (ir.LoadIntConst, ir.LoadBoolConst, ir.Copy)):
+        return True
+    return isinstance(insn, ir.Call) and insn.fun.name in _pure_operators and insn.fun not in written
+
+
+def _thread_jumps(graph: cfg.CFG, stats: Counter[str]) -> bool:
+    # Where a jump to each label may go instead, for blocks consisting of the label and a Jump, or
+    # of just the label, falling through to the next block
+    forward: dict[str, str] = {}
+    for block in graph.blocks:
+        if (label := block.label) is None:
+            continue
+        if len(block.instructions) == 2 and isinstance(jump := block.instructions[1], ir.Jump):
+            forward[label.name] = jump.label.name
+        elif len(block.instructions) == 1 and block.index + 1 < len(graph.blocks):
+            next_label = graph.blocks[block.index + 1].label
+            assert next_label is not None # Only a label starts a block after one that falls through
+            forward[label.name] = next_label.name
+    if not forward:
+        return False
+    labels = {label.name: label for block in graph.blocks if (label := block.label) is not None}
+    changed = False
+
+    def target(label: ir.Label) -> ir.Label:
+        name = label.name
+        seen = {name}
+        while name in forward and forward[name] not in seen: # Stops at a loop of empty blocks
+            name = forward[name]
+            seen.add(name)
+        return labels[name]
+
+    for block in graph.blocks:
+        if not block.instructions: # The entry, emptied by removing dead instructions
+            continue
+        last = block.instructions[-1]
+        new: ir.Instruction = last
+        if isinstance(last, ir.Jump):
+            new = ir.Jump(last.location, target(last.label))
+        elif isinstance(last, ir.CondJump):
+            then_label, else_label = target(last.then_label), target(last.else_label)
+            if then_label.name == else_label.name:
+                new = ir.Jump(last.location, then_label)
+            else:
+                new = ir.CondJump(last.location, last.cond, then_label, else_label)
+        if new != last:
+            block.instructions[-1] = new
+            stats['threaded'] += 1
+            changed = True
+    cfg.connect(graph)
+    return changed
+
+
+def _remove_unreachable_blocks(graph: cfg.CFG, stats: Counter[str]) -> None:
+    for block in cfg.remove_unreachable(graph):
+        stats['unreachable_blocks'] += 1
+        stats['instructions'] += len(block.instructions)
+
+
+def _remove_dead_instructions(graph: cfg.CFG, stats: Counter[str]) -> bool:
+    """Removes the dead pure instructions, returning whether there were any."""
+    live = dataflow.liveness(graph)
+    index = live.vars.index
+    written = set(index)
+    changed = False
+    for block in graph.blocks:
+        alive = live.live_out[block.index]
+        kept: list[ir.Instruction] = []
+        for insn in reversed(block.instructions):
+            var = dataflow.written(insn)
+            if var is not None:
+                bit = 1 << index[var]
+                if not alive & bit and is_pure(insn, written):
+                    stats['instructions'] += 1
+                    changed = True
+                    continue
+                alive &= ~bit
+            alive |= live.vars.bitset(dataflow.reads(insn))
+            kept.append(insn)
+        kept.reverse()
+        block.instructions = kept
+    return changed
+
+
+def _remove_jumps_to_next(instructions: list[ir.Instruction], stats: Counter[str]) -> list[ir.Instruction]:
+    result: list[ir.Instruction] = []
+    for i, insn in enumerate(instructions):
+        if isinstance(insn, ir.Jump):
+            # Only labels can stand between the jump and its target
+            j = i + 1
+            while j < len(instructions) and type(label := instructions[j]) is ir.Label and label.name != insn.label.name:
+                j += 1
+            if j < len(instructions) and type(label := instructions[j]) is ir.Label and label.name == insn.label.name:
+                stats['jumps'] += 1
+                continue
+        result.append(insn)
+    return result
+
+
+def _remove_labels(instructions: list[ir.Instruction], stats: Counter[str]) -> list[ir.Instruction]:
+    targets: set[str] = set()
+    for insn in instructions:
+        if isinstance(insn, ir.Jump):
+            targets.add(insn.label.name)
+        elif isinstance(insn, ir.CondJump):
+            targets.add(insn.then_label.name)
+            targets.add(insn.else_label.name)
+    result = []
+    for insn in instructions:
+        if type(insn) is ir.Label and insn.name not in targets:
+            stats['labels'] += 1
+            continue
+        result.append(insn)
+    return result
@@ -0,0 +1,110 @@
+"""Global value numbering over the dominator tree (Briggs, Cooper and Simpson) on a function's IR in SSA form.
+
+An operator Call computing what an earlier one already did, with the same operator on the same
+variables, is redundant if the earlier one dominates it: it always ran before, and in SSA form its
+variables can't have changed since. The redundant Call is removed and its result replaced by the
+earlier one's. The same goes for loading a constant again, for Copies, whose destinations are
+replaced by their sources, and for phis choosing between the same values.
+
+Blocks are visited down the dominator tree with a table of the computations available, from the
+blocks dominating the current one. Operands are put in a canonical order first, so that a + b
+and b + a, or a < b and b > a, count as the same computation. Division and modulo are numbered
+too: if the earlier one didn't trap, neither would the later one.
+"""
+from __future__ import annotations
+from collections import Counter
+from typing import Hashable
+from compiler import dataflow, intrinsics, ir, ssa
+
+_commutative = frozenset(['+', '*', '==', '!='])
+_mirrored = {'>': '<', '>=': '<='}
+
+
+def number_values(instructions: list[ir.Instruction], stats: Counter[str]) -> list[ir.Instruction]:
+    form = ssa.to_ssa(instructions)
+    _number(form, stats)
+    return ssa.from_ssa(form)
+
+
+def _key(insn: ir.Instruction, written: set[ir.IRVar]) -> Hashable | None:
+    """What an instruction computes, the same for instructions computing the same, or None if it has effects."""
+    match insn:
+        case ir.LoadIntConst():
+            return ('int', insn.value)
+        case ir.LoadBoolConst():
+            return ('bool', insn.value)
+        case ir.Call() if insn.fun.name in intrinsics.all_intrinsics and insn.fun not in written:
+            op, args = insn.fun.name, list(insn.args)
+            if op in _mirrored:
+                op, args = _mirrored[op], args[::-1]
+            elif op in _commutative:
+                args.sort(key=lambda var: var.name)
+            return (op, *args)
+    return None
+
+
+def _number(form: ssa.SSA, stats: Counter[str]) -> None:
+    graph = form.cfg
+    written = {dest for block in graph.blocks for insn in block.instructions if (dest := dataflow.written(insn)) is not None}
+    replacement: dict[ir.IRVar, ir.IRVar] = {}
+
+    def number(var: ir.IRVar) -> ir.IRVar:
+        # Phis replaced before their back edges' arguments were numbered can lead to another replacement
+        while var in replacement:
+            var = replacement[var]
+        return var
+
+    available: dict[Hashable, ir.IRVar] = {}
+    added: list[list[Hashable]] = [[] for _ in graph.blocks] # What each block made available
+    walk = [(0, False)] if graph.blocks else []
+    while walk:
+        index, done = walk.pop()
+        if done:
+            for key in added[index]:
+                del available[key]
+            continue
+        walk.append((index, True))
+        block = graph.blocks[index]
+
+        kept: list[ssa.Phi] = []
+        for phi in form.phis[index]:
+            # Arguments from predecessors not visited yet, through back edges, are numbered later
+            phi.args = {p: number(var) for p, var in phi.args.items()}
+            values = set(phi.args.values()) - {phi.dest}
+            key = ('phi', index, *sorted(phi.args.items()))
+            if len(values) == 1:
+                replacement[phi.dest] = values.pop()
+            elif key in available:
+                replacement[phi.dest] = available[key]
+            else:
+                available[key] = phi.dest
+                added[index].append(key)
+                kept.append(phi)
+                continue
+            stats['phis'] += 1
+        form.phis[index] = kept
+
+        instructions: list[ir.Instruction] = []
+        for insn in block.instructions:
+            insn = dataflow.rename(insn, number)
+            if isinstance(insn, ir.Copy):
+                replacement[insn.dest] = insn.source
+                stats['copies'] += 1
+                continue
+            key = _key(insn, written)
+            if key is not None:
+                dest = dataflow.written(insn)
+                assert dest is not None
+                if key in available:
+                    replacement[dest] = available[key]
+                    stats['redundant'] += 1
+                    continue
+                available[key] = dest
+                added[index].append(key)
+            instructions.append(insn)
+        block.instructions = instructions
+
+        for successor in block.successors:
+            for phi in form.phis[successor]:
+                phi.args[index] = number(phi.args[index])
+        walk += ((child, False) for child in reversed(form.dominators.children[index]))
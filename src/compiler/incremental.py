@@ -0,0 +1,189 @@
+from __future__ import annotations
+from array import array
+from bisect import bisect_left, bisect_right
+import copy
+from dataclasses import dataclass
+from compiler import ast
+from compiler.classes import Location, DummyLocation
+from compiler.parser import parse, definition_spans
+from compiler.tokenizer import TokenStream
+
+
+@dataclass
+class Edit:
+    start: int # Offset of the first replaced character in the old source
+    end: int # Offset after the last replaced character
+    text: str # Replacement
+
+
+@dataclass
+class ParsedSource:
+    tokens: TokenStream
+    module: ast.Module
+    def_spans: list[tuple[int, int]] | None # Token ranges of module.defs, None if they couldn't be matched up
+
+
+def parse_source(source_code: str, source_location: str = 'string') -> ParsedSource:
+    tokens = TokenStream(source_code, source_location)
+    return _with_spans(tokens, parse(tokens))
+
+
+def reparse(prev: ParsedSource, edit: Edit) -> ParsedSource:
+    """Applies an edit to a parsed source, reusing everything the edit didn't touch.
+
+    Only the tokens around the edit are scanned again, and only the definitions containing or
+    next to changed tokens are parsed again; the other ast.Definition objects are reused.
+    Edits outside of definitions parse everything after the last untouched definition.
+    Reused nodes after the edit get their locations moved in place, so prev must not be used afterwards.
+    """
+    old = prev.tokens
+    if not 0 <= edit.start <= edit.end <= len(old.source):
+        raise ValueError(f'Edit range {edit.start}..{edit.end} outside of source of length {len(old.source)}')
+    tokens, first, old_end, new_end = _retokenize(old, edit)
+    spans = prev.def_spans
+    if spans is None:
+        return _with_spans(tokens, parse(tokens))
+    defs = prev.module.defs
+    token_delta = new_end - old_end
+
+    # Definitions containing any replaced token, or the unchanged tokens right before and after them
+    lo = bisect_left(spans, first, key=lambda span: span[1])
+    hi = bisect_right(spans, old_end, key=lambda span: span[0])
+    touched_first = max(first - 1, 0)
+    touched_last = min(old_end, len(old) - 1)
+    contiguous = all(spans[k][1] == spans[k + 1][0] for k in range(lo, hi - 1))
+    if lo < hi and contiguous and spans[lo][0] <= touched_first and spans[hi - 1][1] > touched_last:
+        region_start = spans[lo][0]
+        region = tokens.slice(region_start, spans[hi - 1][1] + token_delta)
+        try:
+            region_module = parse(region)
+            region_spans = definition_spans(region)
+        except Exception:
+            region_module = None # Let a full parse report the error
+        new_defs = defs[:lo] + (region_module.defs if region_module else []) + defs[hi:]
+        ends_with_def = spans[-1][1] == len(old)
+        if region_module is not None and region_module.expr is None and len(region_spans) == len(region_module.defs) \
+                and (new_defs or not ends_with_def):
+            moved = _Relocation(old, tokens, edit)
+            expr = prev.module.expr
+            located_at_expr = expr is not None and prev.module.location is expr.location
+            for node in moved.affected(old, spans[hi - 1][1], spans[hi:], defs[hi:], expr):
+                moved.apply(node)
+            # The module is located at its last top level item, and the expression at the first token
+            first_location = tokens.location(0)
+            if ends_with_def:
+                location = new_defs[-1].location
+            elif located_at_expr:
+                location = first_location
+            else:
+                location = moved.location(prev.module.location)
+            if expr is not None:
+                expr.location = first_location
+            new_spans = spans[:lo] + \
+                [(s + region_start, e + region_start) for s, e in region_spans] + \
+                [(s + token_delta, e + token_delta) for s, e in spans[hi:]]
+            return ParsedSource(tokens, ast.Module(new_defs, expr, location=location), new_spans)
+
+    # Parse everything after the untouched definitions at the start, if nothing else precedes them
+    if 0 < lo and all(spans[k][1] == spans[k + 1][0] for k in range(lo - 1)) and spans[0][0] == 0 \
+            and spans[lo - 1][1] < len(tokens):
+        tail_start = spans[lo - 1][1]
+        tail = tokens.slice(tail_start, len(tokens))
+        tail_module = parse(tail)
+        tail_spans = [(s + tail_start, e + tail_start) for s, e in definition_spans(tail)]
+        location = tail_module.location
+        if tail_module.expr is not None:
+            first_location = tokens.location(0)
+            if location is tail_module.expr.location:
+                location = first_location
+            tail_module.expr.location = first_location
+        module = ast.Module(defs[:lo] + tail_module.defs, tail_module.expr, location=location)
+        if len(tail_spans) == len(tail_module.defs):
+            return ParsedSource(tokens, module, spans[:lo] + tail_spans)
+        return ParsedSource(tokens, module, None)
+
+    return _with_spans(tokens, parse(tokens))
+
+
+def _with_spans(tokens: TokenStream, module: ast.Module) -> ParsedSource:
+    spans = definition_spans(tokens)
+    return ParsedSource(tokens, module, spans if len(spans) == len(module.defs) else None)
+
+
+def _retokenize(old: TokenStream, edit: Edit) -> tuple[TokenStream, int, int, int]:
+    """Returns the token stream of the edited source, in which old tokens first..old_end-1
+    were replaced by new tokens first..new_end-1."""
+    delta = len(edit.text) - (edit.end - edit.start)
+    tokens = copy.copy(old)
+    tokens.source = old.source[:edit.start] + edit.text + old.source[edit.end:]
+
+    # A token is unchanged if it ends before the edit: the character that ended it is still there
+    first = bisect_left(old.starts, edit.start)
+    if first > 0 and old.end(first - 1) >= edit.start:
+        first -= 1
+    restart = old.end(first - 1) if first > 0 else 0
+    tokens.kinds = old.kinds[:first]
+    tokens.starts = old.starts[:first]
+    tokens.lengths = old.lengths[:first]
+    tokens.line_starts = old.line_starts[:bisect_right(old.line_starts, restart)]
+
+    # Scan until a token starts after the edit where an old token started, from there on nothing changed
+    old_end = len(old)
+    def resync(pos: int) -> bool:
+        nonlocal old_end
+        if pos < edit.start + len(edit.text):
+            return False
+        j = bisect_left(old.starts, pos - delta, first)
+        if j < len(old) and old.starts[j] == pos - delta:
+            old_end = j
+            return True
+        return False
+    tokens.scan(restart, resync)
+    new_end = len(tokens)
+
+    tokens.kinds.extend(old.kinds[old_end:])
+    tokens.lengths.extend(old.lengths[old_end:])
+    tokens.starts.extend(array('q', [s + delta for s in old.starts[old_end:]]))
+    if old_end < len(old):
+        resync_pos = old.starts[old_end]
+        tokens.line_starts.extend(array('q', [s + delta for s in old.line_starts[bisect_right(old.line_starts, resync_pos):]]))
+    return tokens, first, old_end, new_end
+
+
+class _Relocation:
+    """Maps locations in the old source to locations in the new source, for nodes that were not parsed again."""
+    def __init__(self, old: TokenStream, new: TokenStream, edit: Edit) -> None:
+        self.old_line = bisect_right(old.line_starts, edit.end)
+        self.old_column = edit.end - old.line_starts[self.old_line - 1] + 1
+        new_end = edit.start + len(edit.text)
+        self.new_line = bisect_right(new.line_starts, new_end)
+        self.new_column = new_end - new.line_starts[self.new_line - 1] + 1
+
+    def location(self, loc: Location) -> Location:
+        if isinstance(loc, DummyLocation) or (loc.line, loc.column) < (self.old_line, self.old_column):
+            return loc
+        if loc.line == self.old_line:
+            return Location(loc.file, self.new_line, loc.column - self.old_column + self.new_column)
+        return Location(loc.file, loc.line - self.old_line + self.new_line, loc.column)
+
+    def affected(self, old: TokenStream, pos: int, spans: list[tuple[int, int]],
+                 defs: list[ast.Definition], expr: ast.Expression | None) -> list[ast.Node]:
+        """The nodes to relocate among the definitions after token pos and the module expression."""
+        if self.old_line == self.new_line and self.old_column == self.new_column:
+            return []
+        if self.old_line != self.new_line:
+            return [*defs, *([expr] if expr is not None else [])]
+        # Only the rest of the edited line moves: the definitions starting on it and maybe the expression
+        next_line = old.line_starts[self.old_line] if self.old_line < len(old.line_starts) else len(old.source)
+        line_end = bisect_left(old.starts, next_line)
+        count = bisect_left(spans, line_end, key=lambda span: span[0])
+        expr_on_line = False
+        for start, end in spans[:count]:
+            expr_on_line = expr_on_line or start > pos
+            pos = end
+        expr_on_line = expr_on_line or pos < line_end
+        return [*defs[:count], *([expr] if expr is not None and expr_on_line else [])]
+
+    def apply(self, root: ast.Node) -> None:
+        for node in ast.walk(root):
+            node.location = self.location(node.location)
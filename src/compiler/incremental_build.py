@@ -0,0 +1,126 @@
+"""Compiles a module one function at a time, reusing the output of functions that didn't change.
+
+Every function, and the main expression, is fingerprinted by its tokens and the signatures of the
+functions it refers to. Its optimized IR, assembly and object file are cached under that fingerprint, so after
+an edit only the changed functions go through the back end again before everything is relinked.
+Locations don't affect the fingerprint: moving a function around reuses it, and its cached IR keeps
+the locations of the build that generated it.
+"""
+from __future__ import annotations
+import hashlib
+import os
+import pickle
+import tempfile
+from typing import Iterable
+from compiler import ast, parser, type_checker, ir_generator, ir_optimizer, asm_generator, assembler
+from compiler.compile_cache import compiler_version
+from compiler.tokenizer import TokenStream
+
+
+class IncrementalBuild:
+    def __init__(self, cache_dir: str, link_with_c: bool = False, pass_stats: ir_optimizer.PassStats | None = None) -> None:
+        self.cache_dir = cache_dir
+        self.link_with_c = link_with_c
+        self.pass_stats = pass_stats # Only counts the functions that are optimized again
+        self.rebuilt: list[str] = [] # Functions that weren't cached in the last build
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def compile(self, source_code: str, input_file_name: str = '(source code)') -> bytes:
+        tokens = TokenStream(source_code, input_file_name)
+        module = parser.parse(tokens)
+        type_checker.typecheck_module(module)
+
+        units = _fingerprints(tokens, module)
+        module_scope = ir_generator.global_scope(module)
+        self.rebuilt = []
+        object_files = [self._stdlib_object()]
+        for name, (fingerprint, node, definition) in units.items():
+            object_files.append(self._object(fingerprint, name, module_scope, node, definition))
+
+        with tempfile.TemporaryDirectory(prefix='compiler_') as workdir:
+            output_file = os.path.join(workdir, 'a.out')
+            assembler.link(object_files, output_file, self.link_with_c)
+            with open(output_file, 'rb') as f:
+                return f.read()
+
+    def _object(
+            self,
+            fingerprint: str,
+            name: str,
+            module_scope: ir_generator.GlobalScope,
+            node: ast.Expression,
+            definition: ast.Definition | None
+    ) -> str:
+        """Path of the object file of a function, building whatever isn't cached yet."""
+        base = os.path.join(self.cache_dir, fingerprint)
+        if os.path.exists(base + '.o'):
+            return base + '.o'
+        self.rebuilt.append(name)
+        if os.path.exists(base + '.s'):
+            with open(base + '.s') as f:
+                asm = f.read()
+        else:
+            if os.path.exists(base + '.ir'):
+                with open(base + '.ir', 'rb') as f:
+                    instructions = pickle.load(f)
+            else:
+                instructions = ir_generator.def_to_ir(module_scope, node, definition)
+                instructions = ir_optimizer.optimize({name: instructions}, self.pass_stats)[name]
+                self._write(base + '.ir', pickle.dumps(instructions))
+            asm = asm_generator.generate_asm({name: instructions}) + '\n'
+            self._write(base + '.s', asm.encode())
+        self._assemble(asm, base + '.o')
+        return base + '.o'
+
+    def _stdlib_object(self) -> str:
+        code = assembler.stdlib_code(self.link_with_c)
+        path = os.path.join(self.cache_dir, hashlib.sha256(code.encode()).hexdigest() + '.o')
+        if not os.path.exists(path):
+            self._assemble(code, path)
+        return path
+
+    def _assemble(self, asm: str, path: str) -> None:
+        # Assembled in a private directory and moved in place, so concurrent builds never see a partial file
+        with tempfile.TemporaryDirectory(dir=self.cache_dir) as workdir:
+            tmp_path = os.path.join(workdir, 'out.o')
+            assembler.assemble_object(asm, tmp_path)
+            os.replace(tmp_path, path)
+
+    def _write(self, path: str, data: bytes) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+def _fingerprints(tokens: TokenStream, module: ast.Module) -> dict[str, tuple[str, ast.Expression, ast.Definition | None]]:
+    """Fingerprint, IR root node and definition of every function in the module, and of main."""
+    signatures = {d.name: str(d.type) for d in module.defs}
+    spans = parser.definition_spans(tokens)
+    matched = len(spans) == len(module.defs)
+    if not matched:
+        # Can't tell which tokens belong to which function, so everything depends on all of them
+        spans = [(0, len(tokens))] * len(module.defs)
+    in_definitions = [False] * len(tokens)
+    for start, end in spans:
+        in_definitions[start:end] = [True] * (end - start)
+
+    def fingerprint(kind: str, token_indices: Iterable[int], root: ast.Node) -> str:
+        h = hashlib.sha256()
+        h.update(f'{compiler_version()}\0{kind}\0'.encode())
+        for i in token_indices:
+            h.update(tokens.text(i).encode())
+            h.update(b'\0')
+        # The signatures of the called functions decide the types of the results in this one
+        called = sorted({node.id.name for node in ast.walk(root) if isinstance(node, ast.Function)} & signatures.keys())
+        for name in called:
+            h.update(f'{name}: {signatures[name]}\0'.encode())
+        return h.hexdigest()
+
+    units: dict[str, tuple[str, ast.Expression, ast.Definition | None]] = {}
+    for d, (start, end) in zip(module.defs, spans):
+        units[d.name] = (fingerprint('fun', range(start, end), d), d.block, d)
+    if module.expr is not None:
+        main_tokens = (i for i in range(len(tokens)) if not (matched and in_definitions[i]))
+        units['main'] = (fingerprint('main', main_tokens, module.expr), module.expr, None)
+    return units
@@ -1,7 +1,6 @@
 from __future__ import annotations
 from typing import Any, Callable
-from compiler import ast
-from compiler.symtab import SymTab
+from compiler import ast, resolver
 import operator
 
 type Value = int | bool | function | None
@@ -15,7 +14,7 @@ def and_op(a: bool, b: bool) -> bool:
 def or_op(a: bool, b: bool) -> bool:
     return a or b
 
-default_symtab: SymTab = SymTab[Value](None, {
+builtin_values: dict[str, Value] = {
     'print_int': print,
     'print_bool': print,
     'read_int': read_int,
@@ -32,79 +31,81 @@ default_symtab: SymTab = SymTab[Value](None, {
     '>=': operator.ge,
     'and': and_op,
     'or': or_op,
-})
+}
 
-def interpret(node: ast.Expression, symtab: SymTab = default_symtab) -> Value:
+# The values of the variables in each open scope, indexed by the depth and slot the resolver gave them
+type Scopes = list[list[Value]]
+
+def interpret(node: ast.Expression) -> Value:
+    names = list(builtin_values)
+    scope_size = resolver.resolve(node, names)
+    return _interpret(node, [[*builtin_values.values(), *[None] * (scope_size - len(names))]])
+
+def _interpret(node: ast.Expression, scopes: Scopes) -> Value:
     match node:
         case ast.Literal():
             return node.value
         
         case ast.Identifier():
-            val = symtab.get(node.name)
-            if val is None:
-                raise ValueError(f'{node.location}: undefined identifier {node.name}')
-            return val
+            return scopes[node.depth][node.slot]
         
         case ast.BinaryOp():
-            a: Any = interpret(node.left, symtab)
+            a: Any = _interpret(node.left, scopes)
             if node.op == 'and' and a is False: return False
             if node.op == 'or' and a is True: return True
-            b: Any = interpret(node.right, symtab)
+            b: Any = _interpret(node.right, scopes)
             if node.op == '=':
                 if not isinstance(node.left, ast.Identifier):
                     raise TypeError(f'{node.location}: left side of assignment isn\'t an identifier')
                 else:
-                    key = node.left.name
-                    if symtab.get(key) is None:
-                        raise ValueError(f'{node.location}: undefined variable "{a.name}"')
-                    symtab.set(key, b)
+                    scopes[node.left.depth][node.left.slot] = b
                     return b
-            op: Any = symtab.get(node.op)
+            op: Any = builtin_values.get(node.op)
             if op is None:
                 raise ValueError(f'{node.location}: undefined operator {node.op}')
             return op(a, b)
         
         case ast.UnaryOp():
             if node.op == 'unary_not':
-                return not interpret(node.param, symtab)
+                return not _interpret(node.param, scopes)
             if node.op == 'unary_-':
-                param = interpret(node.param, symtab)
+                param = _interpret(node.param, scopes)
                 if isinstance(param, int):
                     return -param
                 raise TypeError(f'{node.param.location}: expected an integer')
             if node.op == '()':
-                return interpret(node.param, symtab)
+                return _interpret(node.param, scopes)
         
         case ast.If():
-            if interpret(node.condition, symtab):
-                return interpret(node.true_branch, symtab)
+            if _interpret(node.condition, scopes):
+                return _interpret(node.true_branch, scopes)
             else:
                 if node.false_branch is not None:
-                    return interpret(node.false_branch, symtab)
+                    return _interpret(node.false_branch, scopes)
                 else:
                     return None
             
         case ast.Function():
-            func: Any = symtab.get(node.id.name)
+            func: Any = scopes[node.id.depth][node.id.slot]
             if callable(func):
-                args: list[Value] = [interpret(arg, symtab) for arg in node.args]
+                args: list[Value] = [_interpret(arg, scopes) for arg in node.args]
                 return func(*args) # type: ignore
             raise ValueError(f'{node.location}: undefined function "{node.id}"')
         
         case ast.Block():
-            block_st = SymTab[Value](symtab)
+            scopes.append([None] * node.scope_size)
             for expr in node.exprs:
-                interpret(expr, block_st)
-            if node.res is not None:
-                return interpret(node.res, block_st)
-            return None
+                _interpret(expr, scopes)
+            res = None if node.res is None else _interpret(node.res, scopes)
+            scopes.pop()
+            return res
             
         case ast.While():
-            while interpret(node.condition, symtab):
-                interpret(node.expr, symtab)
+            while _interpret(node.condition, scopes):
+                _interpret(node.expr, scopes)
             return None
         
         case ast.Var():
-            symtab.set(node.id.name, interpret(node.expr, symtab))
+            scopes[node.id.depth][node.id.slot] = _interpret(node.expr, scopes)
         
     return None
\ No newline at end of file
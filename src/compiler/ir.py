@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 import dataclasses
-from typing import Any
+from typing import Any, Container
 from compiler.classes import Location
 
 @dataclass(frozen=True)
@@ -78,4 +78,26 @@ class Fun(Label):
 
 @dataclass(frozen=True)
 class Return(Instruction):
-    var: IRVar | None
\ No newline at end of file
+    var: IRVar | None
+
+
+class NameSupply:
+    """Fresh names for variables or labels: prefix, prefix2, prefix3, ... for each prefix.
+
+    Every prefix has its own counter, so a name is found in amortized O(1), and names never clash
+    with each other or with the reserved ones. The names only depend on the order of the requests.
+    """
+    def __init__(self, *reserved: Container[str]) -> None:
+        self.reserved = reserved
+        self.taken: set[str] = set()
+        self.counters: dict[str, int] = {}
+
+    def fresh(self, prefix: str) -> str:
+        n = self.counters.get(prefix, 1)
+        name = prefix if n == 1 else f'{prefix}{n}'
+        while name in self.taken or any(name in names for names in self.reserved):
+            n += 1
+            name = f'{prefix}{n}'
+        self.counters[prefix] = n + 1
+        self.taken.add(name)
+        return name
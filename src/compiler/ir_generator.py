@@ -1,30 +1,46 @@
-from compiler import ast, ir, builtins
-from compiler.symtab import SymTab
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping
+from compiler import ast, ir, builtins, trampoline
 from compiler.types import Bool, Int, Type, Unit
-from compiler.classes import DummyLocation
+from compiler.classes import DUMMY_LOCATION, Location
+from compiler.trampoline import Step
 
 def generate_ir(module: ast.Module) -> dict[str, list[ir.Instruction]]:
-    root_types = builtins.builtin_var_types.copy()
-    def_types = {ir.IRVar(d.name): d.type for d in module.defs}
-    root_types = root_types | def_types # Add user defined functions to root types
+    module_scope = global_scope(module)
 
     def_ins: dict[str, list[ir.Instruction]] = {}
-    labels: set[str] = set()
     for d in module.defs:
-        def_ins[d.name] = def_to_ir(root_types, d.block, labels, d)
+        def_ins[d.name] = def_to_ir(module_scope, d.block, d)
     if module.expr:
-        def_ins['main'] = def_to_ir(root_types, module.expr, labels, None)
+        def_ins['main'] = def_to_ir(module_scope, module.expr, None)
 
     return def_ins
 
 
+@dataclass(frozen=True)
+class GlobalScope:
+    """The variables visible everywhere in the module: builtins and the module's functions.
+
+    Built once per module and shared, unmodified, by every function's IR generation.
+    """
+    vars: tuple[ir.IRVar, ...] # In the order of their slots in the module scope
+    types: Mapping[ir.IRVar, Type]
+    names: frozenset[str]
+
+
+def global_scope(module: ast.Module) -> GlobalScope:
+    types = builtins.builtin_var_types | {ir.IRVar(d.name): d.type for d in module.defs}
+    return GlobalScope(tuple(types), MappingProxyType(types), frozenset(v.name for v in types))
+
+
 def def_to_ir(
-        root_types: dict[ir.IRVar, Type],
+        module_scope: GlobalScope,
         root_node: ast.Expression,
-        labels: set[str],
         fun_def: ast.Definition | None
 ) -> list[ir.Instruction]:
-    var_types: dict[ir.IRVar, Type] = root_types.copy()
+    """IR of one function, or of main if fun_def is None. Label names are only unique within the function."""
+    var_types: dict[ir.IRVar, Type] = {} # The function's own variables, the shared ones stay in module_scope
     var_params: list[ir.IRVar] = []
     if fun_def:
         for i in range(len(fun_def.params)):
@@ -34,30 +50,48 @@ def def_to_ir(
 
     var_unit = ir.IRVar('unit')
     var_types[var_unit] = Unit()
-    
-    def find_unique(s: str, strings: list[str]) -> str:
-        overlap_counter = 1
-        res = s
-        while res in strings:
-            overlap_counter += 1
-            res = s + str(overlap_counter)
-        return res
+    var_names = ir.NameSupply({v.name for v in var_types}, module_scope.names)
+    label_names = ir.NameSupply()
 
     def new_var(t: Type) -> ir.IRVar:
-        var_name = find_unique('x', [v.name for v in var_types.keys()])
-        var_new = ir.IRVar(var_name)
+        var_new = ir.IRVar(var_names.fresh('x'))
         var_types[var_new] = t
         return var_new
     
     def new_label(label_name: str = 'label') -> ir.Label:
-        label_name = find_unique(label_name, list(labels))
-        labels.add(label_name)
-        result_label = ir.Label(DummyLocation(), label_name)
-        return result_label
+        return ir.Label(DUMMY_LOCATION, label_names.fresh(label_name))
 
     ins: list[ir.Instruction] = []
 
-    def visit(st: SymTab[ir.IRVar], expr: ast.Expression, break_label: None | ir.Label = None, continue_label: None | ir.Label = None) -> ir.IRVar:
+    # The variables of each open scope, indexed by the depth and slot the resolver gave them.
+    # The IR is generated in source order, so each scope's variables are appended in slot order.
+    scopes: list[list[ir.IRVar]] = [[]] # Depth 0 is module_scope.vars
+
+    def lookup(identifier: ast.Identifier) -> ir.IRVar:
+        if identifier.depth == 0:
+            return module_scope.vars[identifier.slot]
+        return scopes[identifier.depth][identifier.slot]
+
+    # Operands are evaluated left to right. An operand that is a variable is only read when the
+    # operation runs, so if a later operand assigns to it, its value is copied before that operand.
+    assignments = 0
+    last_assigned: dict[ir.IRVar, int] = {} # Value of assignments after each variable's last assignment
+
+    def assign(loc: Location, source: ir.IRVar, dest: ir.IRVar) -> None:
+        nonlocal assignments
+        assignments += 1
+        last_assigned[dest] = assignments
+        ins.append(ir.Copy(loc, source, dest))
+
+    def keep(var: ir.IRVar, operand: ast.Expression, position: int, mark: int) -> ir.IRVar:
+        """The value var had when position was the end of ins and mark the number of assignments."""
+        if last_assigned.get(var, 0) <= mark:
+            return var
+        var_copy = new_var(operand.type)
+        ins.insert(position, ir.Copy(operand.location, var, var_copy))
+        return var_copy
+
+    def visit(expr: ast.Expression, break_label: None | ir.Label = None, continue_label: None | ir.Label = None) -> Step[ir.IRVar]:
         loc = expr.location
         match expr:
             case ast.Literal():
@@ -79,10 +113,10 @@ def def_to_ir(
                 return var
             
             case ast.Identifier():
-                return st.require(expr.name)
+                return lookup(expr)
             
             case ast.BinaryOp():
-                var_left = visit(st, expr.left, break_label, continue_label)
+                var_left = yield visit(expr.left, break_label, continue_label)
 
                 if expr.op in ['and', 'or']:
                     l_right = new_label(f'{expr.op}_right')
@@ -100,7 +134,7 @@ def def_to_ir(
 
                     ins.append(l_right)
 
-                    var_right = visit(st, expr.right, break_label, continue_label)
+                    var_right = yield visit(expr.right, break_label, continue_label)
 
                     var_result = new_var(Bool())
 
@@ -118,20 +152,17 @@ def def_to_ir(
                     ins.append(l_end)
                     return var_result
 
-                var_right = visit(st, expr.right, break_label, continue_label)
+                position, mark = len(ins), assignments
+                var_right = yield visit(expr.right, break_label, continue_label)
                 
                 if expr.op == '=':
-                    ins.append(ir.Copy(
-                        loc, var_right, var_left
-                    ))
+                    assign(loc, var_right, var_left)
                     return var_left
+                var_left = keep(var_left, expr.left, position, mark)
 
                 var_result = new_var(expr.type)
                 
-                if expr.op in ['==', '!=']: # funny special cases
-                    var_op = ir.IRVar(expr.op)
-                else:
-                    var_op = st.require(expr.op)
+                var_op = ir.IRVar(expr.op) # Operators are builtins, == and != are handled by the backend
 
                 ins.append(ir.Call(
                     loc, var_op, [var_left, var_right], var_result
@@ -139,12 +170,12 @@ def def_to_ir(
                 return var_result
             
             case ast.UnaryOp():
-                var_param = visit(st, expr.param, break_label, continue_label)
+                var_param = yield visit(expr.param, break_label, continue_label)
                 if expr.op == '()':
                     return var_param # Just return the variable of the expression inside the parentheses
                 
                 var_result = new_var(expr.type)
-                var_op = st.require(expr.op)
+                var_op = ir.IRVar(expr.op)
                 ins.append(ir.Call(
                     loc, var_op, [var_param], var_result
                 ))
@@ -154,7 +185,7 @@ def def_to_ir(
                 l_then = new_label('then')
                 l_end = new_label('if_end')
                     
-                var_cond = visit(st, expr.condition, break_label, continue_label)
+                var_cond = yield visit(expr.condition, break_label, continue_label)
                 
                 var_result = var_unit
                 
@@ -165,7 +196,7 @@ def def_to_ir(
                     
                     ins.append(l_then)
 
-                    visit(st, expr.true_branch, break_label, continue_label)
+                    yield visit(expr.true_branch, break_label, continue_label)
                 else:
                     var_result = new_var(expr.type)
                     
@@ -176,7 +207,7 @@ def def_to_ir(
                     ))
                     
                     ins.append(l_then)
-                    var_then = visit(st, expr.true_branch, break_label, continue_label)
+                    var_then = yield visit(expr.true_branch, break_label, continue_label)
                     ins.append(ir.Copy(
                         loc, var_then, var_result
                     ))
@@ -185,7 +216,7 @@ def def_to_ir(
                     ))
                     
                     ins.append(l_else)
-                    var_else = visit(st, expr.false_branch, break_label, continue_label)
+                    var_else = yield visit(expr.false_branch, break_label, continue_label)
                     ins.append(ir.Copy(
                         loc, var_else, var_result
                     ))
@@ -194,8 +225,15 @@ def def_to_ir(
                 return var_result
             
             case ast.Function():
-                var_f = st.require(expr.id.name)
-                var_args = [visit(st, arg, break_label, continue_label) for arg in expr.args]
+                var_f = lookup(expr.id)
+                var_args = []
+                ends: list[tuple[int, int]] = [] # Positions and marks after each argument, see keep
+                for arg in expr.args:
+                    var_args.append((yield visit(arg, break_label, continue_label)))
+                    ends.append((len(ins), assignments))
+                # Backwards, so that inserting a copy doesn't move the positions still to be used
+                for i in reversed(range(len(var_args))):
+                    var_args[i] = keep(var_args[i], expr.args[i], *ends[i])
                 var_result = new_var(expr.type)
                 ins.append(ir.Call(
                     loc, var_f, var_args, var_result
@@ -203,12 +241,14 @@ def def_to_ir(
                 return var_result
             
             case ast.Block():
-                block_st = SymTab[ir.IRVar](st)
+                scopes.append([])
                 for e in expr.exprs:
-                    visit(block_st, e, break_label, continue_label)
-                if not expr.res: # Block doesn't have a return expression
-                    return var_unit
-                return visit(block_st, expr.res, break_label, continue_label)
+                    yield visit(e, break_label, continue_label)
+                var_res = var_unit # Block doesn't have a return expression
+                if expr.res:
+                    var_res = yield visit(expr.res, break_label, continue_label)
+                scopes.pop()
+                return var_res
             
             case ast.While():
                 l_start = new_label('while_start')
@@ -217,7 +257,7 @@ def def_to_ir(
 
                 ins.append(l_start)
                 
-                var_cond = visit(st, expr.condition, l_end, l_start)
+                var_cond = yield visit(expr.condition, l_end, l_start)
                 
                 ins.append(ir.CondJump(
                     loc, var_cond, l_body, l_end
@@ -225,7 +265,7 @@ def def_to_ir(
                 
                 ins.append(l_body)
 
-                visit(st, expr.expr, l_end, l_start)
+                yield visit(expr.expr, l_end, l_start)
                 
                 ins.append(ir.Jump(
                     loc, l_start
@@ -236,9 +276,13 @@ def def_to_ir(
                 return var_unit
             
             case ast.Var():
-                var_expr = visit(st, expr.expr, break_label, continue_label)
+                var_expr = yield visit(expr.expr, break_label, continue_label)
                 var_result = new_var(expr.expr.type)
-                st.define(expr.id.name, var_result)
+                # A Var declaring a variable in the module scope is the whole module expression, so
+                # nothing reads that variable
+                if expr.id.depth > 0:
+                    assert len(scopes[expr.id.depth]) == expr.id.slot
+                    scopes[expr.id.depth].append(var_result)
                 ins.append(ir.Copy(
                     loc, var_expr, var_result
                 ))
@@ -259,33 +303,35 @@ def def_to_ir(
             case ast.Return():
                 var_return = None
                 if expr.expr:
-                    var_return = visit(st, expr.expr, break_label, continue_label)
+                    var_return = yield visit(expr.expr, break_label, continue_label)
                 ins.append(ir.Return(loc, var_return))
                 
         return var_unit
 
-    root_symtab = SymTab[ir.IRVar]()
-    for v in var_types.keys():
-        root_symtab.set(v.name, v)
-        
     if fun_def:
         ins.append(ir.Fun(root_node.location, fun_def.name, var_params))
-        visit(root_symtab, root_node)
+        # The body shares the scope of the parameters
+        scopes.append(var_params.copy())
+        for e in fun_def.block.exprs:
+            trampoline.run(visit(e))
+        if fun_def.block.res:
+            trampoline.run(visit(fun_def.block.res))
         ins.append(ir.Return(fun_def.location, None))
         return ins
 
     ins.append(ir.Fun(root_node.location, 'main', None))
-    var_final = visit(root_symtab, root_node)
+    var_final = trampoline.run(visit(root_node))
     
-    if var_types[var_final] == Int():
+    final_type = var_types[var_final] if var_final in var_types else module_scope.types[var_final]
+    if final_type is Int():
         ins.append(ir.Call(
-            root_node.location, root_symtab.require('print_int'), [var_final], var_unit
+            root_node.location, ir.IRVar('print_int'), [var_final], var_unit
         ))
-    elif var_types[var_final] == Bool():
+    elif final_type is Bool():
         ins.append(ir.Call(
-            root_node.location, root_symtab.require('print_bool'), [var_final], var_unit
+            root_node.location, ir.IRVar('print_bool'), [var_final], var_unit
         ))
         
-    ins.append(ir.Return(DummyLocation(), None))
+    ins.append(ir.Return(DUMMY_LOCATION, None))
 
     return ins
\ No newline at end of file
@@ -0,0 +1,148 @@
+"""Runs the IR of a module directly, without assembling and linking it.
+
+Each function's instructions are first translated into tuples of an opcode and integer operands:
+variables become indices into the function's register list, labels become instruction indices,
+and calls to builtins are bound to their runtime functions. The interpreter then runs these with
+an explicit stack of calls, so the depth of recursion in the program is not limited by Python's.
+Semantics are those of the generated machine code, see runtime.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any
+from compiler import ir, runtime
+from compiler.runtime import INT_MIN, INT_MAX, wrap64
+
+# Opcodes, roughly in order of how often they run
+(COPY, LOAD, ADD, SUB, BINARY, COND_JUMP, JUMP, MUL, UNARY, CALL, CALL_BUILTIN, RETURN) = range(12)
+
+_opcodes = {'+': ADD, '-': SUB, '*': MUL}
+
+
+@dataclass
+class Function:
+    name: str
+    code: list[tuple[Any, ...]]
+    n_registers: int
+    params: list[int] # Registers of the parameters, in order
+
+
+def load_program(program: dict[str, list[ir.Instruction]]) -> dict[str, Function]:
+    functions = {name: Function(name, [], 0, []) for name in program}
+    for name, instructions in program.items():
+        _translate(instructions, functions[name], functions)
+    return functions
+
+
+def run_program(program: dict[str, list[ir.Instruction]], entry: str = 'main') -> Any:
+    """Runs the program from its main function, returning what it returns."""
+    functions = load_program(program)
+    return run(functions[entry], [])
+
+
+def _translate(instructions: list[ir.Instruction], function: Function, functions: dict[str, Function]) -> None:
+    registers: dict[ir.IRVar, int] = {}
+    def reg(var: ir.IRVar) -> int:
+        index = registers.get(var)
+        if index is None:
+            index = registers[var] = len(registers)
+        return index
+
+    # Label indices first, as jumps can go forward
+    labels: dict[str, int] = {}
+    index = 0
+    for insn in instructions:
+        if type(insn) is ir.Label:
+            labels[insn.name] = index
+        elif not isinstance(insn, ir.Fun):
+            index += 1
+
+    code: list[tuple[Any, ...]] = []
+    for insn in instructions:
+        match insn:
+            case ir.Fun():
+                function.params = [reg(p) for p in insn.params or []]
+            case ir.Label():
+                pass
+            case ir.LoadIntConst():
+                code.append((LOAD, reg(insn.dest), wrap64(insn.value)))
+            case ir.LoadBoolConst():
+                code.append((LOAD, reg(insn.dest), insn.value))
+            case ir.Copy():
+                code.append((COPY, reg(insn.dest), reg(insn.source)))
+            case ir.Jump():
+                code.append((JUMP, labels[insn.label.name]))
+            case ir.CondJump():
+                code.append((COND_JUMP, reg(insn.cond), labels[insn.then_label.name], labels[insn.else_label.name]))
+            case ir.Return():
+                code.append((RETURN, -1 if insn.var is None else reg(insn.var)))
+            case ir.Call():
+                name = insn.fun.name
+                args = [reg(arg) for arg in insn.args]
+                dest = reg(insn.dest)
+                if name in functions:
+                    code.append((CALL, dest, functions[name], args))
+                elif name in _opcodes and len(args) == 2:
+                    code.append((_opcodes[name], dest, args[0], args[1]))
+                elif name in runtime.builtin_functions:
+                    f = runtime.builtin_functions[name]
+                    if len(args) == 2:
+                        code.append((BINARY, dest, f, args[0], args[1]))
+                    elif len(args) == 1:
+                        code.append((UNARY, dest, f, args[0]))
+                    else:
+                        code.append((CALL_BUILTIN, dest, f, args))
+                else:
+                    raise ValueError(f'{insn.location}: call to unknown function "{name}"')
+            case _:
+                raise TypeError(f'{insn.location}: unknown instruction {type(insn).__name__}')
+    function.code = code
+    function.n_registers = len(registers)
+
+
+def run(function: Function, args: list[Any]) -> Any:
+    # The callers' code, registers, position and destination register, innermost last
+    stack: list[tuple[list[tuple[Any, ...]], list[Any], int, int]] = []
+    code = function.code
+    regs: list[Any] = [None] * function.n_registers
+    for param, arg in zip(function.params, args):
+        regs[param] = arg
+    pc = 0
+    while True:
+        insn = code[pc]
+        pc += 1
+        op = insn[0]
+        if op == COPY:
+            regs[insn[1]] = regs[insn[2]]
+        elif op == LOAD:
+            regs[insn[1]] = insn[2]
+        elif op == ADD:
+            n = regs[insn[2]] + regs[insn[3]]
+            regs[insn[1]] = n if INT_MIN <= n <= INT_MAX else wrap64(n)
+        elif op == SUB:
+            n = regs[insn[2]] - regs[insn[3]]
+            regs[insn[1]] = n if INT_MIN <= n <= INT_MAX else wrap64(n)
+        elif op == BINARY:
+            regs[insn[1]] = insn[2](regs[insn[3]], regs[insn[4]])
+        elif op == COND_JUMP:
+            pc = insn[2] if regs[insn[1]] else insn[3]
+        elif op == JUMP:
+            pc = insn[1]
+        elif op == MUL:
+            regs[insn[1]] = wrap64(regs[insn[2]] * regs[insn[3]])
+        elif op == UNARY:
+            regs[insn[1]] = insn[2](regs[insn[3]])
+        elif op == CALL:
+            callee: Function = insn[2]
+            callee_regs: list[Any] = [None] * callee.n_registers
+            for param, arg in zip(callee.params, insn[3]):
+                callee_regs[param] = regs[arg]
+            stack.append((code, regs, pc, insn[1]))
+            code, regs, pc = callee.code, callee_regs, 0
+        elif op == CALL_BUILTIN:
+            regs[insn[1]] = insn[2](*[regs[arg] for arg in insn[3]])
+        else: # RETURN
+            value = None if insn[1] < 0 else regs[insn[1]]
+            if not stack:
+                return value
+            code, regs, pc, dest = stack.pop()
+            regs[dest] = value
@@ -0,0 +1,59 @@
+"""Optimization passes between generate_ir and generate_asm.
+
+Each pass rewrites the IR of one function at a time and counts what it did in a Counter, which
+optimize() collects per pass into PassStats along with the time taken and the instruction counts.
+"""
+from __future__ import annotations
+from collections import Counter
+from dataclasses import dataclass, field
+import time
+from typing import Callable
+from compiler import constant_folding, copy_propagation, dead_code, gvn, ir, sccp
+
+type Pass = Callable[[list[ir.Instruction], Counter[str]], list[ir.Instruction]]
+
+# In the order they run
+passes: dict[str, Pass] = {
+    'constant_folding': constant_folding.fold_constants,
+    'sccp': sccp.propagate_constants,
+    'gvn': gvn.number_values,
+    'copy_propagation': copy_propagation.propagate_copies,
+    'dead_code': dead_code.eliminate_dead_code,
+    'coalescing': copy_propagation.coalesce,
+}
+
+
+@dataclass
+class PassStats:
+    counts: dict[str, Counter[str]] = field(default_factory=dict)
+    seconds: dict[str, float] = field(default_factory=dict)
+    instructions_before: dict[str, int] = field(default_factory=dict)
+    instructions_after: dict[str, int] = field(default_factory=dict)
+
+    def __str__(self) -> str:
+        lines = [f'{"pass":<20} {"seconds":>8} {"instructions":>20}  changes']
+        for name, counts in self.counts.items():
+            sizes = f'{self.instructions_before[name]} -> {self.instructions_after[name]}'
+            changes = ', '.join(f'{what} {n}' for what, n in sorted(counts.items()))
+            lines.append(f'{name:<20} {self.seconds[name]:>8.4f} {sizes:>20}  {changes}')
+        return '\n'.join(lines)
+
+
+def optimize(
+    program: dict[str, list[ir.Instruction]],
+    stats: PassStats | None = None,
+    enabled: list[str] | None = None,
+) -> dict[str, list[ir.Instruction]]:
+    """Runs the enabled passes, all by default, over every function of the program."""
+    stats = stats if stats is not None else PassStats()
+    for name, run in passes.items():
+        if enabled is not None and name not in enabled:
+            continue
+        counts = stats.counts.setdefault(name, Counter())
+        start = time.perf_counter()
+        before = sum(len(instructions) for instructions in program.values())
+        program = {fun: run(instructions, counts) for fun, instructions in program.items()}
+        stats.seconds[name] = stats.seconds.get(name, 0.0) + time.perf_counter() - start
+        stats.instructions_before[name] = stats.instructions_before.get(name, 0) + before
+        stats.instructions_after[name] = stats.instructions_after.get(name, 0) + sum(len(i) for i in program.values())
+    return program
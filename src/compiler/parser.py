@@ -1,11 +1,106 @@
-from compiler.tokenizer import Token
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+import os
+import sys
+from typing import Iterable, Protocol
+from compiler.classes import Location
+from compiler.tokenizer import Token, TokenStream, token_kinds
+from compiler import trampoline
+from compiler.trampoline import Step
 import compiler.ast as ast
 from compiler.types import *
 
 
-def parse(tokens: list[Token], debug: bool = False) -> ast.Module:
-    pos = 0
-    prev_token = tokens[0]
+class TokenCursor(Protocol):
+    """The parser's view of its input: the next token and the text of the previous one.
+
+    At the end of the input, text is '' and type is 'end'.
+    """
+    text: str
+    type: str
+    prev_text: str
+
+    def location(self) -> Location:
+        """Location of the next token, or of the last token at the end of the input."""
+        ...
+
+    def first_location(self) -> Location: ...
+
+    def advance(self) -> None: ...
+
+
+class IteratorCursor(TokenCursor):
+    """Pulls tokens one at a time, so a lazy token iterator is never fully materialized."""
+    def __init__(self, tokens: Iterable[Token]) -> None:
+        self._tokens = iter(tokens)
+        token = next(self._tokens, None)
+        if token is None:
+            raise ValueError('Supplied file is empty')
+        self._first = token
+        self._token = token
+        self.text = self.prev_text = token.text
+        self.type = token.type
+
+    def location(self) -> Location:
+        return self._token.location
+
+    def first_location(self) -> Location:
+        return self._first.location
+
+    def advance(self) -> None:
+        self.prev_text = self.text
+        token = next(self._tokens, None)
+        if token is None:
+            self.text = ''
+            self.type = 'end'
+        else:
+            self._token = token
+            self.text = token.text
+            self.type = token.type
+
+
+class StreamCursor(TokenCursor):
+    """Reads a TokenStream in place, only building Locations that the parser asks for."""
+    def __init__(self, stream: TokenStream) -> None:
+        if len(stream) == 0:
+            raise ValueError('Supplied file is empty')
+        self._stream = stream
+        self._source = stream.source
+        self._kinds = stream.kinds
+        self._starts = stream.starts
+        self._lengths = stream.lengths
+        self._pos = 0
+        self.text = self.prev_text = stream.text(0)
+        self.type = stream.type(0)
+
+    def location(self) -> Location:
+        return self._stream.location(min(self._pos, len(self._stream) - 1))
+
+    def first_location(self) -> Location:
+        return self._stream.location(0)
+
+    def advance(self) -> None:
+        self.prev_text = self.text
+        pos = self._pos = self._pos + 1
+        if pos < len(self._kinds):
+            start = self._starts[pos]
+            self.text = self._source[start:start + self._lengths[pos]]
+            self.type = token_kinds[self._kinds[pos]]
+        else:
+            self.text = ''
+            self.type = 'end'
+
+
+def parse(tokens: Iterable[Token], debug: bool = False, parallel_threshold: int | None = None) -> ast.Module:
+    """Parses a module. A TokenStream of at least parallel_threshold tokens (default_parallel_threshold
+    if not given) has its function definitions parsed in worker processes, see parse_parallel."""
+    threshold = default_parallel_threshold if parallel_threshold is None else parallel_threshold
+    if isinstance(tokens, TokenStream) and len(tokens) >= threshold:
+        module = parse_parallel(tokens)
+        if module is not None:
+            return module
+
+    cursor = StreamCursor(tokens) if isinstance(tokens, TokenStream) else IteratorCursor(tokens)
 
     def dprint(s: str) -> None:
         if debug: print(s)
@@ -29,111 +124,98 @@ def parse(tokens: list[Token], debug: bool = False) -> ast.Module:
         for op in left_assoc_binaryops[i]:
             left_prec_level[op] = i + 1
 
-    def peek() -> Token:
-        if len(tokens) == 0:
-            raise ValueError('Supplied file is empty')
-        nonlocal pos
-        if pos < len(tokens):
-            return tokens[pos]
-        return Token(
-            location=tokens[-1].location,
-            type="end",
-            text="",
-        )
-    
-    def consume(expected: str | list[str] | None = None) -> Token:
-        token = peek()
-        if isinstance(expected, str) and token.text != expected:
-            raise ValueError(f'{token.location} expected "{expected}"')
-        if isinstance(expected, list) and token.text not in expected:
+    def consume(expected: str | list[str] | None = None) -> str:
+        text = cursor.text
+        if isinstance(expected, str) and text != expected:
+            raise ValueError(f'{cursor.location()} expected "{expected}"')
+        if isinstance(expected, list) and text not in expected:
             comma_separated = ", ".join(f'"{e}"' for e in expected)
-            raise ValueError(f'{token.location} expected one of: {comma_separated}')
-        nonlocal pos
-        nonlocal prev_token
-        pos += 1
-        prev_token = token
-        return token
+            raise ValueError(f'{cursor.location()} expected one of: {comma_separated}')
+        cursor.advance()
+        return text
     
-    def parse_parenthesized() -> ast.UnaryOp:
-        loc = consume('(').location
-        expr = isnt_var(parse_assignment())
+    def parse_parenthesized() -> Step[ast.UnaryOp]:
+        loc = cursor.location()
+        consume('(')
+        expr = isnt_var((yield parse_assignment()))
         consume(')')
         ret = ast.UnaryOp('()', expr) # Super super hacky solution
         ret.location = loc
         return ret
     
     def parse_int_literal() -> ast.Literal:
-        if peek().type != 'int_literal':
-            raise TypeError(f'{peek().location}: expected an integer literal')
-        token = consume()
-        ret = ast.Literal(int(token.text))
-        ret.location = token.location
+        if cursor.type != 'int_literal':
+            raise TypeError(f'{cursor.location()}: expected an integer literal')
+        loc = cursor.location()
+        ret = ast.Literal(int(consume()))
+        ret.location = loc
         return ret
     
     def parse_bool_literal() -> ast.Literal:
-        if peek().type != 'bool_literal':
-            raise TypeError(f'{peek().location}: expected a boolean literal')
-        token = consume(['true', 'false'])
-        ret = ast.Literal(token.text == 'true')
-        ret.location = token.location
+        if cursor.type != 'bool_literal':
+            raise TypeError(f'{cursor.location()}: expected a boolean literal')
+        loc = cursor.location()
+        ret = ast.Literal(consume(['true', 'false']) == 'true')
+        ret.location = loc
         return ret
 
     def parse_identifier() -> ast.Identifier:
-        if peek().type != 'identifier':
-            raise TypeError(f'{peek().location}: expected an identifier')
-        token = consume()
-        ret = ast.Identifier(token.text)
-        ret.location = token.location
+        if cursor.type != 'identifier':
+            raise TypeError(f'{cursor.location()}: expected an identifier')
+        loc = cursor.location()
+        ret = ast.Identifier(consume())
+        ret.location = loc
         return ret
     
     def parse_factor() -> ast.Expression:
-        if peek().type == 'int_literal':
+        if cursor.type == 'int_literal':
             return parse_int_literal()
-        elif peek().type == 'bool_literal':
+        elif cursor.type == 'bool_literal':
             return parse_bool_literal()
-        elif peek().type == 'identifier':
+        elif cursor.type == 'identifier':
             return parse_identifier()
         else:
-            raise TypeError(f'{peek().location}: expected an integer or boolean literal or identifier')
+            raise TypeError(f'{cursor.location()}: expected an integer or boolean literal or identifier')
 
-    def parse_block() -> ast.Block:
-        nonlocal prev_token
-        loc = consume('{').location
+    def parse_block() -> Step[ast.Block]:
+        loc = cursor.location()
+        consume('{')
 
         expressions = []
         result = None
-        while peek().text != '}':
-            expr = parse_assignment()
-            if prev_token.text == '}' or peek().text == ';':
-                if peek().text == ';':
+        while cursor.text != '}':
+            expr = yield parse_assignment()
+            if cursor.prev_text == '}' or cursor.text == ';':
+                if cursor.text == ';':
                     consume(';')
                 expressions.append(expr)
             else:
                 result = expr
                 break
 
-        if prev_token.text == '}':
+        if cursor.prev_text == '}':
             result = expressions.pop()
 
-        if peek().text != '}':
-            raise ValueError(f'{peek().location} expected end of block after result expression (are you missing a semicolon?)')
+        if cursor.text != '}':
+            raise ValueError(f'{cursor.location()} expected end of block after result expression (are you missing a semicolon?)')
         consume('}')
         
         ret = ast.Block(expressions, result)
         ret.location = loc
         return ret
 
-    def parse_if() -> ast.If:
-        loc = consume('if').location
-        condition = isnt_var(parse_assignment())
+    def parse_if() -> Step[ast.If]:
+        loc = cursor.location()
+        consume('if')
+        condition = isnt_var((yield parse_assignment()))
 
         consume('then')
-        true_branch = isnt_var(parse_assignment())
+        true_branch = isnt_var((yield parse_assignment()))
 
         false_branch = None
-        if peek().text == 'else':
+        if cursor.text == 'else':
             consume('else')
-            false_branch = isnt_var(parse_assignment())
+            false_branch = isnt_var((yield parse_assignment()))
 
         ret = ast.If(
             condition,
@@ -143,55 +225,58 @@ def parse(tokens: list[Token], debug: bool = False) -> ast.Module:
         ret.location = loc
         return ret
     
-    def parse_while() -> ast.While:
-        loc = consume('while').location
-        condition = isnt_var(parse_assignment())
+    def parse_while() -> Step[ast.While]:
+        loc = cursor.location()
+        consume('while')
+        condition = isnt_var((yield parse_assignment()))
 
         consume('do')
-        expr = isnt_var(parse_assignment())
+        expr = isnt_var((yield parse_assignment()))
 
         ret = ast.While(condition, expr)
         ret.location = loc
         return ret
 
-    def parse_var() -> ast.Var:
-        loc = consume('var').location
+    def parse_var() -> Step[ast.Var]:
+        loc = cursor.location()
+        consume('var')
         id = parse_identifier()
         
         var_type: Type = Unit()
         typed = False
-        if peek().text == ':':
+        if cursor.text == ':':
             typed = True
             consume(':')
-            type_token = consume()
-            if type_token.text not in ['Int', 'Bool', 'Unit']:
-                raise TypeError(f'{type_token.location}: unrecognized type "{var_type}"')
-            match type_token.text:
+            type_loc = cursor.location()
+            type_name = consume()
+            if type_name not in ['Int', 'Bool', 'Unit']:
+                raise TypeError(f'{type_loc}: unrecognized type "{var_type}"')
+            match type_name:
                 case 'Int':
                     var_type = Int()
                 case 'Bool':
                     var_type = Bool()
 
         consume('=')
-        expr = isnt_var(parse_assignment())
+        expr = isnt_var((yield parse_assignment()))
 
         ret = ast.Var(id, expr, typed)
         ret.type = var_type
         ret.location = loc
         return ret
     
-    def parse_function(id: ast.Identifier) -> ast.Function:
+    def parse_function(id: ast.Identifier) -> Step[ast.Function]:
         consume('(')
-        if peek().text == ')':
+        if cursor.text == ')':
             consume(')')
             ret = ast.Function(id, [])
             ret.location = id.location
             return ret
         
-        args = [isnt_var(parse_assignment())]
-        while peek().text != ')':
+        args = [isnt_var((yield parse_assignment()))]
+        while cursor.text != ')':
             consume(',')
-            args.append(isnt_var(parse_assignment()))
+            args.append(isnt_var((yield parse_assignment())))
         consume(')')
 
         ret = ast.Function(
@@ -201,123 +286,107 @@ def parse(tokens: list[Token], debug: bool = False) -> ast.Module:
         ret.location = id.location
         return ret
     
-    def parse_return() -> ast.Return:
-        loc = consume('return').location
-        if peek().text == ';':
+    def parse_return() -> Step[ast.Return]:
+        loc = cursor.location()
+        consume('return')
+        if cursor.text == ';':
             expr = None
         else:
-            expr = parse_assignment()
+            expr = yield parse_assignment()
         res = ast.Return(expr)
         res.location = loc
         return res
 
-    def parse_term() -> ast.Expression:
-        if peek().text == '{':
-            return parse_block()
-        if peek().text == '(':
-            return parse_parenthesized()
-        if peek().text == 'if':
-            return parse_if()
-        if peek().text == 'while':
-            return parse_while()
-        if peek().text == 'var':
-            return parse_var()
-        if peek().text == 'break':
+    def parse_term() -> Step[ast.Expression]:
+        if cursor.text == '{':
+            return (yield parse_block())
+        if cursor.text == '(':
+            return (yield parse_parenthesized())
+        if cursor.text == 'if':
+            return (yield parse_if())
+        if cursor.text == 'while':
+            return (yield parse_while())
+        if cursor.text == 'var':
+            return (yield parse_var())
+        if cursor.text == 'break':
             consume('break')
             return ast.Break()
-        if peek().text == 'continue':
+        if cursor.text == 'continue':
             consume('continue')
             return ast.Continue()
-        if peek().text == 'return':
-            return parse_return()
+        if cursor.text == 'return':
+            return (yield parse_return())
         
         term = parse_factor()
 
-        if isinstance(term, ast.Identifier) and peek().text == '(':
-            term = parse_function(term)
+        if isinstance(term, ast.Identifier) and cursor.text == '(':
+            term = yield parse_function(term)
 
         return term
     
-    def parse_unary() -> ast.Expression:
-        if peek().text in ['-', 'not']:
-            operator_token = consume()
-            operator = 'unary_' + operator_token.text
+    def parse_unary() -> Step[ast.Expression]:
+        if cursor.text in ['-', 'not']:
+            operator_loc = cursor.location()
+            operator = 'unary_' + consume()
 
-            parameter = parse_unary() # Recurse to find the first non-unary token
+            parameter = yield parse_unary() # Recurse to find the first non-unary token
 
             ret = ast.UnaryOp(operator, parameter)
-            ret.location = operator_token.location
+            ret.location = operator_loc
             return ret
         
-        return parse_term()
-
-    def parse_expression() -> ast.Expression: # Non-recursive 
-        root = parse_unary()
+        return (yield parse_term())
+
+    def parse_expression() -> Step[ast.Expression]:
+        # Precedence climbing with explicit stacks: an operator is only combined with its
+        # operands once an operator of the same or lower level follows it, so every
+        # token is handled once and the tree is built bottom up.
+        operands = [(yield parse_unary())]
+        operators: list[tuple[str, int, Location]] = []
+
+        def reduce() -> None:
+            operator, _, operator_loc = operators.pop()
+            right = operands.pop()
+            left = operands.pop()
+            node = ast.BinaryOp(left, operator, right)
+            node.location = operator_loc
+            operands.append(node)
+
+        while cursor.text in left_prec_level:
+            operator_level = left_prec_level[cursor.text]
+            while operators and operators[-1][1] >= operator_level: # All operators are left associative
+                reduce()
+
+            operator_loc = cursor.location()
+            operator = consume()
+            operators.append((operator, operator_level, operator_loc))
+            dprint(f'Operator: {operator}, level: {operator_level}')
 
-        while True:
-            if peek().text not in left_prec_level:
-                break
+            operands.append((yield parse_unary()))
 
-            operator_token = consume()
-            operator = operator_token.text
-            operator_level = left_prec_level[operator]
+        while operators:
+            reduce()
 
-            dprint(f'Operator: {operator}, level: {operator_level}')
-            
-            right = parse_unary()
-            
-            node = root
-            replace_root = False
-            while True: # Traverse tree until at the right level
-                if not isinstance(node, ast.BinaryOp): # Base case, tree is just the root node.
-                    replace_root = True
-                    break
-                if not isinstance(node.right, ast.BinaryOp): # The node's right child is a leaf
-                    replace_root = left_prec_level[node.op] >= operator_level # This can only evaluate to true if the node is the root
-                    break
-                if left_prec_level[node.right.op] >= operator_level: break
-                node = node.right
-
-            if replace_root:
-                root = ast.BinaryOp(
-                    root,
-                    operator,
-                    right
-                )
-                root.location = operator_token.location
-            else:
-                if not isinstance(node, ast.BinaryOp): # This should always be true, but the error checker required it
-                    raise TypeError('Tried modifying nonexistent child node of operator')
-                prev_right = node.right
-                node.right = ast.BinaryOp(
-                    prev_right,
-                    operator,
-                    right
-                )
-                node.right.location = operator_token.location
-            
-            dprint(f'{root}')
-
-        return root
+        return operands[0]
     
-    def parse_assignment() -> ast.Expression:
-        left = parse_expression()
-        if peek().text == '=':
-            operator_token = consume()
-            operator = operator_token.text
+    def parse_assignment() -> Step[ast.Expression]:
+        left = yield parse_expression()
+        if cursor.text == '=':
+            operator_loc = cursor.location()
+            operator = consume()
 
-            right = isnt_var(parse_assignment())
+            right = isnt_var((yield parse_assignment()))
 
             left = ast.BinaryOp(
                 left,
                 operator,
                 right
             )
-            left.location = operator_token.location
+            left.location = operator_loc
 
         return left
     
-    def parse_definition() -> ast.Definition:
+    def parse_definition() -> Step[ast.Definition]:
         def get_type(s: str) -> Type:
             match s:
                 case 'Int':
@@ -331,48 +400,46 @@ def parse(tokens: list[Token], debug: bool = False) -> ast.Module:
 
         consume('fun')
 
-        fun_token = consume()
-        fun_name = fun_token.text
+        fun_loc = cursor.location()
+        fun_name = consume()
         
         consume('(')
         params: list[tuple[ast.Identifier, Type]] = []
-        while peek().text != ')':
-            param_token = consume()
-            param_name = param_token.text
+        while cursor.text != ')':
+            param_loc = cursor.location()
+            param_name = consume()
             if param_name in [param[0].name for param in params]:
-                raise NameError(f'{param_token.location}: parameter "{param_name}" already used in function definition')
+                raise NameError(f'{param_loc}: parameter "{param_name}" already used in function definition')
             
             consume(':')
 
-            type_token = consume(['Int', 'Bool', 'Unit'])
-            param_type = get_type(type_token.text)
+            param_type = get_type(consume(['Int', 'Bool', 'Unit']))
             params.append((ast.Identifier(param_name), param_type))
 
-            if peek().text != ')':
+            if cursor.text != ')':
                 consume(',')
 
         consume(')')
         consume(':')
 
-        type_token = consume(['Int', 'Bool', 'Unit'])
-        res_type = get_type(type_token.text)
+        res_type = get_type(consume(['Int', 'Bool', 'Unit']))
 
         fun_type = FnType([param[1] for param in params], res_type)
 
-        block = parse_block()
+        block = yield parse_block()
 
         return ast.Definition(
             fun_name,
             [param[0] for param in params],
             block,
             type=fun_type,
-            location=fun_token.location
+            location=fun_loc
             )
     
-    def parse_top_level() -> ast.Definition | ast.Expression:
-        if peek().text == 'fun':
-            return parse_definition()
-        return parse_assignment()
+    def parse_top_level() -> Step[ast.Definition | ast.Expression]:
+        if cursor.text == 'fun':
+            return (yield parse_definition())
+        return (yield parse_assignment())
 
     defs: list[ast.Definition] = []
     exprs: list[ast.Expression] = []
@@ -382,8 +449,8 @@ def parse(tokens: list[Token], debug: bool = False) -> ast.Module:
     
     # Turns out parsing expressions and definitions separately is unnecessary because
     # definitions are syntactically wrong after any top level expressions. Oh well.
-    while pos < len(tokens):
-        node = parse_top_level()
+    while cursor.type != 'end':
+        node = trampoline.run(parse_top_level())
         if isinstance(node, ast.Definition):
             defs.append(node)
         else: # Node is an expression
@@ -391,12 +458,12 @@ def parse(tokens: list[Token], debug: bool = False) -> ast.Module:
                 raise ValueError(f'{node.location}: result expression already encountered; did you forget a semicolon?')
             exprs.append(node)
             ended_with_block = False
-            if prev_token.text == '}':
-                if peek().text == ';':
+            if cursor.prev_text == '}':
+                if cursor.text == ';':
                     consume(';')
                 else:
                     ended_with_block = True
-            elif peek().text == ';':
+            elif cursor.text == ';':
                 consume(';')
             else:
                 found_result = True
@@ -412,8 +479,122 @@ def parse(tokens: list[Token], debug: bool = False) -> ast.Module:
         expr = ast.Block(exprs, result_expr)
 
     if expr:
-        expr.location = tokens[0].location
+        expr.location = cursor.first_location()
 
     module = ast.Module(defs, expr, location=node.location)
 
-    return module
\ No newline at end of file
+    return module
+
+# Tokens after which the parser expects an operand, so a following 'fun' is part of an expression
+expects_operand = {'=', '==', '!=', '<', '<=', '>', '>=', '+', '-', '*', '/', '%', 'and', 'or', 'not',
+                   'if', 'then', 'else', 'while', 'do', 'var', 'return', ',', '(', ':'}
+
+def definition_spans(tokens: TokenStream) -> list[tuple[int, int]]:
+    """Token index ranges [start, end) of the top level function definitions, without parsing them.
+
+    A definition starts with a 'fun' outside of any brackets where a new top level item can begin,
+    and ends with the '}' closing its body. Names are not checked by the parser and can be any token,
+    so the header is skipped by position: 'fun', name, '(', parameters up to the first ')', ':', type.
+    """
+    spans: list[tuple[int, int]] = []
+    depth = 0
+    prev_text = ''
+    i = 0
+    while i < len(tokens):
+        text = tokens.text(i)
+        if text == 'fun' and depth == 0 and prev_text not in expects_operand:
+            start = i
+            i += 3
+            while i < len(tokens) and tokens.text(i) != ')':
+                i += 1
+            i += 3
+            body_depth = 0
+            while i < len(tokens):
+                text = tokens.text(i)
+                i += 1
+                if text == '{':
+                    body_depth += 1
+                elif text == '}':
+                    body_depth -= 1
+                    if body_depth == 0:
+                        break
+            spans.append((start, i))
+            prev_text = '}'
+            continue
+        if text in ['(', '{']:
+            depth += 1
+        elif text in [')', '}']:
+            depth -= 1
+        prev_text = text
+        i += 1
+    return spans
+
+
+# Token count from which parse() parses definitions in parallel. Starting the worker processes
+# and sending the trees back costs about as much as parsing a few thousand tokens per worker.
+default_parallel_threshold = 200_000
+
+# Number of worker processes for parallel parsing, None for one per CPU
+parallel_workers: int | None = None
+
+def parse_parallel(tokens: TokenStream) -> ast.Module | None:
+    """Parses a module whose function definitions all come before its top level expressions,
+    with the definitions split into chunks that are parsed in a process pool.
+
+    Returns None if the module doesn't have that shape or a chunk fails to parse,
+    in which case parse() parses it serially and reports any errors.
+    """
+    spans = definition_spans(tokens)
+    if not spans or spans[0][0] != 0 or any(spans[k][1] != spans[k + 1][0] for k in range(len(spans) - 1)):
+        return None
+
+    workers = parallel_workers or os.cpu_count() or 1
+    # A few chunks per worker evens out differences in chunk parsing times
+    chunk_tokens = max(spans[-1][1] // (workers * 4), 1)
+    chunks: list[tuple[str, str, int]] = []
+    chunk_start = 0
+    for k, (start, end) in enumerate(spans):
+        if end - spans[chunk_start][0] >= chunk_tokens or k == len(spans) - 1:
+            chunks.append(_chunk_source(tokens, spans[chunk_start][0], end))
+            chunk_start = k + 1
+
+    defs: list[ast.Definition] = []
+    with ProcessPoolExecutor(workers) as executor:
+        try:
+            for chunk_defs in executor.map(_parse_definitions, *zip(*chunks)):
+                defs.extend(chunk_defs)
+        except Exception:
+            return None
+    if len(defs) != len(spans):
+        return None
+
+    expr = None
+    location = defs[-1].location
+    if spans[-1][1] < len(tokens):
+        tail = parse(tokens.slice(spans[-1][1], len(tokens)), parallel_threshold=sys.maxsize)
+        if tail.defs:
+            return None
+        expr = tail.expr
+        location = tail.location
+        if expr is not None:
+            # The expression is located at the first token of the whole module
+            first_location = tokens.location(0)
+            if location is expr.location:
+                location = first_location
+            expr.location = first_location
+    return ast.Module(defs, expr, location=location)
+
+def _chunk_source(tokens: TokenStream, start: int, end: int) -> tuple[str, str, int]:
+    """Source of tokens start..end-1 for a worker, starting from the beginning of its first line
+    so that locations come out the same. Whatever precedes the first token on that line is blanked."""
+    start_offset = tokens.starts[start]
+    line = bisect_right(tokens.line_starts, start_offset)
+    line_start = tokens.line_starts[line - 1]
+    source = ' ' * (start_offset - line_start) + tokens.source[start_offset:tokens.end(end - 1)]
+    return source, tokens.source_location, tokens.first_line + line - 1
+
+def _parse_definitions(source: str, source_location: str, first_line: int) -> list[ast.Definition]:
+    module = parse(TokenStream(source, source_location, first_line), parallel_threshold=sys.maxsize)
+    if module.expr is not None:
+        raise ValueError(f'{module.expr.location}: expected only function definitions')
+    return module.defs
@@ -0,0 +1,148 @@
+"""Name resolution: gives every identifier the address of the variable it refers to.
+
+Scopes are numbered by their nesting depth. Depth 0 is the module scope, holding the builtins,
+the module's functions and the variables declared at the top level of the module. A Definition
+opens a scope for its parameters and the variables declared at the top level of its body, and
+every other Block opens one of its own. Within a scope, variables are numbered in the order they
+are declared, so an Identifier's (depth, slot) says where its variable lives: later passes keep
+one array per open scope, indexed by depth, and look variables up by indexing instead of by name.
+The number of variables in each scope is stored on the node opening it.
+
+There are no nested functions, so the scopes open at any point are exactly those enclosing it.
+"""
+from __future__ import annotations
+from compiler import ast, trampoline
+from compiler.trampoline import Step
+from compiler.builtins import builtin_function_types
+
+
+def global_names(module: ast.Module) -> list[str]:
+    """Names in the module scope before any of the module's variables: the builtins, then the functions."""
+    return [*builtin_function_types, *(d.name for d in module.defs)]
+
+
+def resolve_module(module: ast.Module, debug: bool = False) -> None:
+    resolver = _Resolver(debug)
+    for name in builtin_function_types:
+        resolver.declare(name)
+    for d in module.defs:
+        if d.name in resolver.bindings:
+            raise ValueError(f'{d.location}: function "{d.name}" already defined')
+        resolver.declare(d.name)
+
+    for d in module.defs:
+        resolver.open_scope()
+        for param in d.params: # The parser has checked they are distinct
+            resolver.declare_identifier(param)
+        # The body shares the scope of the parameters
+        for e in d.block.exprs:
+            trampoline.run(resolver.resolve(e))
+        if d.block.res is not None:
+            trampoline.run(resolver.resolve(d.block.res))
+        d.scope_size = resolver.close_scope()
+
+    if module.expr is not None:
+        trampoline.run(resolver.resolve(module.expr))
+    module.scope_size = resolver.close_scope()
+
+
+def resolve(node: ast.Expression, names: list[str], debug: bool = False) -> int:
+    """Resolves an expression evaluated in a module scope starting with names. Returns the size of the module scope."""
+    resolver = _Resolver(debug)
+    for name in names:
+        resolver.declare(name)
+    trampoline.run(resolver.resolve(node))
+    return resolver.close_scope()
+
+
+class _Resolver:
+    def __init__(self, debug: bool) -> None:
+        self.debug = debug
+        # The addresses a name can refer to, innermost last, and the names declared in each open scope
+        self.bindings: dict[str, list[tuple[int, int]]] = {}
+        self.scopes: list[list[str]] = [[]]
+
+    def open_scope(self) -> None:
+        self.scopes.append([])
+
+    def close_scope(self) -> int:
+        names = self.scopes.pop()
+        for name in names:
+            addresses = self.bindings[name]
+            addresses.pop()
+            if not addresses:
+                del self.bindings[name]
+        return len(names)
+
+    def declared_in_scope(self, name: str) -> bool:
+        addresses = self.bindings.get(name)
+        return addresses is not None and addresses[-1][0] == len(self.scopes) - 1
+
+    def declare(self, name: str) -> tuple[int, int]:
+        scope = self.scopes[-1]
+        address = (len(self.scopes) - 1, len(scope))
+        scope.append(name)
+        self.bindings.setdefault(name, []).append(address)
+        return address
+
+    def declare_identifier(self, identifier: ast.Identifier) -> None:
+        identifier.depth, identifier.slot = self.declare(identifier.name)
+        if self.debug:
+            print(f'd declared {identifier.name} at {identifier.depth}:{identifier.slot}')
+
+    def resolve_identifier(self, identifier: ast.Identifier, kind: str = 'identifier') -> None:
+        addresses = self.bindings.get(identifier.name)
+        if addresses is None:
+            raise ValueError(f'{identifier.location}: undefined {kind} "{identifier.name}"')
+        identifier.depth, identifier.slot = addresses[-1]
+        if self.debug:
+            print(f'd resolved {identifier.name} to {identifier.depth}:{identifier.slot}')
+
+    def resolve(self, node: ast.Expression) -> Step[None]:
+        match node:
+            case ast.Identifier():
+                self.resolve_identifier(node)
+
+            case ast.BinaryOp():
+                if node.op == '=' and isinstance(node.left, ast.Identifier):
+                    self.resolve_identifier(node.left, 'variable')
+                else:
+                    yield self.resolve(node.left)
+                yield self.resolve(node.right)
+
+            case ast.UnaryOp():
+                yield self.resolve(node.param)
+
+            case ast.If():
+                yield self.resolve(node.condition)
+                yield self.resolve(node.true_branch)
+                if node.false_branch is not None:
+                    yield self.resolve(node.false_branch)
+
+            case ast.Function():
+                self.resolve_identifier(node.id, 'function')
+                for arg in node.args:
+                    yield self.resolve(arg)
+
+            case ast.Block():
+                self.open_scope()
+                for expr in node.exprs:
+                    yield self.resolve(expr)
+                if node.res is not None:
+                    yield self.resolve(node.res)
+                node.scope_size = self.close_scope()
+
+            case ast.While():
+                yield self.resolve(node.condition)
+                yield self.resolve(node.expr)
+
+            case ast.Var():
+                if self.declared_in_scope(node.id.name):
+                    raise ValueError(f'{node.location}: Variable "{node.id.name}" already declared in scope')
+                # The initializer can't see the variable being declared
+                yield self.resolve(node.expr)
+                self.declare_identifier(node.id)
+
+            case ast.Return():
+                if node.expr is not None:
+                    yield self.resolve(node.expr)
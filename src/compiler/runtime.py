@@ -0,0 +1,85 @@
+"""The builtins with the semantics the generated machine code gives them, for running programs in Python.
+
+Ints are 64-bit two's complement: arithmetic wraps around, and division and remainder truncate
+towards zero like idivq does. Division by zero raises ZeroDivisionError where the machine code
+would trap.
+"""
+from __future__ import annotations
+import operator
+import sys
+from typing import Any, Callable
+
+INT_MIN = -2**63
+INT_MAX = 2**63 - 1
+
+
+def wrap64(n: int) -> int:
+    """n as a 64-bit two's complement integer."""
+    if INT_MIN <= n <= INT_MAX:
+        return n
+    return (n - INT_MIN) % 2**64 + INT_MIN
+
+
+def add(a: int, b: int) -> int:
+    return wrap64(a + b)
+
+
+def sub(a: int, b: int) -> int:
+    return wrap64(a - b)
+
+
+def mul(a: int, b: int) -> int:
+    return wrap64(a * b)
+
+
+def div(a: int, b: int) -> int:
+    q = abs(a) // abs(b)
+    return wrap64(-q if (a < 0) != (b < 0) else q)
+
+
+def mod(a: int, b: int) -> int:
+    # The remainder of the truncating division has the sign of the dividend
+    r = abs(a) % abs(b)
+    return -r if a < 0 else r
+
+
+def neg(a: int) -> int:
+    return wrap64(-a)
+
+
+def print_int(n: int) -> None:
+    print(n)
+
+
+def print_bool(b: bool) -> None:
+    print('true' if b else 'false')
+
+
+def read_int() -> int:
+    line = sys.stdin.readline()
+    if not line:
+        raise EOFError('read_int: end of input')
+    return wrap64(int(line))
+
+
+# The builtins by name, with the short-circuiting 'and' and 'or' as plain functions of both values
+builtin_functions: dict[str, Callable[..., Any]] = {
+    'print_int': print_int,
+    'print_bool': print_bool,
+    'read_int': read_int,
+    '+': add,
+    '-': sub,
+    '*': mul,
+    '/': div,
+    '%': mod,
+    '<': operator.lt,
+    '>': operator.gt,
+    '<=': operator.le,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+    'and': operator.and_,
+    'or': operator.or_,
+    'unary_-': neg,
+    'unary_not': operator.not_,
+}
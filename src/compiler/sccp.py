@@ -0,0 +1,165 @@
+"""Sparse conditional constant propagation (Wegman and Zadeck) on a function's IR in SSA form.
+
+Unlike constant_folding, which takes every path as possible, this pass only follows the edges
+out of a block that can be taken given what is known so far, and a phi only meets the values
+coming along such edges. A variable set in a branch that turns out to be dead doesn't stop it
+being constant, even around loops:
+
+    var x = 1; while ... do { if x != 1 then x = 2; ... }
+
+Every SSA variable starts out unknown, and goes down to a constant, then to varying, each time
+one of the instructions using it is looked at again. In the end variables with a constant value are
+loaded with it, CondJumps on a constant become Jumps, and blocks never reached are removed.
+Operations trapping at run time are left alone as in constant_folding.
+"""
+from __future__ import annotations
+from collections import Counter
+from compiler import cfg, dataflow, intrinsics, ir, ssa
+from compiler.constant_folding import Constant, evaluate, load
+
+
+class _Varying:
+    def __repr__(self) -> str:
+        return 'varying'
+
+
+_varying = _Varying()
+type _Value = Constant | _Varying | None # None while unknown
+
+
+def propagate_constants(instructions: list[ir.Instruction], stats: Counter[str]) -> list[ir.Instruction]:
+    form = ssa.to_ssa(instructions)
+    _Propagation(form).rewrite(stats)
+    return ssa.from_ssa(form)
+
+
+def _meet(a: _Value, b: _Value) -> _Value:
+    if a is None:
+        return b
+    if b is None or (type(a) is type(b) and a == b):
+        return a
+    return _varying
+
+
+class _Propagation:
+    def __init__(self, form: ssa.SSA) -> None:
+        self.form = form
+        graph = form.cfg
+        # Where each variable is read: the phis and instructions, by block
+        self.uses: dict[ir.IRVar, list[tuple[int, ssa.Phi | ir.Instruction]]] = {}
+        self.defined: set[ir.IRVar] = set()
+        for block in graph.blocks:
+            for phi in form.phis[block.index]:
+                self.defined.add(phi.dest)
+                for var in phi.args.values():
+                    self.uses.setdefault(var, []).append((block.index, phi))
+            for insn in block.instructions:
+                if (dest := dataflow.written(insn)) is not None:
+                    self.defined.add(dest)
+                for var in dataflow.reads(insn):
+                    self.uses.setdefault(var, []).append((block.index, insn))
+
+        self.block_of_label = {label.name: block.index for block in graph.blocks if (label := block.label) is not None}
+        self.values: dict[ir.IRVar, _Value] = {}
+        self.reached = [False] * len(graph.blocks)
+        self.edges: set[tuple[int, int]] = set()
+        self.edge_work: list[tuple[int, int]] = [(-1, 0)] if graph.blocks else []
+        self.var_work: list[ir.IRVar] = []
+        while self.edge_work or self.var_work:
+            while self.edge_work:
+                self.take_edge(*self.edge_work.pop())
+            while self.var_work:
+                for index, use in self.uses.get(self.var_work.pop(), []):
+                    if self.reached[index]:
+                        self.visit(index, use)
+
+    def value(self, var: ir.IRVar) -> _Value:
+        # Parameters and variables read before being written vary
+        return self.values.get(var) if var in self.defined else _varying
+
+    def set(self, var: ir.IRVar, value: _Value) -> None:
+        old = self.values.get(var)
+        if value is not old and (type(value) is not type(old) or value != old):
+            self.values[var] = value
+            self.var_work.append(var)
+
+    def take_edge(self, source: int, target: int) -> None:
+        if (source, target) in self.edges:
+            return
+        self.edges.add((source, target))
+        block = self.form.cfg.blocks[target]
+        if self.reached[target]:
+            for phi in self.form.phis[target]:
+                self.visit(target, phi)
+            return
+        self.reached[target] = True
+        for phi in self.form.phis[target]:
+            self.visit(target, phi)
+        for insn in block.instructions:
+            self.visit(target, insn)
+        if not block.instructions or not isinstance(block.instructions[-1], ir.CondJump):
+            self.edge_work += ((target, successor) for successor in block.successors)
+
+    def visit(self, index: int, item: ssa.Phi | ir.Instruction) -> None:
+        match item:
+            case ssa.Phi():
+                value: _Value = None
+                for p, var in item.args.items():
+                    if (p, index) in self.edges:
+                        value = _meet(value, self.value(var))
+                self.set(item.dest, value)
+            case ir.LoadIntConst() | ir.LoadBoolConst():
+                self.set(item.dest, item.value)
+            case ir.Copy():
+                self.set(item.dest, self.value(item.source))
+            case ir.Call() if item.fun.name in intrinsics.all_intrinsics and item.fun not in self.defined:
+                args = [self.value(arg) for arg in item.args]
+                constants = [arg for arg in args if isinstance(arg, (int, bool))]
+                if any(arg is _varying for arg in args):
+                    self.set(item.dest, _varying)
+                elif len(constants) == len(args):
+                    result = evaluate(item.fun.name, constants)
+                    self.set(item.dest, _varying if result is None else result)
+            case ir.Call():
+                self.set(item.dest, _varying)
+            case ir.CondJump():
+                condition = self.value(item.cond)
+                successors = self.form.cfg.blocks[index].successors
+                if condition is _varying:
+                    self.edge_work += ((index, successor) for successor in successors)
+                elif condition is not None:
+                    label = item.then_label if condition else item.else_label
+                    self.edge_work.append((index, self.block_of_label[label.name]))
+
+    def rewrite(self, stats: Counter[str]) -> None:
+        graph = self.form.cfg
+        for block in graph.blocks:
+            if not self.reached[block.index]:
+                continue
+            loads: list[ir.Instruction] = []
+            kept: list[ssa.Phi] = []
+            for phi in self.form.phis[block.index]:
+                value = self.values.get(phi.dest)
+                if isinstance(value, (int, bool)):
+                    location = block.instructions[0].location if block.instructions else graph.fun.location
+                    loads.append(load(location, value, phi.dest))
+                    stats['constants'] += 1
+                else:
+                    kept.append(phi)
+            self.form.phis[block.index] = kept
+            for position, insn in enumerate(block.instructions):
+                match insn:
+                    case ir.Copy() | ir.Call() if isinstance(value := self.values.get(insn.dest), (int, bool)):
+                        block.instructions[position] = load(insn.location, value, insn.dest)
+                        stats['constants'] += 1
+                    case ir.CondJump() if isinstance(value := self.value(insn.cond), bool):
+                        block.instructions[position] = ir.Jump(insn.location, insn.then_label if value else insn.else_label)
+                        stats['branches'] += 1
+            start = 1 if block.label is not None else 0
+            block.instructions[start:start] = loads
+        cfg.connect(graph)
+        stats['unreachable_blocks'] += len(ssa.remove_unreachable(self.form))
+        for block in graph.blocks:
+            # Edges of Jumps that used to be CondJumps are gone
+            for phi in self.form.phis[block.index]:
+                phi.args = {p: var for p, var in phi.args.items() if p in block.predecessors}
@@ -0,0 +1,361 @@
+"""Binary format for typed ASTs, so that parsing and type checking can be skipped for unchanged files.
+
+Layout, all integers 64-bit little endian:
+
+    header     magic, format version and the sizes of the sections
+    strings    offsets of the strings in the blob, then the UTF-8 blob padded to 8 bytes
+    types      records [kind, ...]: FnType is [kind, result, parameter count, parameters...],
+               referring to earlier records
+    locations  records [file string, line, column]
+    nodes      records [kind, type, location, ...] in postorder, so a reader rebuilds the tree
+               with a stack; the Module is the last record. Location -1 means no location.
+               Identifiers and scopes keep the addresses and sizes the resolver gave them.
+
+The reader indexes the sections through memoryviews of the buffer, so an mmap of a file is read
+in place without copying it. Every index and count read is checked, so a truncated or
+corrupt buffer raises ValueError.
+"""
+from __future__ import annotations
+from array import array
+import mmap
+import struct
+import sys
+from typing import Any
+from compiler import ast
+from compiler.classes import Location, DummyLocation, DUMMY_LOCATION
+from compiler.types import Type, Int, Bool, Unit, FnType
+
+MAGIC = b'CAST'
+FORMAT_VERSION = 2
+
+# Magic, version, string count, blob length, type words, location count, node words
+_header = struct.Struct('<4sIQQQQQ')
+
+node_kinds: list[type[ast.Node]] = [
+    ast.Module, ast.Definition, ast.Literal, ast.Identifier, ast.BinaryOp, ast.UnaryOp, ast.If,
+    ast.Function, ast.Block, ast.While, ast.Var, ast.Break, ast.Continue, ast.Return,
+]
+_node_codes = {kind: code for code, kind in enumerate(node_kinds)}
+
+type_kinds: list[type[Type]] = [Int, Bool, Unit, FnType]
+_type_codes = {kind: code for code, kind in enumerate(type_kinds)}
+
+# Literal value tags
+_NONE, _BOOL, _INT, _BIG_INT = range(4)
+
+
+def serialize_module(module: ast.Module) -> bytes:
+    strings: dict[str, int] = {}
+    types: dict[Type, int] = {}
+    type_words: list[int] = []
+    locations: dict[tuple[str, int, int], int] = {}
+    location_words: list[int] = []
+    words: list[int] = []
+
+    def string(s: str) -> int:
+        i = strings.get(s)
+        if i is None:
+            i = strings[s] = len(strings)
+        return i
+
+    def type_id(t: Type) -> int:
+        i = types.get(t)
+        if i is None:
+            if isinstance(t, FnType):
+                params = [type_id(p) for p in t.params]
+                res = type_id(t.res)
+                type_words.extend((_type_codes[FnType], res, len(params), *params))
+            else:
+                type_words.append(_type_codes[type(t)])
+            i = types[t] = len(types)
+        return i
+
+    def location_id(loc: Location) -> int:
+        if isinstance(loc, DummyLocation):
+            return -1
+        key = (loc.file, loc.line, loc.column)
+        i = locations.get(key)
+        if i is None:
+            i = locations[key] = len(locations)
+            location_words.extend((string(loc.file), loc.line, loc.column))
+        return i
+
+    # Postorder with an explicit stack: a node is written once all of its children are
+    stack: list[tuple[ast.Node, bool]] = [(module, False)]
+    while stack:
+        node, children_done = stack.pop()
+        if not children_done:
+            stack.append((node, True))
+            stack.extend([(child, False) for child in reversed(_children(node))])
+            continue
+        words += (_node_codes[type(node)], type_id(node.type), location_id(node.location))
+        match node:
+            case ast.Identifier():
+                words += (string(node.name), node.depth, node.slot)
+            case ast.Literal():
+                value = node.value
+                if value is None:
+                    words += (_NONE, 0)
+                elif isinstance(value, bool):
+                    words += (_BOOL, value)
+                elif -2**63 <= value < 2**63:
+                    words += (_INT, value)
+                else:
+                    words += (_BIG_INT, string(str(value)))
+            case ast.BinaryOp() | ast.UnaryOp():
+                words.append(string(node.op))
+            case ast.Block():
+                words += (len(node.exprs), node.res is not None, node.scope_size)
+            case ast.Function():
+                words.append(len(node.args))
+            case ast.If():
+                words.append(node.false_branch is not None)
+            case ast.Var():
+                words.append(node.typed)
+            case ast.Return():
+                words.append(node.expr is not None)
+            case ast.Definition():
+                words += (string(node.name), len(node.params), node.scope_size)
+            case ast.Module():
+                words += (len(node.defs), node.expr is not None, node.scope_size)
+
+    encoded = [s.encode() for s in strings]
+    offsets = array('q', [0])
+    for s in encoded:
+        offsets.append(offsets[-1] + len(s))
+    blob = b''.join(encoded)
+    blob += bytes(-len(blob) % 8)
+    sections = [offsets, array('q', type_words), array('q', location_words), array('q', words)]
+    if sys.byteorder == 'big':
+        for section in sections:
+            section.byteswap()
+    header = _header.pack(MAGIC, FORMAT_VERSION, len(strings), len(blob), len(type_words), len(locations), len(words))
+    return b''.join([header, sections[0].tobytes(), blob, *(section.tobytes() for section in sections[1:])])
+
+
+def write_module(module: ast.Module, path: str) -> None:
+    with open(path, 'wb') as f:
+        f.write(serialize_module(module))
+
+
+def deserialize_module(buffer: bytes | bytearray | memoryview | mmap.mmap) -> ast.Module:
+    view = memoryview(buffer)
+    if len(view) < _header.size:
+        raise ValueError('Not a serialized module: too short')
+    magic, version, n_strings, blob_length, n_type_words, n_locations, n_words = _header.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError('Not a serialized module: bad magic number')
+    if version != FORMAT_VERSION:
+        raise ValueError(f'Serialized module has format version {version}, expected {FORMAT_VERSION}')
+    pos = _header.size
+    def section(n_words: int) -> Any:
+        nonlocal pos
+        raw = view[pos:pos + 8 * n_words]
+        if len(raw) != 8 * n_words:
+            raise ValueError('Serialized module is truncated')
+        words = raw.cast('q')
+        pos += 8 * n_words
+        if sys.byteorder == 'big':
+            swapped = array('q', words)
+            swapped.byteswap()
+            return swapped
+        return words
+    offsets = section(n_strings + 1)
+    blob = view[pos:pos + blob_length]
+    if len(blob) != blob_length:
+        raise ValueError('Serialized module is truncated')
+    pos += blob_length
+    type_words = section(n_type_words)
+    location_words = section(3 * n_locations)
+    words = section(n_words)
+    try:
+        return _read_module(offsets, blob, type_words, location_words, words)
+    except (IndexError, TypeError, UnicodeDecodeError, OverflowError) as e:
+        # Anything the checks below don't catch
+        raise ValueError('Serialized module is malformed') from e
+
+
+# Number of words after [kind, type, location] in each kind of node record
+_field_counts: dict[type[ast.Node], int] = {
+    ast.Module: 3, ast.Definition: 3, ast.Literal: 2, ast.Identifier: 3, ast.BinaryOp: 1, ast.UnaryOp: 1,
+    ast.If: 1, ast.Function: 1, ast.Block: 3, ast.While: 0, ast.Var: 1, ast.Break: 0, ast.Continue: 0, ast.Return: 1,
+}
+
+
+def _malformed() -> ValueError:
+    return ValueError('Serialized module is malformed')
+
+
+def _read_module(offsets: Any, blob: memoryview, type_words: Any, location_words: Any, words: Any) -> ast.Module:
+    """Rebuilds the module from its sections, checking every index and count in them."""
+    n_strings = len(offsets) - 1
+    strings: list[str] = []
+    for i in range(n_strings):
+        if not 0 <= offsets[i] <= offsets[i + 1] <= len(blob):
+            raise _malformed()
+        strings.append(str(blob[offsets[i]:offsets[i + 1]], 'utf-8'))
+
+    def string(i: int) -> str:
+        if not 0 <= i < n_strings:
+            raise _malformed()
+        return strings[i]
+
+    n_type_words = len(type_words)
+    types: list[Type] = []
+    def earlier_type(i: int) -> Type:
+        if not 0 <= i < len(types):
+            raise _malformed()
+        return types[i]
+    i = 0
+    while i < n_type_words:
+        if not 0 <= type_words[i] < len(type_kinds):
+            raise _malformed()
+        kind = type_kinds[type_words[i]]
+        if kind is FnType:
+            n_params = type_words[i + 2]
+            if not 0 <= n_params <= n_type_words - i - 3:
+                raise _malformed()
+            param_types = [earlier_type(p) for p in type_words[i + 3:i + 3 + n_params]]
+            types.append(FnType(param_types, earlier_type(type_words[i + 1])))
+            i += 3 + n_params
+        else:
+            types.append(kind())
+            i += 1
+
+    locations = [
+        Location(string(location_words[j]), location_words[j + 1], location_words[j + 2])
+        for j in range(0, len(location_words), 3)
+    ]
+
+    stack: list[Any] = []
+    def pop(n: int, kind: type[ast.Node] = ast.Expression) -> list[Any]:
+        """The last n nodes on the stack, which must all be of kind."""
+        if not 0 <= n <= len(stack):
+            raise _malformed()
+        if n == 0:
+            return []
+        popped = stack[-n:]
+        del stack[-n:]
+        if not all(isinstance(node, kind) for node in popped):
+            raise _malformed()
+        return popped
+    def pop1(kind: type[ast.Node] = ast.Expression) -> Any:
+        if not stack or not isinstance(stack[-1], kind):
+            raise _malformed()
+        return stack.pop()
+
+    n_words = len(words)
+    i = 0
+    while i < n_words:
+        if not 0 <= words[i] < len(node_kinds):
+            raise _malformed()
+        kind = node_kinds[words[i]]
+        if i + 3 + _field_counts[kind] > n_words:
+            raise _malformed()
+        t = earlier_type(words[i + 1])
+        loc_id = words[i + 2]
+        if not -1 <= loc_id < len(locations):
+            raise _malformed()
+        loc = DUMMY_LOCATION if loc_id < 0 else locations[loc_id]
+        i += 3
+        node: ast.Node
+        if kind is ast.Identifier:
+            node = ast.Identifier(string(words[i]), depth=words[i + 1], slot=words[i + 2], location=loc, type=t)
+            i += 3
+        elif kind is ast.Literal:
+            tag, value = words[i], words[i + 1]
+            i += 2
+            literal: int | bool | None
+            if tag == _NONE:
+                literal = None
+            elif tag == _BOOL:
+                literal = bool(value)
+            elif tag == _INT:
+                literal = value
+            elif tag == _BIG_INT and string(value).lstrip('-').isdigit():
+                literal = int(string(value))
+            else:
+                raise _malformed()
+            node = ast.Literal(literal, location=loc, type=t)
+        elif kind is ast.BinaryOp:
+            right = pop1()
+            node = ast.BinaryOp(pop1(), string(words[i]), right, location=loc, type=t)
+            i += 1
+        elif kind is ast.UnaryOp:
+            node = ast.UnaryOp(string(words[i]), pop1(), location=loc, type=t)
+            i += 1
+        elif kind is ast.Block:
+            res = pop1() if words[i + 1] else None
+            node = ast.Block(pop(words[i]), res, scope_size=words[i + 2], location=loc, type=t)
+            i += 3
+        elif kind is ast.Function:
+            args = pop(words[i])
+            node = ast.Function(pop1(ast.Identifier), args, location=loc, type=t)
+            i += 1
+        elif kind is ast.If:
+            false_branch = pop1() if words[i] else None
+            true_branch = pop1()
+            node = ast.If(pop1(), true_branch, false_branch, location=loc, type=t)
+            i += 1
+        elif kind is ast.While:
+            body = pop1()
+            node = ast.While(pop1(), body, location=loc, type=t)
+        elif kind is ast.Var:
+            expr = pop1()
+            node = ast.Var(pop1(ast.Identifier), expr, bool(words[i]), location=loc, type=t)
+            i += 1
+        elif kind is ast.Return:
+            node = ast.Return(pop1() if words[i] else None, location=loc, type=t)
+            i += 1
+        elif kind is ast.Break or kind is ast.Continue:
+            node = kind(location=loc, type=t)
+        elif kind is ast.Definition:
+            block = pop1(ast.Block)
+            params = pop(words[i + 1], ast.Identifier)
+            if not isinstance(t, FnType):
+                raise _malformed()
+            node = ast.Definition(string(words[i]), params, block, scope_size=words[i + 2], location=loc, type=t)
+            i += 3
+        elif kind is ast.Module:
+            expr = pop1() if words[i + 1] else None
+            node = ast.Module(pop(words[i], ast.Definition), expr, scope_size=words[i + 2], location=loc, type=t)
+            i += 3
+        stack.append(node)
+
+    if len(stack) != 1 or not isinstance(stack[0], ast.Module):
+        raise _malformed()
+    return stack[0]
+
+
+def read_module(path: str) -> ast.Module:
+    """Loads a module written by write_module, reading the file through an mmap."""
+    with open(path, 'rb') as f:
+        # Closed when the last view of it is gone
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return deserialize_module(buffer)
+
+
+def _children(node: ast.Node) -> list[ast.Node]:
+    """Child nodes in the order they are written."""
+    match node:
+        case ast.Module():
+            return [*node.defs, *([node.expr] if node.expr is not None else [])]
+        case ast.Definition():
+            return [*node.params, node.block]
+        case ast.BinaryOp():
+            return [node.left, node.right]
+        case ast.UnaryOp():
+            return [node.param]
+        case ast.If():
+            return [node.condition, node.true_branch, *([node.false_branch] if node.false_branch is not None else [])]
+        case ast.Function():
+            return [node.id, *node.args]
+        case ast.Block():
+            return [*node.exprs, *([node.res] if node.res is not None else [])]
+        case ast.While():
+            return [node.condition, node.expr]
+        case ast.Var():
+            return [node.id, node.expr]
+        case ast.Return():
+            return [node.expr] if node.expr is not None else []
+    return []
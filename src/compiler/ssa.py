@@ -0,0 +1,335 @@
+"""Static single assignment form of a function's IR, for the passes that need it.
+
+In SSA form every variable is written by a single instruction. Where paths with different
+definitions of a variable join, a phi at the start of the block picks the value coming from the
+predecessor taken. The IR has no instruction for phis, so they are kept beside the blocks, and
+from_ssa() turns them back into Copies at the ends of the predecessors: generate_asm never sees them.
+
+to_ssa() follows Cytron et al.: the dominator tree comes from the iterative algorithm of Cooper,
+Harvey and Kennedy, each variable gets phis at the iterated dominance frontier of the blocks writing
+it, where it is live, and then the definitions are renamed walking down the dominator tree. The
+first definition of a variable keeps its name, and later ones are named x.1, x.2 and so on, so
+code without joins reads as before. Parameters keep their names too: their values are the
+versions defined on entry.
+"""
+from __future__ import annotations
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable
+from compiler import cfg, constant_folding, dataflow, ir
+from compiler.cfg import CFG, BasicBlock
+from compiler.classes import DUMMY_LOCATION, Location
+
+
+@dataclass
+class Phi:
+    dest: ir.IRVar
+    args: dict[int, ir.IRVar] # The value coming from each predecessor, by block index
+
+    def __str__(self) -> str:
+        args = ', '.join(f'{block}: {var}' for block, var in sorted(self.args.items()))
+        return f'Phi({self.dest}, {{{args}}})'
+
+
+@dataclass
+class DominatorTree:
+    idom: list[int] # The immediate dominator of each block; -1 for the entry and unreachable blocks
+    children: list[list[int]]
+
+    def preorder(self) -> list[int]:
+        if not self.idom:
+            return []
+        order: list[int] = []
+        stack = [0]
+        while stack:
+            index = stack.pop()
+            order.append(index)
+            stack += reversed(self.children[index])
+        return order
+
+    def dominates(self, a: int, b: int) -> bool:
+        """Whether every path from the entry to block b goes through block a."""
+        while b != -1:
+            if b == a:
+                return True
+            b = self.idom[b]
+        return False
+
+
+@dataclass
+class SSA:
+    cfg: CFG
+    phis: list[list[Phi]] # Of each block
+    dominators: DominatorTree
+
+
+def dominator_tree(graph: CFG) -> DominatorTree:
+    n = len(graph.blocks)
+    order = graph.reverse_postorder()
+    position = [-1] * n
+    for p, index in enumerate(order):
+        position[index] = p
+    idom = [-1] * n
+
+    def intersect(a: int, b: int) -> int:
+        # Walks up from both blocks to their closest common dominator
+        while a != b:
+            while position[a] > position[b]:
+                a = idom[a]
+            while position[b] > position[a]:
+                b = idom[b]
+        return a
+
+    if order:
+        idom[0] = 0
+    changed = True
+    while changed:
+        changed = False
+        for index in order[1:]:
+            new = -1
+            for p in graph.blocks[index].predecessors:
+                if idom[p] != -1: # Else unreachable, or not visited yet in the first round
+                    new = p if new == -1 else intersect(p, new)
+            if new != idom[index]:
+                idom[index] = new
+                changed = True
+    if order:
+        idom[0] = -1
+
+    children: list[list[int]] = [[] for _ in range(n)]
+    for index in order[1:]:
+        children[idom[index]].append(index)
+    return DominatorTree(idom, children)
+
+
+def dominance_frontiers(graph: CFG, tree: DominatorTree) -> list[set[int]]:
+    """For each block, the blocks where its dominance ends: those it doesn't strictly dominate, but dominates a predecessor of."""
+    frontiers: list[set[int]] = [set() for _ in graph.blocks]
+    for block in graph.blocks:
+        predecessors = [p for p in block.predecessors if p == 0 or tree.idom[p] != -1]
+        if len(predecessors) < 2:
+            continue
+        for p in predecessors:
+            runner = p
+            while runner != tree.idom[block.index]:
+                frontiers[runner].add(block.index)
+                runner = tree.idom[runner]
+                if runner == -1:
+                    break
+    return frontiers
+
+
+def to_ssa(instructions: list[ir.Instruction]) -> SSA:
+    graph = cfg.build_cfg(instructions)
+    cfg.remove_unreachable(graph)
+    if graph.blocks and graph.blocks[0].predecessors:
+        # Nothing would give the entry's phis their values on entry, so an empty block goes first
+        graph.blocks.insert(0, BasicBlock(0, []))
+        for index, block in enumerate(graph.blocks):
+            block.index = index
+        cfg.connect(graph)
+    tree = dominator_tree(graph)
+    frontiers = dominance_frontiers(graph, tree)
+    live = dataflow.liveness(graph)
+    params = graph.fun.params or []
+
+    # The blocks writing each variable, parameters written on entry
+    writers: dict[ir.IRVar, set[int]] = {param: {0} for param in params}
+    for block in graph.blocks:
+        for insn in block.instructions:
+            if (var := dataflow.written(insn)) is not None:
+                writers.setdefault(var, set()).add(block.index)
+
+    phis: list[list[Phi]] = [[] for _ in graph.blocks]
+    phi_vars: list[list[ir.IRVar]] = [[] for _ in graph.blocks] # The variable each phi is for
+    # Testing a bit of a big int copies it, so the live variables of the blocks that can have
+    # phis are looked up in sets
+    live_in = {index: set(dataflow.bits(live.live_in[index])) for frontier in frontiers for index in frontier}
+    for var, blocks in writers.items():
+        var_index = live.vars.index[var]
+        placed: set[int] = set()
+        visited = set(blocks)
+        work = list(blocks)
+        while work:
+            for index in frontiers[work.pop()]:
+                if index in placed or var_index not in live_in[index]:
+                    continue
+                placed.add(index)
+                phis[index].append(Phi(var, {}))
+                phi_vars[index].append(var)
+                if index not in visited:
+                    visited.add(index)
+                    work.append(index)
+
+    names = _NameSupply(graph)
+    # Variables whose first definition can keep their name, as nothing reads them on entry
+    entry_live = set(dataflow.bits(live.live_in[0] if graph.blocks else 0))
+    unrenamed = {var for var in writers if var not in params and live.vars.index[var] not in entry_live}
+    stacks: dict[ir.IRVar, list[ir.IRVar]] = {var: [var] for var in writers}
+    pushed: list[list[ir.IRVar]] = [[] for _ in graph.blocks]
+
+    def current(var: ir.IRVar) -> ir.IRVar:
+        stack = stacks.get(var)
+        return stack[-1] if stack else var
+
+    def define(var: ir.IRVar, block: int) -> ir.IRVar:
+        if var in unrenamed:
+            unrenamed.remove(var)
+            new = var
+        else:
+            new = names.version(var)
+        stacks[var].append(new)
+        pushed[block].append(var)
+        return new
+
+    # Down the dominator tree, popping a block's definitions again once its subtree is done
+    walk = [(0, False)] if graph.blocks else []
+    while walk:
+        index, done = walk.pop()
+        if done:
+            for var in pushed[index]:
+                stacks[var].pop()
+            continue
+        walk.append((index, True))
+        block = graph.blocks[index]
+        for phi, var in zip(phis[index], phi_vars[index]):
+            phi.dest = define(var, index)
+        for position, insn in enumerate(block.instructions):
+            block.instructions[position] = dataflow.rename(insn, current, lambda var: define(var, index))
+        for successor in block.successors:
+            for phi, var in zip(phis[successor], phi_vars[successor]):
+                phi.args[index] = current(var)
+        walk += ((child, False) for child in reversed(tree.children[index]))
+    return SSA(graph, phis, tree)
+
+
+def from_ssa(ssa: SSA) -> list[ir.Instruction]:
+    """The function's instructions with each phi replaced by Copies at the ends of its block's predecessors.
+
+    An edge from a block with several successors to one with phis gets a block of its own for the
+    Copies, which would otherwise run on the other paths too. The Copies of one edge act as if
+    they all happened at once, as phis do, going through a temporary to swap variables. A phi
+    taking a variable that holds a constant loads the constant again instead, which keeps
+    variables apart that passes like gvn merged only because they started out equal.
+    """
+    graph = ssa.cfg
+    labels = ir.NameSupply({label.name for block in graph.blocks if (label := block.label) is not None})
+    for index in range(len(graph.blocks)):
+        block = graph.blocks[index]
+        if not ssa.phis[index]:
+            continue
+        for p in block.predecessors:
+            predecessor = graph.blocks[p]
+            if len(predecessor.successors) < 2:
+                continue
+            target = block.label
+            jump = predecessor.instructions[-1]
+            assert target is not None and isinstance(jump, ir.CondJump) # Only jumps lead to a block with several predecessors
+            label = ir.Label(target.location, labels.fresh('edge'))
+            edge = BasicBlock(len(graph.blocks), [label, ir.Jump(jump.location, target)])
+            graph.blocks.append(edge)
+            ssa.phis.append([])
+            predecessor.instructions[-1] = ir.CondJump(
+                jump.location,
+                jump.cond,
+                label if jump.then_label.name == target.name else jump.then_label,
+                label if jump.else_label.name == target.name else jump.else_label,
+            )
+            for phi in ssa.phis[index]:
+                phi.args[edge.index] = phi.args.pop(p)
+    cfg.connect(graph)
+
+    names = _NameSupply(graph, ssa.phis)
+    constants: dict[ir.IRVar, ir.LoadIntConst | ir.LoadBoolConst] = {}
+    for block in graph.blocks:
+        for insn in block.instructions:
+            if isinstance(insn, (ir.LoadIntConst, ir.LoadBoolConst)):
+                constants[insn.dest] = insn
+    for index, block in enumerate(graph.blocks):
+        if not ssa.phis[index]:
+            continue
+        location = block.instructions[0].location if block.instructions else DUMMY_LOCATION
+        for p in block.predecessors:
+            moves = [(phi.dest, phi.args[p]) for phi in ssa.phis[index] if phi.args[p] not in constants]
+            copies = _sequentialize(moves, names.temporary, location)
+            # After the Copies, which may still read the variables the loads write
+            for phi in ssa.phis[index]:
+                if (constant := constants.get(phi.args[p])) is not None:
+                    copies.append(constant_folding.load(location, constant.value, phi.dest))
+            predecessor = graph.blocks[p]
+            if predecessor.instructions and isinstance(predecessor.instructions[-1], (ir.Jump, ir.CondJump)):
+                predecessor.instructions[-1:-1] = copies
+            else:
+                predecessor.instructions += copies
+        ssa.phis[index] = []
+    return graph.instructions()
+
+
+def remove_unreachable(ssa: SSA) -> list[BasicBlock]:
+    """Like cfg.remove_unreachable(), dropping the phis of the removed blocks and their arguments from them."""
+    before = list(ssa.cfg.blocks)
+    removed = cfg.remove_unreachable(ssa.cfg)
+    if not removed:
+        return removed
+    removed_indices = {block.index for block in removed} # Removed blocks keep their old index
+    new_index = {old: block.index for old, block in enumerate(before) if old not in removed_indices}
+    phis: list[list[Phi]] = [[] for _ in ssa.cfg.blocks]
+    for old, block_phis in enumerate(ssa.phis):
+        if old in new_index:
+            for phi in block_phis:
+                phi.args = {new_index[p]: var for p, var in phi.args.items() if p in new_index}
+            phis[new_index[old]] = block_phis
+    ssa.phis = phis
+    return removed
+
+
+def _sequentialize(moves: list[tuple[ir.IRVar, ir.IRVar]], temporary: Callable[[], ir.IRVar], location: Location) -> list[ir.Instruction]:
+    """Copies doing the moves (dest, source) one after another, with the effect of doing them all at once."""
+    pending = {dest: source for dest, source in moves if dest != source}
+    result: list[ir.Instruction] = []
+    while pending:
+        read = Counter(pending.values())
+        ready = [dest for dest in pending if not read[dest]]
+        if ready:
+            for dest in ready:
+                result.append(ir.Copy(location, pending.pop(dest), dest))
+        else:
+            # What is left are cycles, which a copy of one of their variables breaks
+            dest = next(iter(pending))
+            saved = temporary()
+            result.append(ir.Copy(location, dest, saved))
+            pending = {d: saved if s == dest else s for d, s in pending.items()}
+    return result
+
+
+class _NameSupply:
+    """New variable names that don't clash with those of the function."""
+    def __init__(self, graph: CFG, phis: list[list[Phi]] | None = None) -> None:
+        self.taken = {param.name for param in graph.fun.params or []}
+        for block in graph.blocks:
+            for insn in block.instructions:
+                self.taken.update(var.name for var in dataflow.reads(insn))
+                if (var := dataflow.written(insn)) is not None:
+                    self.taken.add(var.name)
+        for block_phis in phis or []:
+            for phi in block_phis:
+                self.taken.add(phi.dest.name)
+                self.taken.update(var.name for var in phi.args.values())
+        self.counters: dict[str, int] = {}
+
+    def version(self, var: ir.IRVar) -> ir.IRVar:
+        return self._fresh(var.name.partition('.')[0])
+
+    def temporary(self) -> ir.IRVar:
+        return self._fresh('swap')
+
+    def _fresh(self, base: str) -> ir.IRVar:
+        n = self.counters.get(base, 0)
+        while True:
+            n += 1
+            name = f'{base}.{n}'
+            if name not in self.taken:
+                break
+        self.counters[base] = n
+        self.taken.add(name)
+        return ir.IRVar(name)
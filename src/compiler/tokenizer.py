@@ -1,48 +1,178 @@
+from __future__ import annotations
+from array import array
+from bisect import bisect_right
+import codecs
+import copy
+import mmap
 import re
+from typing import IO, Callable, Iterator
 from compiler.classes import *
 
+# Token kinds in priority order: earlier kinds win when several could match at the same position.
+# Groups inside the patterns must be non-capturing, so that match.lastgroup is always the kind.
+token_patterns: dict[str, str] = {
+    'break': r'break',
+    'continue': r'continue',
+    'bool_literal': r'(?:true|false)',
+    'type': r'Int|Bool|Unit',
+    'identifier': r'[a-zA-Z_][a-zA-Z0-9_]*',
+    'int_literal': r'[0-9]+',
+    'operator': r'(?:[=!<>]=|[=*/%<>+-])',
+    'punctuation': r'[(){},;:]',
+}
+
+# Whitespace and comments are skipped by the 'ws' group, every other group is a token kind
+token_regex = re.compile('|'.join(
+    [r'(?P<ws>(?:\s|(?:#|//).*)+)'] +
+    [f'(?P<{kind}>{pattern})' for kind, pattern in token_patterns.items()]
+))
+
+token_kinds: list[str] = list(token_patterns)
+
+# Everything str.splitlines() treats as a line boundary
+line_break = re.compile(r'\r\n|[\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]')
+
+type TokenSource = str | bytes | bytearray | memoryview | mmap.mmap | IO[str] | IO[bytes]
+
+chunk_size = 1 << 16
+
 def tokenize(source_code: str, source_location: str = 'string') -> list[Token]:
-    tokens = {
-        'comment': re.compile(r'(#|//).*'),
-        'break': re.compile(r'break'),
-        'continue': re.compile(r'continue'),
-        'bool_literal': re.compile(r'(true|false)'),
-        'type': re.compile(r'Int|Bool|Unit'),
-        'identifier': re.compile(r'[a-zA-Z_][a-zA-Z0-9_]*'),
-        'int_literal': re.compile(r'[0-9]+'),
-        'operator': re.compile(r'([=!<>]=|[=*/%<>+-])'),
-        'punctuation': re.compile(r'[(){},;:]'),
-    }
-    ws = re.compile(r'(\s|(#|//).*)') # whitespace and comments
-    
-    res = []
+    return list(iter_tokens(source_code, source_location))
+
+def iter_tokens(source: TokenSource, source_location: str = 'string') -> Iterator[Token]:
+    """Lazily tokenizes source code given as a string, a UTF-8 buffer (e.g. an mmap) or an open file.
+
+    Buffers and files are decoded and scanned one chunk at a time, so only the current chunk
+    and the token being matched are kept in memory.
+    """
+    chunks = _read_chunks(source)
+    buf = ''
+    base = 0 # Index of buf[0] in the whole source
     pos = 0
-    while pos < len(source_code):
-        ws_match = ws.match(source_code, pos)
-        if ws_match:
-            pos = ws_match.end()
+    eof = False
+    line = 1
+    line_start = 0 # Index of the first character on the current line
+    while True:
+        match = token_regex.match(buf, pos)
+        # A match (or a failed match) running into the end of the buffer might continue in the next chunk
+        if not eof and (not match or match.end() == len(buf)):
+            chunk = next(chunks, None)
+            if chunk is None:
+                eof = True
+            else:
+                base += pos
+                buf = buf[pos:] + chunk
+                pos = 0
             continue
-        
-        matched_token = False
-        for token_type, pattern in tokens.items():
-            match = pattern.match(source_code, pos)
+        if not match:
+            if pos < len(buf):
+                raise(ValueError("Unidentified character at position", base + pos))
+            return
+        kind = match.lastgroup
+        if kind == 'ws':
+            for br in line_break.finditer(buf, pos, match.end()):
+                line += 1
+                line_start = base + br.end()
+        elif kind is not None:
+            l = Location(source_location, line, base + pos - line_start + 1)
+            yield Token(match.group(), kind, l)
+        pos = match.end()
+
+def _read_chunks(source: TokenSource) -> Iterator[str]:
+    if isinstance(source, str):
+        yield source
+        return
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        view = memoryview(source)
+        for i in range(0, len(view), chunk_size):
+            yield decoder.decode(view[i:i + chunk_size])
+    else:
+        while chunk := source.read(chunk_size):
+            yield chunk if isinstance(chunk, str) else decoder.decode(chunk)
+    yield decoder.decode(b'', final=True)
+
+
+class TokenStream:
+    """Tokens of a source string stored as parallel arrays of kind codes, start offsets and lengths.
+
+    Token texts are sliced from the source and Token/Location objects are only built on request,
+    so a token costs a few bytes instead of three Python objects.
+    """
+    source: str
+    source_location: str
+    kinds: array # Index into token_kinds
+    starts: array
+    lengths: array
+    line_starts: array # Offset of the first character of each line
+    first_line: int # Line number of the start of the source, for sources cut out of a bigger file
+
+    def __init__(self, source_code: str, source_location: str = 'string', first_line: int = 1) -> None:
+        self.source = source_code
+        self.source_location = source_location
+        self.first_line = first_line
+        self.kinds = array('B')
+        self.starts = array('q')
+        self.lengths = array('l')
+        self.line_starts = array('q', [0])
+        self.scan(0)
+
+    def scan(self, pos: int, stop: Callable[[int], bool] | None = None) -> int:
+        """Appends the tokens and line starts of the source from pos onwards.
+
+        If stop is given, scanning ends before the first token for whose start offset it returns true.
+        Returns the offset where scanning ended.
+        """
+        source_code = self.source
+        end = len(source_code)
+        while pos < end:
+            match = token_regex.match(source_code, pos)
             if not match:
-                continue
-            # Token matched
-            matched_token = True
-            pos = match.end()
-            ln, col = index_to_coordinates(source_code, match.start())
-            l = Location(source_location, ln, col)
-            t = Token(match.group(0), token_type, l)
-            res.append(t)
-        
-        if not matched_token:
-            raise(ValueError("Unidentified character at position", pos))
-    return res
-
-def index_to_coordinates(s: str, index: int) -> tuple[int, int]:
-    # Courtesy of https://stackoverflow.com/a/66443805
-    if not len(s):
-        return 1, 1
-    sp = s[:index+1].splitlines(keepends=True)
-    return len(sp), len(sp[-1])
\ No newline at end of file
+                raise(ValueError("Unidentified character at position", pos))
+            match_end = match.end()
+            # Group 1 is whitespace, groups 2.. are the token kinds in order
+            group = match.lastindex or 0
+            if group == 1:
+                for br in line_break.finditer(source_code, pos, match_end):
+                    self.line_starts.append(br.end())
+            else:
+                if stop is not None and stop(pos):
+                    return pos
+                self.kinds.append(group - 2)
+                self.starts.append(pos)
+                self.lengths.append(match_end - pos)
+            pos = match_end
+        return end
+
+    def slice(self, start: int, end: int) -> TokenStream:
+        """Tokens start..end-1 as a stream over the same source."""
+        res = copy.copy(self)
+        res.kinds = self.kinds[start:end]
+        res.starts = self.starts[start:end]
+        res.lengths = self.lengths[start:end]
+        return res
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def __getitem__(self, i: int) -> Token:
+        return Token(self.text(i), self.type(i), self.location(i))
+
+    def __iter__(self) -> Iterator[Token]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def text(self, i: int) -> str:
+        start = self.starts[i]
+        return self.source[start:start + self.lengths[i]]
+
+    def type(self, i: int) -> str:
+        return token_kinds[self.kinds[i]]
+
+    def end(self, i: int) -> int:
+        return self.starts[i] + self.lengths[i]
+
+    def location(self, i: int) -> Location:
+        start = self.starts[i]
+        line = bisect_right(self.line_starts, start)
+        return Location(self.source_location, self.first_line + line - 1, start - self.line_starts[line - 1] + 1)
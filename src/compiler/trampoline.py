@@ -0,0 +1,22 @@
+from typing import Any, Generator
+
+# A recursive pass written as generators: instead of calling itself, a step yields the generator
+# for the sub-step and is sent back its result. run() keeps the pending steps on an explicit stack,
+# so nesting depth is limited by memory instead of Python's recursion limit.
+type Step[T] = Generator[Step[Any], Any, T]
+
+
+def run[T](step: Step[T]) -> T:
+    stack: list[Step[Any]] = [step]
+    value: Any = None
+    while True:
+        try:
+            sub_step = stack[-1].send(value)
+        except StopIteration as e:
+            stack.pop()
+            if not stack:
+                return e.value
+            value = e.value
+            continue
+        stack.append(sub_step)
+        value = None
@@ -0,0 +1,294 @@
+"""Runs programs by translating a type checked module into Python source and letting CPython compile it.
+
+Functions become Python functions and loops become Python loops, so break and continue are
+Python's own. The language's expressions can contain statements, so an expression is translated
+into the statements it needs followed by a Python expression for its value. Whenever the
+statements of an operand would run between the evaluation of earlier operands and their use, the
+earlier operands are first saved in temporaries, keeping the evaluation order of the source.
+
+Variables are named after their resolved address, so shadowed variables get distinct names:
+v_<name>_<depth>_<slot> for variables, f_<name> for functions and _t<n> for temporaries.
+Ints wrap around to 64 bits after every +, - and *, like the generated machine code does.
+
+Compiled code objects are cached by a hash of the generated source. Programs nested too deeply
+for CPython's compiler fall back to the closure compiler.
+"""
+from __future__ import annotations
+from collections import OrderedDict
+import hashlib
+from types import CodeType
+from typing import Any, Callable
+from compiler import ast, closure_compiler, resolver, runtime, trampoline
+from compiler.runtime import INT_MIN, INT_MAX, wrap64
+from compiler.trampoline import Step
+from compiler.types import Bool, Int
+
+code_cache_size = 256
+_code_cache: OrderedDict[str, CodeType] = OrderedDict()
+cache_stats = {'hits': 0, 'misses': 0}
+
+# Helpers the generated code calls, besides the builtins
+_runtime_names: dict[str, Any] = {'_wrap64': wrap64, '_div': runtime.div, '_mod': runtime.mod, '_neg': runtime.neg}
+
+_comparisons = {'<', '>', '<=', '>=', '==', '!='}
+
+
+def compile_module(module: ast.Module) -> Callable[[], Any]:
+    """Compiles a type checked module. The returned function runs the module like its executable
+    would, printing the result of the main expression if it is an Int or a Bool, and returns that result."""
+    source = transpile(module)
+    try:
+        code = compile_source(source)
+    except (SyntaxError, RecursionError, MemoryError):
+        return closure_compiler.compile_module(module)
+    namespace: dict[str, Any] = {'__builtins__': {}, **_runtime_names}
+    namespace.update((name, f) for name, f in runtime.builtin_functions.items() if name.isidentifier())
+    exec(code, namespace)
+    main: Callable[[], Any] = namespace['main']
+    return main
+
+
+def compile_source(source: str) -> CodeType:
+    key = hashlib.sha256(source.encode()).hexdigest()
+    code = _code_cache.get(key)
+    if code is not None:
+        _code_cache.move_to_end(key)
+        cache_stats['hits'] += 1
+        return code
+    cache_stats['misses'] += 1
+    code = compile(source, f'<transpiled {key[:12]}>', 'exec')
+    _code_cache[key] = code
+    if len(_code_cache) > code_cache_size:
+        _code_cache.popitem(last=False)
+    return code
+
+
+def transpile(module: ast.Module) -> str:
+    """Python source defining a function for each of the module's functions, and main() for its expression."""
+    globals = [name if name in runtime.builtin_functions else f'f_{name}' for name in resolver.global_names(module)]
+
+    lines: list[str] = []
+    for d in module.defs:
+        translator = _Translator(globals, lines, 1)
+        params = ', '.join(translator.local_name(p) for p in d.params)
+        lines.append(f'def f_{d.name}({params}):')
+        start = len(lines)
+        for e in d.block.exprs:
+            translator.effect(trampoline.run(translator.translate(e)))
+        if d.block.res is not None:
+            translator.effect(trampoline.run(translator.translate(d.block.res)))
+        translator.close_block(start)
+
+    lines.append('def main():')
+    if module.expr is None:
+        lines.append('    return None')
+        return '\n'.join(lines) + '\n'
+    translator = _Translator(globals, lines, 1)
+    result = trampoline.run(translator.translate(module.expr))
+    if not translator.stable(result):
+        # Printed and returned, but only evaluated once
+        temporary = translator.temporary()
+        translator.emit(f'{temporary} = {result}')
+        result = temporary
+    if module.expr.type is Int():
+        translator.emit(f'print_int({result})')
+    elif module.expr.type is Bool():
+        translator.emit(f'print_bool({result})')
+    translator.emit(f'return {result}')
+    return '\n'.join(lines) + '\n'
+
+
+def _is_constant(code: str) -> bool:
+    return code in ('True', 'False', 'None') or code.lstrip('(-').rstrip(')').isdigit()
+
+
+class _Translator:
+    """Translates the nodes of one function, or of main, appending statements to lines."""
+    def __init__(self, globals: list[str], lines: list[str], indent: int) -> None:
+        self.globals = globals
+        self.lines = lines
+        self.indent = indent
+        self.temporaries = 0
+        self.loops = 0
+
+    def emit(self, statement: str) -> None:
+        self.lines.append('    ' * self.indent + statement)
+
+    def temporary(self) -> str:
+        self.temporaries += 1
+        return f'_t{self.temporaries}'
+
+    def stable(self, code: str) -> bool:
+        """Whether code has the same value wherever it is evaluated: temporaries are only assigned once."""
+        return _is_constant(code) or (code.startswith('_t') and code.isidentifier())
+
+    def effect(self, code: str) -> None:
+        """Evaluates code for its side effects only, if it can have any."""
+        if not (_is_constant(code) or code.isidentifier()):
+            self.emit(code)
+
+    def close_block(self, start: int) -> None:
+        """Ends the body of a compound statement whose first line would be at start."""
+        if len(self.lines) == start:
+            self.emit('pass')
+
+    def local_name(self, identifier: ast.Identifier) -> str:
+        return f'v_{identifier.name}_{identifier.depth}_{identifier.slot}'
+
+    def name(self, identifier: ast.Identifier) -> str:
+        if identifier.depth == 0 and identifier.slot < len(self.globals):
+            return self.globals[identifier.slot]
+        return self.local_name(identifier)
+
+    def operands(self, nodes: list[ast.Expression]) -> Step[list[str]]:
+        """Translates nodes in order; operands not yet used when a later one runs statements are saved first."""
+        codes: list[str] = []
+        for node in nodes:
+            start = len(self.lines)
+            code = yield self.translate(node)
+            if len(self.lines) > start:
+                saved = []
+                for i, earlier in enumerate(codes):
+                    if not self.stable(earlier):
+                        codes[i] = self.temporary()
+                        saved.append('    ' * self.indent + f'{codes[i]} = {earlier}')
+                self.lines[start:start] = saved
+            codes.append(code)
+        return codes
+
+    def translate(self, node: ast.Expression) -> Step[str]:
+        match node:
+            case ast.Literal():
+                if node.value is None or type(node.value) is bool:
+                    return repr(node.value)
+                value = wrap64(node.value)
+                return str(value) if value >= 0 else f'({value})'
+
+            case ast.Identifier():
+                return self.name(node)
+
+            case ast.BinaryOp() if node.op == '=':
+                assert isinstance(node.left, ast.Identifier)
+                value = yield self.translate(node.right)
+                target = self.name(node.left)
+                self.emit(f'{target} = {value}')
+                return target
+
+            case ast.BinaryOp() if node.op in ('and', 'or'):
+                left = yield self.translate(node.left)
+                result = self.temporary()
+                start = len(self.lines)
+                self.emit(f'{result} = {left}')
+                self.emit(f'if {result}:' if node.op == 'and' else f'if not {result}:')
+                self.indent += 1
+                right = yield self.translate(node.right)
+                self.emit(f'{result} = {right}')
+                self.indent -= 1
+                if len(self.lines) == start + 3:
+                    # The right side is a plain expression, so Python's own short-circuiting will do
+                    del self.lines[start:]
+                    return f'({left} {node.op} {right})'
+                return result
+
+            case ast.BinaryOp():
+                left, right = yield self.operands([node.left, node.right])
+                if node.op in _comparisons:
+                    return f'({left} {node.op} {right})'
+                if node.op in ('+', '-', '*'):
+                    result = self.temporary()
+                    self.emit(f'{result} = {left} {node.op} {right}')
+                    self.emit(f'if not {INT_MIN} <= {result} <= {INT_MAX}: {result} = _wrap64({result})')
+                    return result
+                if node.op == '/':
+                    return f'_div({left}, {right})'
+                if node.op == '%':
+                    return f'_mod({left}, {right})'
+
+            case ast.UnaryOp():
+                param = yield self.translate(node.param)
+                if node.op == '()':
+                    return param
+                if node.op == 'unary_-':
+                    return f'_neg({param})'
+                if node.op == 'unary_not':
+                    return f'(not {param})'
+
+            case ast.If():
+                condition = yield self.translate(node.condition)
+                start = len(self.lines)
+                self.emit(f'if {condition}:')
+                self.indent += 1
+                then = yield self.translate(node.true_branch)
+                if node.false_branch is None:
+                    self.effect(then)
+                    self.close_block(start + 1)
+                    self.indent -= 1
+                    return 'None'
+                result = self.temporary()
+                then_end = len(self.lines)
+                self.emit(f'{result} = {then}')
+                self.indent -= 1
+                self.emit('else:')
+                self.indent += 1
+                else_start = len(self.lines)
+                else_ = yield self.translate(node.false_branch)
+                else_end = len(self.lines)
+                self.emit(f'{result} = {else_}')
+                self.indent -= 1
+                if then_end == start + 1 and else_end == else_start:
+                    del self.lines[start:]
+                    return f'({then} if {condition} else {else_})'
+                return result
+
+            case ast.While():
+                start = len(self.lines)
+                self.emit('while True:')
+                self.indent += 1
+                self.loops += 1
+                condition = yield self.translate(node.condition)
+                self.loops -= 1
+                if len(self.lines) == start + 1:
+                    self.lines[start] = '    ' * (self.indent - 1) + f'while {condition}:'
+                else:
+                    self.emit(f'if not {condition}: break')
+                self.loops += 1
+                body = yield self.translate(node.expr)
+                self.loops -= 1
+                self.effect(body)
+                self.close_block(start + 1)
+                self.indent -= 1
+                return 'None'
+
+            case ast.Function():
+                args = yield self.operands([node.id, *node.args])
+                callee = args[0]
+                return f'{callee}({", ".join(args[1:])})'
+
+            case ast.Block():
+                for expr in node.exprs:
+                    self.effect((yield self.translate(expr)))
+                if node.res is None:
+                    return 'None'
+                res: str = yield self.translate(node.res)
+                return res
+
+            case ast.Var():
+                value = yield self.translate(node.expr)
+                self.emit(f'{self.name(node.id)} = {value}')
+                return 'None'
+
+            case ast.Break() | ast.Continue():
+                if not self.loops:
+                    raise SyntaxError(f'{node.location}: {type(node).__name__.lower()} called outside of a loop')
+                self.emit(type(node).__name__.lower())
+                return 'None'
+
+            case ast.Return():
+                if node.expr is None:
+                    self.emit('return None')
+                    return 'None'
+                value = yield self.translate(node.expr)
+                self.emit(f'return {value}')
+                return 'None'
+
+        raise TypeError(f'{node.location}: cannot translate {type(node).__name__}')
@@ -1,51 +1,123 @@
 from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+from typing import Sequence
 import compiler.ast as ast
 from compiler.types import *
 from compiler.classes import Location
-from compiler.symtab import SymTab
 from compiler.builtins import builtin_function_types
+from compiler import resolver, trampoline
+from compiler.trampoline import Step
 
-def typecheck_module(module: ast.Module) -> Type:
-    type_dict = builtin_function_types.copy()
-    for d in module.defs:
-        if d.name in type_dict:
-            raise ValueError(f'{d.location}: function "{d.name}" already defined')
-        type_dict[d.name] = d.type
-    symtab = SymTab[Type](None, type_dict)
-    
-    for d in module.defs:
-        definition_symtab = SymTab[Type](symtab)
-        typecheck_definition(d, definition_symtab)
-    
-    if module.expr:
-        module_type = typecheck(module.expr, symtab)
+# The types of the variables in each open scope, indexed by the depth and slot the resolver gave them
+type Scopes = list[list[Type]]
+
+def new_scope(size: int, known: Sequence[Type] = ()) -> list[Type]:
+    # Slots are only read after the declaration that sets them, Unit() just fills them until then
+    return [*known, *[Unit()] * (size - len(known))]
+
+def typecheck_module(module: ast.Module, parallel_threshold: int | None = None) -> Type:
+    """Type checks a module. With at least parallel_threshold function definitions (default_parallel_threshold
+    if not given) and more than one CPU, the definitions are checked in worker processes, see typecheck_parallel."""
+    resolver.resolve_module(module)
+    scopes = [new_scope(module.scope_size, [*builtin_function_types.values(), *(d.type for d in module.defs)])]
+
+    threshold = default_parallel_threshold if parallel_threshold is None else parallel_threshold
+    workers = parallel_workers or os.cpu_count() or 1
+    if len(module.defs) >= threshold and workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        module_type = typecheck_parallel(module, scopes, workers)
     else:
-        module_type = Unit()
+        for d in module.defs:
+            typecheck_definition(d, scopes)
+        
+        if module.expr:
+            module_type = typecheck(module.expr, scopes)
+        else:
+            module_type = Unit()
     
     module.type = module_type
     return module_type
 
-def typecheck_definition(definition: ast.Definition, symtab: SymTab[Type]) -> Type:
+# Number of function definitions from which typecheck_module checks them in parallel. Below a few
+# hundred definitions per worker, starting the workers costs more than the checking.
+default_parallel_threshold = 2000
+
+# Number of worker processes for parallel type checking, None for one per CPU
+parallel_workers: int | None = None
+
+def typecheck_parallel(module: ast.Module, scopes: Scopes, workers: int) -> Type:
+    """Checks the definitions in chunks in forked worker processes, and the main expression meanwhile in this one.
+
+    The workers inherit the resolved module, so only the types of the nodes are sent back, in ast.walk order.
+    Definitions only see the module scope, so they can be checked in any order, but errors are raised
+    in the order typecheck_module would find them serially: definitions first, then the main expression.
+    """
+    # A few chunks per worker evens out differences in chunk checking times
+    chunk_size = max(len(module.defs) // (workers * 4), 1)
+    chunks = [(start, min(start + chunk_size, len(module.defs))) for start in range(0, len(module.defs), chunk_size)]
+    context = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(workers, context, initializer=_init_worker, initargs=(module, scopes)) as executor:
+        results = executor.map(_typecheck_definitions, *zip(*chunks))
+
+        expr_error: Exception | None = None
+        module_type: Type = Unit()
+        try:
+            if module.expr:
+                module_type = typecheck(module.expr, scopes)
+        except Exception as e:
+            expr_error = e
+
+        for (start, end), chunk_types in zip(chunks, results):
+            for d, types in zip(module.defs[start:end], chunk_types):
+                for node, t in zip(ast.walk(d), types, strict=True):
+                    node.type = t
+    if expr_error is not None:
+        raise expr_error
+    return module_type
+
+_worker_module: tuple[ast.Module, Scopes] | None = None
+
+def _init_worker(module: ast.Module, scopes: Scopes) -> None:
+    global _worker_module
+    _worker_module = (module, scopes)
+
+def _typecheck_definitions(start: int, end: int) -> list[list[Type]]:
+    assert _worker_module is not None
+    module, scopes = _worker_module
+    types = []
+    for d in module.defs[start:end]:
+        typecheck_definition(d, scopes)
+        types.append([node.type for node in ast.walk(d)])
+    return types
+
+def typecheck_definition(definition: ast.Definition, scopes: Scopes) -> Type:
     assert len(definition.params) == len(definition.type.params)
-    for i in range(len(definition.params)):
-        symtab.set(definition.params[i].name, definition.type.params[i])
+    scopes.append(new_scope(definition.scope_size, definition.type.params))
     
     for e in definition.block.exprs:
-        expr_type = typecheck(e, symtab)
-        if isinstance(e, ast.Return) and expr_type != definition.type.res:
+        expr_type = typecheck(e, scopes)
+        if isinstance(e, ast.Return) and expr_type is not definition.type.res:
             raise TypeError(f'{e.location}: return type doesn\'t match function definition ({definition.type})')
 
     if definition.block.res:
-        typecheck(definition.block.res, symtab)
+        typecheck(definition.block.res, scopes)
 
+    scopes.pop()
     return definition.type
 
-def typecheck(node: ast.Expression, symtab: SymTab[Type]) -> Type:
+def _check_resolved(identifier: ast.Identifier) -> None:
+    assert identifier.depth >= 0, f'{identifier.location}: "{identifier.name}" wasn\'t resolved, see resolver.resolve_module'
+
+def typecheck(node: ast.Expression, scopes: Scopes) -> Type:
+    return trampoline.run(_typecheck(node, scopes))
+
+def _typecheck(node: ast.Expression, scopes: Scopes) -> Step[Type]:
     def check_match(where: Location, expected: Type, got: Type) -> None:
-        if expected != got:
+        if expected is not got:
             raise TypeError(f'{node} at {where}: expected type {expected}, got {got}')
         
-    def get_type() -> Type:
+    def get_type() -> Step[Type]:
         match node:
             case ast.Literal():
                 match node.value:
@@ -57,29 +129,23 @@ def typecheck(node: ast.Expression, symtab: SymTab[Type]) -> Type:
                         return Unit()
             
             case ast.Identifier():
-                id_type = symtab.get(node.name)
-                if id_type is None:
-                    raise ValueError(f'{node.location}: undefined identifier "{node.name}"')
-                return id_type
+                _check_resolved(node)
+                return scopes[node.depth][node.slot]
             
             case ast.BinaryOp():
-                t1 = typecheck(node.left, symtab)
-                t2 = typecheck(node.right, symtab)
+                t1 = yield _typecheck(node.left, scopes)
+                t2 = yield _typecheck(node.right, scopes)
                 if node.op in ['==', '!=']:
-                    if t1 != t2:
+                    if t1 is not t2:
                         raise TypeError(f'{node.location}: comparison\'s types mismatch (got {t1} and {t2})')
                     return Bool()
                 if node.op == '=':
                     if not isinstance(node.left, ast.Identifier):
                         raise TypeError(f'{node.location}: left side of assignment isn\'t an identifier')
                     else:
-                        key = node.left.name
-                        if symtab.get(key) is None:
-                            raise ValueError(f'{node.location}: undefined variable "{node.left.name}"')
                         check_match(node.location, t1, t2)
-                        symtab.set(key, t2)
                         return t2
-                op: Type | None = symtab.get(node.op)
+                op: Type | None = builtin_function_types.get(node.op)
                 if op is None or not isinstance(op, FnType) or len(op.params) != 2:
                     raise ValueError(f'{node.location}: undefined operator "{node.op}"')
                 check_match(node.location, op.params[0], t1)
@@ -87,7 +153,7 @@ def typecheck(node: ast.Expression, symtab: SymTab[Type]) -> Type:
                 return op.res
             
             case ast.UnaryOp():
-                t = typecheck(node.param, symtab)
+                t = yield _typecheck(node.param, scopes)
                 if node.op == 'unary_not':
                     check_match(node.location, Bool(), t)
                 if node.op == 'unary_-':
@@ -95,54 +161,57 @@ def typecheck(node: ast.Expression, symtab: SymTab[Type]) -> Type:
                 return t
             
             case ast.If():
-                check_match(node.location, Bool(), typecheck(node.condition, symtab))
-                true_t = typecheck(node.true_branch, symtab)
+                check_match(node.location, Bool(), (yield _typecheck(node.condition, scopes)))
+                true_t = yield _typecheck(node.true_branch, scopes)
                 if node.false_branch is None:
                     return Unit()
-                false_t = typecheck(node.false_branch, symtab)
-                if true_t != false_t:
+                false_t = yield _typecheck(node.false_branch, scopes)
+                if true_t is not false_t:
                     raise TypeError(f'{node.location}: mismatching types in conditional branches ({true_t} and {false_t})')
                 return true_t
             
             case ast.Function():
-                f: Type | None = symtab.get(node.id.name)
-                if f is None or not isinstance(f, FnType):
+                _check_resolved(node.id)
+                f = scopes[node.id.depth][node.id.slot]
+                if not isinstance(f, FnType):
                     raise ValueError(f'{node.location}: undefined function "{node.id.name}"')
                 if len(node.args) != len(f.params):
-                    raise ValueError(f'{node.location}: function {node.id.name} takes {f.params}, got {len(node.args)}')
-                if f.params != [typecheck(arg, symtab) for arg in node.args]:
+                    raise ValueError(f'{node.location}: function {node.id.name} takes {list(f.params)}, got {len(node.args)}')
+                arg_types = []
+                for arg in node.args:
+                    arg_types.append((yield _typecheck(arg, scopes)))
+                if any(p is not a for p, a in zip(f.params, arg_types)):
                     raise ValueError(f'{node.location}: types of arguments don\'t match parameters')
                 return f.res
             
             case ast.Block():
-                block_st = SymTab[Type](symtab)
+                scopes.append(new_scope(node.scope_size))
                 for expr in node.exprs:
-                    typecheck(expr, block_st)
-                if node.res is None:
-                    return Unit()
-                return typecheck(node.res, block_st)
+                    yield _typecheck(expr, scopes)
+                res_type = Unit() if node.res is None else (yield _typecheck(node.res, scopes))
+                scopes.pop()
+                return res_type
 
             case ast.While():
-                check_match(node.location, Bool(), typecheck(node.condition, symtab))
-                typecheck(node.expr, symtab)
+                check_match(node.location, Bool(), (yield _typecheck(node.condition, scopes)))
+                yield _typecheck(node.expr, scopes)
                 return Unit()
             
             case ast.Var():
-                if symtab.is_in_scope(node.id.name):
-                    raise ValueError(f'{node.location}: Variable "{node.id.name}" already declared in scope')
-                t = typecheck(node.expr, symtab)
-                if node.typed and node.type != t:
+                t = yield _typecheck(node.expr, scopes)
+                if node.typed and node.type is not t:
                     raise TypeError(f'{node.location}: mismatch between declared type ({node.type}) and actual type ({t})')
-                symtab.define(node.id.name, t)
+                _check_resolved(node.id)
+                scopes[node.id.depth][node.id.slot] = t
                 return Unit()
             
             case ast.Return():
                 if not node.expr:
                     return Unit()
-                return typecheck(node.expr, symtab)
+                return (yield _typecheck(node.expr, scopes))
 
         return Unit()
     
-    node_type: Type = get_type()
+    node_type: Type = yield from get_type()
     node.type = node_type
     return node_type
\ No newline at end of file
@@ -1,28 +1,44 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
+from typing import Any, Sequence
 
-@dataclass
-class Type():
-    pass
+# Every distinct type exists exactly once: constructing a type returns the existing instance
+# if there is one. Types can then be compared with `is` and hashed by identity, and as they
+# are immutable, the same instance can be shared by any number of nodes.
+_interned: dict[tuple[Any, ...], 'Type'] = {}
 
-@dataclass
+class _Interned(type):
+    def __call__(cls, *args: Any) -> Any:
+        key = (cls, *(tuple(a) if isinstance(a, list) else a for a in args))
+        instance = _interned.get(key)
+        if instance is None:
+            instance = _interned.setdefault(key, super().__call__(*key[1:]))
+        return instance
+
+@dataclass(frozen=True, slots=True, eq=False)
+class Type(metaclass=_Interned):
+    def __reduce__(self) -> tuple[Any, ...]:
+        # Unpickling and copying go through the constructor, so they return the interned instance
+        return (type(self), tuple(getattr(self, f.name) for f in fields(self)))
+
+@dataclass(frozen=True, slots=True, eq=False)
 class Int(Type):
     def __str__(self) -> str:
         return 'Int'
 
-@dataclass
+@dataclass(frozen=True, slots=True, eq=False)
 class Bool(Type):
     def __str__(self) -> str:
         return 'Bool'
 
-@dataclass
+@dataclass(frozen=True, slots=True, eq=False)
 class Unit(Type):
     def __str__(self) -> str:
         return 'Unit'
 
-@dataclass
+@dataclass(frozen=True, slots=True, eq=False)
 class FnType(Type):
-    params: list[Type]
+    params: Sequence[Type] # Always stored as a tuple
     res: Type
-    
+
     def __str__(self) -> str:
-        return f'({", ".join(map(str, self.params))}) => {self.res}'
\ No newline at end of file
+        return f'({", ".join(map(str, self.params))}) => {self.res}'
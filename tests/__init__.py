@@ -0,0 +1,42 @@
+import contextlib
+import io
+from collections import Counter
+from typing import Callable
+from compiler import cfg, ir, ir_generator, ir_interpreter, parser, tokenizer, type_checker
+from compiler.ir_optimizer import Pass, PassStats, optimize
+
+type Program = dict[str, list[ir.Instruction]]
+
+def generate_string(s: str) -> Program:
+    module = parser.parse(tokenizer.TokenStream(s))
+    type_checker.typecheck_module(module)
+    return ir_generator.generate_ir(module)
+
+def build_string(s: str, function: str = 'main') -> cfg.CFG: return cfg.build_cfg(generate_string(s)[function])
+
+def run_pass(optimization: Pass, s: str, function: str = 'main') -> tuple[list[str], Counter[str]]:
+    """The instructions of function after the pass, as strings, and the pass's stats."""
+    stats: Counter[str] = Counter()
+    result = optimization(generate_string(s)[function], stats)
+    return [str(i) for i in result], stats
+
+def assert_same_output(
+    source: str,
+    expected: str,
+    transform: Callable[[Program, PassStats], Program] = optimize,
+) -> tuple[Program, PassStats]:
+    """Checks that the IR of source prints expected when interpreted, both as generated and after transform.
+    Returns the transformed program and the stats transform was given."""
+    def output(program: Program) -> str:
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            ir_interpreter.run_program(program)
+        return out.getvalue()
+
+    # Not a test module, so pytest doesn't explain failed asserts here
+    program = generate_string(source)
+    assert (before := output(program)) == expected, f'Printed {before!r} before transforming, expected {expected!r}'
+    stats = PassStats()
+    transformed = transform(program, stats)
+    assert (after := output(transformed)) == expected, f'Printed {after!r} after transforming, expected {expected!r}'
+    return transformed, stats
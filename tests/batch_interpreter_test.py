@@ -0,0 +1,58 @@
+import pytest
+from compiler import batch_interpreter, parser, tokenizer, type_checker
+
+def run_batch(s: str, inputs: list[list[int]]) -> list[str]:
+    module = parser.parse(tokenizer.TokenStream(s))
+    type_checker.typecheck_module(module)
+    return batch_interpreter.run_batch(module, inputs)
+
+def test_lanes_take_different_paths() -> None:
+    source = '''
+fun fib(n: Int): Int { if n < 2 then return n; return fib(n - 1) + fib(n - 2); }
+var n = read_int();
+var s = 0;
+var i = 0;
+while i < n do {
+    i = i + 1;
+    if i % 3 == 0 then continue;
+    if i > 8 then break;
+    s = s + i;
+}
+print_int(s);
+print_int(fib(n));
+if n > 5 then { return; }
+n < 3 and { print_int(-n); true } or { print_int(n / 2); false }
+'''
+    assert run_batch(source, [[1], [2], [4], [7], [12]]) == [
+        '1\n1\n-1\ntrue\n',
+        '3\n1\n-2\ntrue\n',
+        '7\n3\n2\nfalse\n',
+        '19\n13\n',
+        '27\n144\n',
+    ]
+
+def test_machine_arithmetic() -> None:
+    assert run_batch('{ var a = read_int(); print_int(a / -2); print_int(a % 3); a * 4611686018427387904 + 9223372036854775807 }',
+                     [[-7], [7], [2]]) == [
+        '3\n-1\n-4611686018427387905\n',
+        '-3\n1\n4611686018427387903\n',
+        '-1\n2\n-1\n',
+    ]
+
+def test_smallest_int_division() -> None:
+    source = '{ var m = -9223372036854775807 - 1; var d = read_int(); print_int(m / d); m % d }'
+    assert run_batch(source, [[3], [2], [-3], [-1]]) == [
+        '-3074457345618258602\n-2\n',
+        '-4611686018427387904\n0\n',
+        '3074457345618258602\n-2\n',
+        '-9223372036854775808\n0\n',
+    ]
+
+def test_division_by_zero_only_in_active_lanes() -> None:
+    assert run_batch('{ var a = read_int(); if a != 0 then 10 / a else 0 }', [[0], [5]]) == ['0\n', '2\n']
+    with pytest.raises(ZeroDivisionError):
+        run_batch('10 / read_int()', [[0], [5]])
+
+def test_end_of_input() -> None:
+    with pytest.raises(EOFError):
+        run_batch('{ var a = read_int(); if a > 0 then read_int() else 0 }', [[0], [1]])
@@ -0,0 +1,21 @@
+from compiler import cfg
+from tests import build_string, generate_string
+
+def test_blocks_and_edges() -> None:
+    graph = build_string('fun f(n: Int): Int { var s = 0; while n > 0 do { s = s + n; n = n - 1; } return s; } f(3)', 'f')
+    assert [[str(i) for i in b.instructions] for b in graph.blocks] == [
+        ['LoadIntConst(0, x)', 'Copy(x, x2)'],
+        ['Label(while_start)', 'LoadIntConst(0, x3)', 'Call(>, [n, x3], x4)', 'CondJump(x4, Label(while_body), Label(while_end))'],
+        ['Label(while_body)', 'Call(+, [x2, n], x5)', 'Copy(x5, x2)', 'LoadIntConst(1, x6)', 'Call(-, [n, x6], x7)', 'Copy(x7, n)', 'Jump(Label(while_start))'],
+        ['Label(while_end)', 'Return(x2)'],
+        ['Return(None)'],
+    ]
+    assert [b.successors for b in graph.blocks] == [[1], [2, 3], [1], [], []]
+    assert [b.predecessors for b in graph.blocks] == [[], [0, 2], [1], [1], []]
+    # The unreachable Return after the explicit one is left out, and the loop body comes before its exit
+    assert graph.reverse_postorder() == [0, 1, 2, 3]
+
+def test_round_trip() -> None:
+    source = '{ var x = 1; if x > 0 then { x = 2; } else { return; } while true do { if x == 3 then break; x = x + 1; } x }'
+    instructions = generate_string(source)['main']
+    assert cfg.build_cfg(instructions).instructions() == instructions
@@ -0,0 +1,52 @@
+import pytest
+from compiler import closure_compiler, parser, tokenizer, type_checker
+
+def run_string(s: str) -> object:
+    module = parser.parse(tokenizer.TokenStream(s))
+    type_checker.typecheck_module(module)
+    return closure_compiler.compile_module(module)()
+
+def test_functions_and_loops(capsys: pytest.CaptureFixture[str]) -> None:
+    assert run_string('''
+fun fact(n: Int): Int { if n <= 1 then { return 1; } return n * fact(n - 1); }
+fun fib(n: Int): Int { if n < 2 then return n; return fib(n - 1) + fib(n - 2); }
+fun show(b: Bool): Unit { print_bool(b); }
+var i = 0;
+var s = 0;
+while true do {
+    i = i + 1;
+    if i % 2 == 0 then continue;
+    if i > 20 then break;
+    s = s + i;
+}
+print_int(s);
+print_int(fib(15));
+show(s > 10 and not false);
+{ var x = 1; { var x = 2; print_int(x); } x }
+''') == 1
+    assert capsys.readouterr().out == '100\n610\ntrue\n2\n1\n'
+
+def test_machine_arithmetic(capsys: pytest.CaptureFixture[str]) -> None:
+    run_string('''
+fun fact(n: Int): Int { if n <= 1 then { return 1; } return n * fact(n - 1); }
+print_int(fact(21));
+print_int(9223372036854775807 + 1);
+print_int(-7 / 2); print_int(-7 % 2); print_int(7 % -2);
+''')
+    assert capsys.readouterr().out == '-4249290049419214848\n-9223372036854775808\n-3\n-1\n1\n'
+
+def test_jumps_inside_expressions(capsys: pytest.CaptureFixture[str]) -> None:
+    run_string('{ var i = 0; while i < 10 do { i = i + 1; print_int(i + { if i == 3 then break; 100 }); } i }')
+    assert capsys.readouterr().out == '101\n102\n3\n'
+    run_string('{ var i = 0; while { i = i + 1; if i < 3 then continue; i < 5 } do print_int(i); }')
+    assert capsys.readouterr().out == '3\n4\n'
+    run_string('fun f(x: Int): Int { while true do { x = x + 1; if x > 10 then return x * 2; } return 0; } f(3)')
+    assert capsys.readouterr().out == '22\n'
+    run_string('{ var x = 5; if x > 3 then { return; } print_int(x); }')
+    assert capsys.readouterr().out == ''
+    run_string('fun t(): Bool { return true; } { var a = t() or { print_int(1); false }; t() and { print_int(2); false } }')
+    assert capsys.readouterr().out == '2\nfalse\n'
+
+def test_break_outside_loop() -> None:
+    with pytest.raises(SyntaxError):
+        run_string('{ if true then break; }')
@@ -0,0 +1,83 @@
+from pathlib import Path
+import os
+import threading
+from compiler.compile_cache import CompileCache, cache_key
+
+def test_cache_key() -> None:
+    assert cache_key('1 + 2') == cache_key('1 + 2', {})
+    assert cache_key('1 + 2') != cache_key('1 + 3')
+    assert cache_key('1 + 2', {'a': 1, 'b': 2}) == cache_key('1 + 2', {'b': 2, 'a': 1})
+    assert cache_key('1 + 2', {'a': 1}) != cache_key('1 + 2', {'a': 2})
+
+def test_memory_lru() -> None:
+    cache = CompileCache(max_memory_bytes=10)
+    calls: list[str] = []
+    def compile(key: str) -> bytes:
+        calls.append(key)
+        return key.encode() * 4
+    for key in ['a', 'b', 'a', 'c', 'b']:
+        assert cache.get_or_compile(key, lambda: compile(key)) == key.encode() * 4
+    # 'b' was evicted by 'c' as 'a' had been used more recently
+    assert calls == ['a', 'b', 'c', 'b']
+    assert cache.stats() == {
+        'memory_hits': 1, 'disk_hits': 0, 'misses': 4, 'coalesced': 0, 'evictions': 2, 'disk_evictions': 0,
+        'memory_entries': 2, 'memory_bytes': 8,
+    }
+
+def test_disk_tier_is_shared(tmp_path: Path) -> None:
+    first = CompileCache(str(tmp_path))
+    second = CompileCache(str(tmp_path))
+    assert first.get_or_compile('key', lambda: b'program') == b'program'
+    assert second.get_or_compile('key', lambda: b'other') == b'program'
+    assert second.stats()['disk_hits'] == 1
+    assert second.stats()['misses'] == 0
+
+def test_disk_lru(tmp_path: Path) -> None:
+    cache = CompileCache(str(tmp_path), max_memory_bytes=0, max_disk_bytes=20)
+    def compile(key: str) -> bytes: return key.encode() * 8
+    cache.get_or_compile('a', lambda: compile('a'))
+    cache.get_or_compile('b', lambda: compile('b'))
+    # Entries are ordered by modification time, make sure 'a' is the older one
+    os.utime(tmp_path / 'a', ns=(0, 0))
+    os.utime(tmp_path / 'b', ns=(1, 1))
+    assert cache.get_or_compile('a', lambda: compile('x')) == b'a' * 8
+    cache.get_or_compile('c', lambda: compile('c'))
+    # 'b' was evicted by 'c' as 'a' had been read more recently
+    assert sorted(entry.name for entry in tmp_path.iterdir() if entry.is_file()) == ['a', 'c']
+    assert cache.stats()['disk_evictions'] == 1
+    # Keys share a fixed set of lock files instead of leaving one each behind
+    assert all(len(lock.name) == 2 for lock in (tmp_path / 'locks').iterdir())
+
+def test_concurrent_requests_are_coalesced(tmp_path: Path) -> None:
+    cache = CompileCache(str(tmp_path))
+    release = threading.Event()
+    calls: list[int] = []
+    def compile() -> bytes:
+        calls.append(1)
+        release.wait()
+        return b'program'
+    results: list[bytes] = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compile('key', compile))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    while cache.stats()['coalesced'] < 7:
+        threading.Event().wait(0.01)
+    release.set()
+    for t in threads:
+        t.join()
+    assert calls == [1]
+    assert results == [b'program'] * 8
+
+def test_failures_are_not_cached() -> None:
+    cache = CompileCache()
+    def fail() -> bytes:
+        raise ValueError('syntax error')
+    for _ in range(2):
+        try:
+            cache.get_or_compile('key', fail)
+        except ValueError as e:
+            assert str(e) == 'syntax error'
+        else:
+            raise AssertionError('Compile error was not raised')
+    assert cache.stats()['misses'] == 2
+    assert cache.get_or_compile('key', lambda: b'fixed') == b'fixed'
@@ -0,0 +1,53 @@
+from collections import Counter
+from compiler import constant_folding
+from tests import assert_same_output, run_pass
+
+def fold_string(s: str, function: str = 'main') -> tuple[list[str], Counter[str]]: return run_pass(constant_folding.fold_constants, s, function)
+
+def test_folds_across_blocks() -> None:
+    folded, stats = fold_string('fun f(n: Int): Int { var k = 3 * 4 + 1; if k > 10 then return n * k; return 0; } f(3)', 'f')
+    assert folded == [
+        'Fun(f, [n])',
+        'LoadIntConst(3, x)',
+        'LoadIntConst(4, x2)',
+        'LoadIntConst(12, x3)',
+        'LoadIntConst(1, x4)',
+        'LoadIntConst(13, x5)',
+        'LoadIntConst(13, x6)',
+        'LoadIntConst(10, x7)',
+        'LoadBoolConst(True, x8)',
+        'Jump(Label(then))',
+        'Label(then)',
+        'Call(*, [n, x6], x9)',
+        'Return(x9)',
+        'Label(if_end)',
+        'LoadIntConst(0, x10)',
+        'Return(x10)',
+        'Return(None)',
+    ]
+    assert stats == {'folded': 3, 'propagated': 1, 'branches': 1}
+
+def test_variables_changed_in_loops_are_not_constant() -> None:
+    folded, _ = fold_string('{ var x = 7; while x > 0 do x = x - 1; x }')
+    assert 'Call(>, [x2, x3], x4)' in folded
+    assert 'Call(-, [x2, x5], x6)' in folded
+
+def test_machine_arithmetic() -> None:
+    folded, _ = fold_string('{ print_int(9223372036854775807 + 1); print_int(-7 / 2); print_int(-7 % 2); 1 / 0 }')
+    assert 'LoadIntConst(-9223372036854775808, x3)' in folded
+    assert 'LoadIntConst(-3, x8)' in folded
+    assert 'LoadIntConst(-1, x13)' in folded
+    # Division by zero traps at run time, so it stays
+    assert 'Call(/, [x15, x16], x17)' in folded
+
+def test_same_behaviour() -> None:
+    source = '''
+fun f(n: Int): Int { var k = 3 * 4 + 1; if k > 10 then return n * k; return 0; }
+var t = true;
+var n = 0;
+while t do { n = n + 1; if n == 3 then t = false; }
+print_int(f(n));
+not (2 < 1) and n == 3
+'''
+    _, stats = assert_same_output(source, '39\ntrue\n')
+    assert stats.counts['constant_folding']['folded'] > 0
@@ -0,0 +1,57 @@
+from collections import Counter
+from compiler import copy_propagation, ir
+from tests import Program, assert_same_output, generate_string, run_pass
+
+def propagate_string(s: str, function: str = 'main') -> tuple[list[str], Counter[str]]: return run_pass(copy_propagation.propagate_copies, s, function)
+
+def coalesce_string(s: str, function: str = 'main') -> tuple[list[str], Counter[str]]: return run_pass(copy_propagation.coalesce, s, function)
+
+def test_propagates_through_chains() -> None:
+    result, stats = propagate_string('{ var x = read_int(); var y = x; if y > 0 then print_int(y); x = 5; print_int(y); }')
+    # y is a copy of x, itself a copy of what read_int returned, which nothing writes again
+    assert 'Call(>, [x, x4], x5)' in result
+    assert 'Call(print_int, [x], x6)' in result
+    assert 'Call(print_int, [x], x8)' in result
+    assert stats['propagated'] == 6
+
+def test_copies_on_some_paths_are_not_propagated() -> None:
+    result, _ = propagate_string('{ var a = read_int(); var b = 0; if a > 0 then b = a; print_int(b); }')
+    assert 'Call(print_int, [x4], x7)' in result
+
+def test_coalesces_with_parameters() -> None:
+    result, stats = coalesce_string('fun f(n: Int): Int { var m = n; while m > 0 do m = m - 1; return m; } f(2)', 'f')
+    assert result == [
+        'Fun(f, [n])',
+        'Label(while_start)',
+        'LoadIntConst(0, x2)',
+        'Call(>, [n, x2], x3)',
+        'CondJump(x3, Label(while_body), Label(while_end))',
+        'Label(while_body)',
+        'LoadIntConst(1, x4)',
+        'Call(-, [n, x4], n)',
+        'Jump(Label(while_start))',
+        'Label(while_end)',
+        'Return(n)',
+        'Return(None)',
+    ]
+    assert stats == {'coalesced': 2, 'copies': 2}
+
+def test_interfering_variables_are_kept_apart() -> None:
+    result, _ = coalesce_string('{ var x = read_int(); var y = if x > 0 then x else 0 - x; print_int(y); print_int(x) }')
+    # x is still live where the else branch writes the result, so the then branch has to copy it
+    assert 'Copy(x, x7)' in result
+    assert 'Call(-, [x6, x], x7)' in result
+
+def test_same_behaviour() -> None:
+    source = '''
+fun swap_sum(a: Int, b: Int): Int { var t = a; a = b; b = t; return a * 10 + b; }
+var x = 1;
+var y = x;
+var i = 0;
+while i < 4 do { var z = if i % 2 == 0 then y else x; print_int(swap_sum(z, i)); x = x + 1; i = i + 1; }
+y
+'''
+    optimized, stats = assert_same_output(source, '1\n12\n21\n34\n1\n')
+    def copies(program: Program) -> int: return sum(isinstance(insn, ir.Copy) for insn in program['main'])
+    assert copies(optimized) < copies(generate_string(source))
+    assert stats.counts['coalescing']['copies'] > 0
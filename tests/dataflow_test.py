@@ -0,0 +1,30 @@
+from compiler import dataflow
+from tests import build_string
+
+loop = 'fun f(n: Int): Int { var s = 0; while n > 0 do { s = s + n; n = n - 1; } return s; } f(3)'
+
+def test_liveness() -> None:
+    graph = build_string(loop, 'f')
+    live = dataflow.liveness(graph)
+    assert [[v.name for v in live.vars.to_vars(b)] for b in live.live_in] == [['n'], ['n', 'x2'], ['n', 'x2'], ['x2'], []]
+    assert [[v.name for v in live.vars.to_vars(b)] for b in live.live_out] == [['n', 'x2'], ['n', 'x2'], ['n', 'x2'], [], []]
+    assert [[v.name for v in live.vars.to_vars(b)] for b in live.live_after(2)] == [
+        ['n', 'x2'], ['n', 'x5'], ['n', 'x2'], ['n', 'x2', 'x6'], ['x2', 'x7'], ['n', 'x2'], ['n', 'x2'],
+    ]
+
+def test_reaching_definitions() -> None:
+    graph = build_string(loop, 'f')
+    reach = dataflow.reaching_definitions(graph)
+    def reaching(block: int, var: str) -> list[tuple[int, int]]:
+        return [(d.block, d.index) for d in reach.to_definitions(reach.reach_in[block]) if d.var.name == var]
+    assert reaching(0, 'n') == [(-1, 0)]
+    assert reaching(1, 'n') == [(-1, 0), (2, 5)]
+    assert reaching(1, 'x2') == [(0, 1), (2, 2)]
+    assert reaching(3, 'x2') == [(0, 1), (2, 2)]
+    # Nothing reaches the unreachable block
+    assert reach.reach_in[4] == 0
+
+def test_bits() -> None:
+    assert list(dataflow.bits(0)) == []
+    assert list(dataflow.bits(0b101001)) == [0, 3, 5]
+    assert list(dataflow.bits(1 << 100000 | 2)) == [1, 100000]
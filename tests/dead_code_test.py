@@ -0,0 +1,46 @@
+from collections import Counter
+from functools import partial
+from compiler import dead_code, ir_optimizer
+from tests import assert_same_output, generate_string, run_pass
+
+def eliminate_string(s: str, function: str = 'main') -> tuple[list[str], Counter[str]]: return run_pass(dead_code.eliminate_dead_code, s, function)
+
+def test_code_after_return() -> None:
+    result, stats = eliminate_string('fun f(n: Int): Int { return n; print_int(n); 0 } f(1)', 'f')
+    assert result == ['Fun(f, [n])', 'Return(n)']
+    assert stats['unreachable_blocks'] == 1
+
+def test_dead_instructions_and_empty_branches() -> None:
+    result, stats = eliminate_string('{ var x = 1; if x < 2 then { } else { }; var y = x * 3; var z = 5 / x; print_int(x); }')
+    assert result == [
+        'Fun(main, None)',
+        'LoadIntConst(1, x)',
+        'Copy(x, x2)',
+        # Division traps when dividing by zero, so it stays even though z is never used
+        'LoadIntConst(5, x9)',
+        'Call(/, [x9, x2], x10)',
+        'Call(print_int, [x2], x12)',
+        'Return(None)',
+    ]
+    assert stats['threaded'] == 1
+
+def test_emptied_entry_block() -> None:
+    # Constant folding turns the loop's condition into a Jump, leaving nothing before the loop
+    optimized = ir_optimizer.optimize(generate_string('fun f(): Int { var x = 1; while true do { return 2; } return 0; } f()'))
+    assert [str(insn) for insn in optimized['f']] == ['Fun(f, [])', 'LoadIntConst(2, x4)', 'Return(x4)']
+
+def test_calls_are_kept() -> None:
+    result, _ = eliminate_string('fun f(): Int { print_int(1); 2 } { var a = f(); var b = read_int(); 0 }')
+    assert 'Call(f, [], x)' in result
+    assert 'Call(read_int, [], x3)' in result
+
+def test_same_behaviour() -> None:
+    source = '''
+fun f(n: Int): Int { var unused = n * n; if n > 2 then { return n; print_int(0); } else { } return n + 1; }
+var i = 0;
+while i < 5 do { i = i + 1; if i == 2 then continue; if i == 4 then break; print_int(f(i)); }
+i
+'''
+    optimized, stats = assert_same_output(source, '2\n3\n4\n', partial(ir_optimizer.optimize, enabled=['dead_code']))
+    assert sum(map(len, optimized.values())) < sum(map(len, generate_string(source).values()))
+    assert stats.counts['dead_code']['instructions'] > 0
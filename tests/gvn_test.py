@@ -0,0 +1,43 @@
+from collections import Counter
+from functools import partial
+from compiler import gvn, ir_optimizer
+from tests import assert_same_output, run_pass
+
+def number_string(s: str, function: str = 'main') -> tuple[list[str], Counter[str]]: return run_pass(gvn.number_values, s, function)
+
+def test_redundant_expressions() -> None:
+    result, stats = number_string('fun f(a: Int, b: Int): Int { var x = a * b + 1; var y = b * a + 1; if a > b then return x; if b < a then return y; return x / b + y / b; } f(1, 2)', 'f')
+    assert [insn for insn in result if insn.startswith('Call(*')] == ['Call(*, [a, b], x)']
+    assert [insn for insn in result if insn.startswith('Call(/')] == ['Call(/, [x3, b], x11)']
+    assert 'Call(+, [x11, x11], x13)' in result
+    assert stats == {'redundant': 5, 'copies': 2}
+
+def test_swap_in_loop() -> None:
+    result, _ = number_string('fun f(a: Int, b: Int): Int { var i = 0; while i < 3 do { var t = a; a = b; b = t; i = i + 1; } return a - b; } f(1, 2)', 'f')
+    # The phis for a and b take each other's values, so their copies form a cycle
+    assert 'Copy(a.1, swap.1)' in result
+    assert 'Copy(b.1, a.1)' in result
+    assert 'Copy(swap.1, b.1)' in result
+
+def test_sibling_branches_not_shared() -> None:
+    result, stats = number_string('fun f(a: Int, b: Int): Int { if a < 0 then return a * b; return a * b + 1; } f(1, 2)', 'f')
+    assert len([insn for insn in result if insn.startswith('Call(*')]) == 2
+    assert stats['redundant'] == 0
+
+def test_same_behaviour() -> None:
+    source = '''
+fun f(a: Int, b: Int): Int {
+    var i = 0;
+    var total = 0;
+    while i < 3 do {
+        var t = a; a = b; b = t;
+        if a > b then total = total + a * b else total = total + b * a - a % b;
+        i = i + 1;
+    }
+    return total + a % b;
+}
+print_int(f(3, 5));
+print_int(f(7, 2));
+'''
+    _, stats = assert_same_output(source, '44\n40\n', partial(ir_optimizer.optimize, enabled=['gvn']))
+    assert stats.counts['gvn']['redundant'] > 0
@@ -0,0 +1,50 @@
+from pathlib import Path
+import subprocess
+from compiler.incremental_build import IncrementalBuild
+
+source = '''fun square(n: Int): Int {
+    return n * n;
+}
+fun twice(n: Int): Int {
+    return n + n;
+}
+fun show(n: Int): Unit {
+    if n > 10 then { print_int(n); } else { print_bool(false); }
+}
+show(square(5));
+show(twice(2));
+'''
+
+def run(build: IncrementalBuild, s: str, tmp_path: Path) -> str:
+    path = tmp_path / 'a.out'
+    path.write_bytes(build.compile(s))
+    path.chmod(0o755)
+    return subprocess.run([str(path)], check=True, capture_output=True, text=True).stdout
+
+def test_only_changed_functions_are_rebuilt(tmp_path: Path) -> None:
+    build = IncrementalBuild(str(tmp_path / 'cache'))
+    assert run(build, source, tmp_path) == '25\nfalse\n'
+    assert sorted(build.rebuilt) == ['main', 'show', 'square', 'twice']
+
+    assert run(build, source, tmp_path) == '25\nfalse\n'
+    assert build.rebuilt == []
+
+    # Moving functions around changes their locations but not their code
+    assert run(build, '\n\n' + source.replace('n + n', 'n  +  n'), tmp_path) == '25\nfalse\n'
+    assert build.rebuilt == []
+
+    assert run(build, source.replace('n + n', 'n * 10'), tmp_path) == '25\n20\n'
+    assert build.rebuilt == ['twice']
+
+    assert run(build, source.replace('show(twice(2));', 'show(twice(3) + 1);'), tmp_path) == '25\nfalse\n'
+    assert build.rebuilt == ['main']
+
+def test_signature_change_rebuilds_callers(tmp_path: Path) -> None:
+    build = IncrementalBuild(str(tmp_path / 'cache'))
+    with_caller = source + 'fun call_twice(): Unit { twice(2); }\ncall_twice();\n'
+    run(build, with_caller, tmp_path)
+    # call_twice's code is the same, but the call's result now has a different type
+    changed = with_caller.replace('fun twice(n: Int): Int {\n    return n + n;', 'fun twice(n: Int): Bool {\n    return n > 0;') \
+        .replace('show(twice(2));\n', '')
+    assert run(build, changed, tmp_path) == '25\n'
+    assert sorted(build.rebuilt) == ['call_twice', 'main', 'twice']
@@ -0,0 +1,106 @@
+import random
+from compiler.incremental import Edit, parse_source, reparse
+from compiler.classes import DummyLocation
+import compiler.ast as ast
+
+source = '''fun square(x: Int): Int {
+    return x * x;
+}
+fun sum(n: Int): Int {
+    var s = 0;
+    while n > 0 do { s = s + square(n); n = n - 1; } # comment
+    return s;
+}
+fun print_twice(x: Int): Unit {
+    print_int(x);
+    print_int(x);
+}
+var a = sum(10);
+print_twice(a);
+a + 1
+'''
+
+def locations(module: ast.Module) -> list[tuple[int, int]]:
+    return [(node.location.line, node.location.column) for node in ast.walk(module)
+            if not isinstance(node.location, DummyLocation)]
+
+def apply(text: str, edit: Edit) -> str:
+    return text[:edit.start] + edit.text + text[edit.end:]
+
+def assert_same_as_full_parse(text: str, edit: Edit) -> None:
+    new_text = apply(text, edit)
+    result = reparse(parse_source(text), edit)
+    expected = parse_source(new_text)
+    assert result.tokens.source == new_text
+    assert list(result.tokens) == list(expected.tokens)
+    assert list(result.tokens.line_starts) == list(expected.tokens.line_starts)
+    assert result.module == expected.module
+    assert locations(result.module) == locations(expected.module)
+    assert result.module.location == expected.module.location
+    assert result.def_spans == expected.def_spans
+
+def test_edit_inside_definition() -> None:
+    start = source.index('s + square(n)')
+    edit = Edit(start, start + 1, 'square(s)\n      ')
+    prev = parse_source(source)
+    square, sum, print_twice = prev.module.defs
+    result = reparse(prev, edit)
+    assert result.module.defs[0] is square
+    assert result.module.defs[1] is not sum
+    assert result.module.defs[2] is print_twice
+    assert_same_as_full_parse(source, edit)
+
+def test_add_and_remove_definitions() -> None:
+    start = source.index('fun sum')
+    add = Edit(start, start, 'fun one(): Int { 1 }\n')
+    assert_same_as_full_parse(source, add)
+    prev = parse_source(source)
+    result = reparse(prev, add)
+    assert [d.name for d in result.module.defs] == ['square', 'one', 'sum', 'print_twice']
+    assert result.module.defs[3] is prev.module.defs[2]
+
+    end = source.index('fun print_twice')
+    assert_same_as_full_parse(source, Edit(start, end, ''))
+
+def test_edit_main_expression() -> None:
+    start = source.index('sum(10)')
+    assert_same_as_full_parse(source, Edit(start, start + 7, 'square(3) * 2'))
+    assert_same_as_full_parse(source, Edit(len(source), len(source), ' + 2'))
+
+def test_edit_splitting_tokens() -> None:
+    start = source.index('x * x')
+    assert_same_as_full_parse(source, Edit(start + 3, start + 3, '-'))
+    start = source.index('sum(10)')
+    assert_same_as_full_parse(source, Edit(start + 3, start + 3, '_all'))
+    start = source.index('- 1;')
+    assert_same_as_full_parse(source, Edit(start, start, '# ignored\n'))
+    assert_same_as_full_parse(source, Edit(0, 0, '\n\n'))
+
+def test_invalid_edit() -> None:
+    start = source.index('return x')
+    try:
+        reparse(parse_source(source), Edit(start, start + 6, '}'))
+    except Exception:
+        return
+    raise AssertionError('Reparsing an invalid edit did not fail')
+
+def test_random_edits() -> None:
+    rng = random.Random(1)
+    pieces = ['', ' ', '\n', 'x', '1', ';', 'fun g(): Int { 2 }\n', '# note\n', '+ 3']
+    checked = 0
+    text = source
+    parsed = parse_source(text)
+    while checked < 200:
+        start = rng.randrange(len(text) + 1)
+        edit = Edit(start, min(len(text), start + rng.randrange(4)), rng.choice(pieces))
+        new_text = apply(text, edit)
+        try:
+            expected = parse_source(new_text)
+        except Exception:
+            continue
+        result = reparse(parsed, edit)
+        assert result.module == expected.module
+        assert locations(result.module) == locations(expected.module)
+        assert result.module.location == expected.module.location
+        text, parsed = new_text, result
+        checked += 1
@@ -0,0 +1,79 @@
+import pytest
+from compiler import batch_interpreter, closure_compiler, ir, ir_interpreter, parser, tokenizer, transpiler, type_checker
+from tests import generate_string
+
+def test_deep_nesting() -> None:
+    n = 100000
+    assert [str(i) for i in generate_string('{ var x = 1; ' + '{' * n + 'x = x + 1' + '}' * n + '}')['main']] == [
+        'Fun(main, None)',
+        'LoadIntConst(1, x)',
+        'Copy(x, x2)',
+        'LoadIntConst(1, x3)',
+        'Call(+, [x2, x3], x4)',
+        'Copy(x4, x2)',
+        'Call(print_int, [x2], unit)',
+        'Return(None)',
+    ]
+    assert [str(i) for i in generate_string('(' * n + 'true' + ')' * n)['main']] == [
+        'Fun(main, None)',
+        'LoadBoolConst(True, x)',
+        'Call(print_bool, [x], unit)',
+        'Return(None)',
+    ]
+
+def test_temporaries_avoid_function_names() -> None:
+    ir = generate_string('fun x(): Int { return 1; } fun x2(): Int { return x() + 2; } x2()')
+    assert [str(i) for i in ir['x2']] == [
+        'Fun(x2, [])',
+        'Call(x, [], x3)',
+        'LoadIntConst(2, x4)',
+        'Call(+, [x3, x4], x5)',
+        'Return(x5)',
+        'Return(None)',
+    ]
+    assert [str(i) for i in ir['main']] == [
+        'Fun(main, None)',
+        'Call(x2, [], x3)',
+        'Call(print_int, [x3], unit)',
+        'Return(None)',
+    ]
+
+def test_operands_are_read_in_order() -> None:
+    assert [str(i) for i in generate_string('{ var x = 3; x - (x = 10) }')['main']] == [
+        'Fun(main, None)',
+        'LoadIntConst(3, x)',
+        'Copy(x, x2)',
+        'Copy(x2, x4)',
+        'LoadIntConst(10, x3)',
+        'Copy(x3, x2)',
+        'Call(-, [x4, x2], x5)',
+        'Call(print_int, [x5], unit)',
+        'Return(None)',
+    ]
+
+def test_evaluation_order_in_every_engine(capsys: pytest.CaptureFixture[str]) -> None:
+    source = '''
+fun f(a: Int, b: Int): Int { return a * 10 + b; }
+var x = 3;
+print_int(x - (x = 10));
+print_int(f(x, { x = 2; x }));
+print_int({ x } * { x = x + 1; x });
+print_bool(x == 4 or { x = 4; false });
+'''
+    expected = '-7\n102\n6\nfalse\n'
+    ir_interpreter.run_program(generate_string(source))
+    assert capsys.readouterr().out == expected
+    module = parser.parse(tokenizer.TokenStream(source))
+    type_checker.typecheck_module(module)
+    closure_compiler.compile_module(module)()
+    assert capsys.readouterr().out == expected
+    transpiler.compile_module(module)()
+    assert capsys.readouterr().out == expected
+    assert batch_interpreter.run_batch(module, [[]]) == [expected]
+
+def test_name_supply() -> None:
+    names = ir.NameSupply({'x2', 'unit'}, frozenset({'x4'}))
+    assert [names.fresh('x') for _ in range(4)] == ['x', 'x3', 'x5', 'x6']
+    assert [names.fresh('x1') for _ in range(3)] == ['x1', 'x12', 'x13']
+    assert [names.fresh('x') for _ in range(8)] == ['x7', 'x8', 'x9', 'x10', 'x11', 'x14', 'x15', 'x16']
+    assert names.fresh('unit') == 'unit2'
@@ -1,5 +1,6 @@
+from compiler import parser
 from compiler.parser import parse
-from compiler.tokenizer import tokenize
+from compiler.tokenizer import tokenize, iter_tokens, TokenStream
 import compiler.ast as ast
 from compiler.ast import *
 from compiler.types import *
@@ -413,4 +414,92 @@ def test_optional_semicolons() -> None:
     assert_parse_fail("{ if true then { a } b c }")
     parse_string("{ if true then { a } b; c}")
     parse_string("{ if true then { a } else { b } c }")
-    parse_string("{ { f(a) } { b } }")
\ No newline at end of file
+    parse_string("{ { f(a) } { b } }")
+
+def test_parse_token_iterator() -> None:
+    source = 'fun f(a: Int): Int { return a * 2; } var x = f(3); while x > 0 do { x = x - 1 } x'
+    assert parse(iter_tokens(source)) == parse_string(source)
+    assert parse(iter_tokens(source.encode())) == parse_string(source)
+    assert_parse_fail('')
+
+def test_parse_token_stream() -> None:
+    source = 'fun f(a: Int): Int {\n  return a * 2;\n}\nvar x = f(3);\nwhile x > 0 do { x = x - 1 }\nx'
+    module = parse(TokenStream(source, 'file'))
+    assert module == parse_string(source)
+    assert module.defs[0].location == Location('file', 1, 5)
+    assert isinstance(module.expr, Block)
+    assert module.expr.exprs[1].location == Location('file', 5, 1)
+    assert_parse_fail('')
+    try:
+        parse(TokenStream('{ 1 2 }', 'file'))
+    except ValueError as e:
+        assert 'line=1, column=5' in str(e)
+    else:
+        raise AssertionError("Parsing didn't fail with input { 1 2 }")
+
+def test_parallel_parse() -> None:
+    funs = [f'fun f{i}(a: Int): Int {{\n  return a * {i};\n}}' for i in range(20)]
+    source = '\n'.join(funs[:10]) + ' ' + '\n'.join(funs[10:]) + '\nvar x = f1(3);\nx'
+    tokens = TokenStream(source, 'file')
+    parser.parallel_workers = 2
+    try:
+        module = parse(tokens, parallel_threshold=0)
+        serial = parse(tokens, parallel_threshold=len(tokens) + 1)
+        assert module == serial
+        locations = [node.location for node in ast.walk(module)]
+        serial_locations = [node.location for node in ast.walk(serial)]
+        assert [(l.line, l.column) for l in locations] == [(l.line, l.column) for l in serial_locations]
+        assert (module.location.line, module.location.column) == (serial.location.line, serial.location.column)
+
+        # Errors are reported by the serial parser
+        try:
+            parse(TokenStream(source.replace('return a * 15', 'return a *'), 'file'), parallel_threshold=0)
+        except TypeError as e:
+            assert 'line=46, column=13' in str(e)
+        else:
+            raise AssertionError("Parsing didn't fail")
+    finally:
+        parser.parallel_workers = None
+
+def test_mixed_precedence_chains() -> None:
+    assert parse_string("a < b * c < d").expr == BinaryOp(
+        BinaryOp(
+            Identifier('a'),
+            '<',
+            BinaryOp(Identifier('b'), '*', Identifier('c'))
+        ),
+        '<',
+        Identifier('d')
+    )
+
+    n = 10000
+    module = parse(TokenStream(' + '.join(f'a * b{i}' for i in range(n))))
+    node = module.expr
+    for i in reversed(range(1, n)):
+        assert isinstance(node, BinaryOp) and node.op == '+'
+        assert node.right == BinaryOp(Identifier('a'), '*', Identifier(f'b{i}'))
+        node = node.left
+    assert node == BinaryOp(Identifier('a'), '*', Identifier('b0'))
+
+def test_deep_nesting() -> None:
+    n = 100000
+    node = parse(TokenStream('{' * n + 'x' + '}' * n)).expr
+    for _ in range(n - 1):
+        assert isinstance(node, Block) and node.exprs == []
+        node = node.res
+    assert node == Block([], Identifier('x'))
+
+    node = parse(TokenStream('not ' * n + '(' * n + 'true' + ')' * n)).expr
+    for _ in range(n):
+        assert isinstance(node, UnaryOp) and node.op == 'unary_not'
+        node = node.param
+    for _ in range(n):
+        assert isinstance(node, UnaryOp) and node.op == '()'
+        node = node.param
+    assert node == Literal(True)
+
+    node = parse(TokenStream('x = ' * n + '1')).expr
+    for _ in range(n):
+        assert isinstance(node, BinaryOp) and node.op == '=' and node.left == Identifier('x')
+        node = node.right
+    assert node == Literal(1)
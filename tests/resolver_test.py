@@ -0,0 +1,60 @@
+from compiler import ast, parser, resolver, tokenizer
+from compiler.builtins import builtin_function_types
+
+def resolved(s: str) -> ast.Module:
+    module = parser.parse(tokenizer.TokenStream(s))
+    resolver.resolve_module(module)
+    return module
+
+def addresses(node: ast.Node) -> list[tuple[str, int, int]]:
+    return [(n.name, n.depth, n.slot) for n in ast.walk(node) if isinstance(n, ast.Identifier)]
+
+def assert_resolve_fail(s: str) -> None:
+    try:
+        resolved(s)
+    except ValueError:
+        return
+    raise AssertionError(f"Resolving didn't fail with input {s}")
+
+def test_scopes() -> None:
+    module = resolved('{ var x = 1; var y = x; { var x = x; y = x } x }')
+    assert addresses(module) == [
+        ('x', 1, 0),
+        ('y', 1, 1), ('x', 1, 0),
+        ('x', 2, 0), ('x', 1, 0), ('y', 1, 1), ('x', 2, 0),
+        ('x', 1, 0),
+    ]
+    assert module.scope_size == len(builtin_function_types)
+    assert isinstance(module.expr, ast.Block)
+    assert module.expr.scope_size == 2
+
+def test_functions() -> None:
+    n = len(builtin_function_types)
+    module = resolved('''
+fun f(a: Int, b: Int): Int { var c = a; return g(c + b); }
+fun g(a: Int): Int { return print_int(a); }
+var a = f(1, 2)
+''')
+    assert addresses(module.defs[0]) == [('a', 1, 0), ('b', 1, 1), ('c', 1, 2), ('a', 1, 0), ('g', 0, n + 1), ('c', 1, 2), ('b', 1, 1)]
+    assert module.defs[0].scope_size == 3
+    assert addresses(module.defs[1])[1] == ('print_int', 0, list(builtin_function_types).index('print_int'))
+    assert module.expr is not None
+    assert addresses(module.expr) == [('a', 0, n + 2), ('f', 0, n)]
+    assert module.scope_size == n + 3
+    assert resolver.global_names(module)[n:] == ['f', 'g']
+
+def test_errors() -> None:
+    assert_resolve_fail('x')
+    assert_resolve_fail('{ var x = x; }')
+    assert_resolve_fail('{ x = 1; }')
+    assert_resolve_fail('{ var x = 1; var x = 2; }')
+    assert_resolve_fail('{ { var x = 1; } x }')
+    assert_resolve_fail('fun f(a: Int): Unit { var a = 1; } 1')
+    assert_resolve_fail('fun f(): Unit { } fun f(): Unit { } 1')
+    assert_resolve_fail('fun print_int(): Unit { } 1')
+    assert_resolve_fail('fun f(): Unit { g() } 1')
+
+def test_deep_nesting() -> None:
+    n = 100000
+    module = resolved('{ var x = 1; ' + '{' * n + 'x' + '}' * n + '}')
+    assert addresses(module)[-1] == ('x', 1, 0)
@@ -0,0 +1,42 @@
+from collections import Counter
+from functools import partial
+from compiler import constant_folding, ir_optimizer, sccp
+from tests import assert_same_output, generate_string, run_pass
+
+def propagate_string(s: str, function: str = 'main') -> tuple[list[str], Counter[str]]: return run_pass(sccp.propagate_constants, s, function)
+
+loop = '{ var x = 1; var i = 0; var n = read_int(); while i < n do { if x != 1 then x = 2; i = i + 1; } print_int(x * 10); }'
+
+def test_constants_through_loops() -> None:
+    result, stats = propagate_string(loop)
+    assert 'LoadIntConst(10, x14)' in result
+    assert 'Call(print_int, [x14], x15)' in result
+    # The assignment x = 2 is never reached
+    assert 'LoadIntConst(2, x10)' not in result
+    assert stats == {'constants': 6, 'branches': 1, 'unreachable_blocks': 1}
+
+def test_more_than_constant_folding() -> None:
+    folded = [str(i) for i in constant_folding.fold_constants(generate_string(loop)['main'], Counter())]
+    assert 'Call(*, [x2, x13], x14)' in folded
+
+def test_traps_are_left_to_run_time() -> None:
+    result, _ = propagate_string('{ var z = 0; if read_int() > 0 then z = 0; print_int(10 / z); }')
+    # z is 0 on both paths, but the division is kept to trap
+    assert 'LoadIntConst(0, x2.2)' in result
+    assert 'Call(/, [x7, x2.2], x8)' in result
+
+def test_same_behaviour() -> None:
+    source = '''
+fun sign(n: Int): Int { var flag = false; if flag then return 0; if n < 0 then return -1; return 1; }
+var limit = 3;
+var i = 0;
+var total = 0;
+while i < 6 do {
+    if limit < 3 then { total = total + 100; limit = 0; }
+    total = total + sign(i - limit);
+    i = i + 1;
+}
+print_int(total);
+'''
+    _, stats = assert_same_output(source, '0\n', partial(ir_optimizer.optimize, enabled=['sccp']))
+    assert stats.counts['sccp']['branches'] >= 2
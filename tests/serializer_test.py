@@ -0,0 +1,103 @@
+from dataclasses import fields
+import random
+import struct
+from pathlib import Path
+from compiler import ast, parser, tokenizer, type_checker, serializer
+from compiler.classes import Location, DummyLocation
+from compiler.types import *
+
+source = '''fun fact(n: Int): Int {
+    if n <= 1 then { return 1; }
+    return n * fact(n - 1);
+}
+fun show(b: Bool): Unit {
+    print_bool(not b);
+    return;
+}
+var x: Int = 123456789012345678901234567890 % 7;
+var done = false;
+while not done do {
+    x = x - 1;
+    if x < 0 then break else if x == 3 then { continue; }
+    done = x == -fact(3);
+}
+show(done);
+{ }
+'''
+
+def typed_module(s: str) -> ast.Module:
+    module = parser.parse(tokenizer.TokenStream(s, 'file.src'))
+    type_checker.typecheck_module(module)
+    return module
+
+def assert_same_tree(a: ast.Module, b: ast.Module) -> None:
+    # Compared node by node, as == recurses
+    for x, y in zip(ast.walk(a), ast.walk(b), strict=True):
+        assert type(x) is type(y)
+        for f in fields(x):
+            value = getattr(x, f.name)
+            if not isinstance(value, (ast.Node, list, Location, Type)):
+                assert value == getattr(y, f.name)
+        assert x.type is y.type
+        if isinstance(x.location, DummyLocation):
+            assert isinstance(y.location, DummyLocation)
+        else:
+            assert (x.location.file, x.location.line, x.location.column) == \
+                (y.location.file, y.location.line, y.location.column)
+
+def test_round_trip() -> None:
+    module = typed_module(source)
+    loaded = serializer.deserialize_module(serializer.serialize_module(module))
+    assert loaded == module
+    assert_same_tree(module, loaded)
+    assert loaded.defs[0].type is FnType([Int()], Int())
+    assert loaded.type is Unit()
+
+def test_read_from_file(tmp_path: Path) -> None:
+    module = typed_module(source)
+    path = str(tmp_path / 'module.ast')
+    serializer.write_module(module, path)
+    assert_same_tree(module, serializer.read_module(path))
+
+def test_deep_nesting() -> None:
+    n = 10000
+    module = typed_module('{' * n + 'not ' * n + '(' * n + 'true' + ')' * n + '}' * n)
+    assert_same_tree(module, serializer.deserialize_module(serializer.serialize_module(module)))
+
+def test_rejects_other_data() -> None:
+    data = bytearray(serializer.serialize_module(typed_module('1')))
+    corrupt_inputs: list[bytes | bytearray] = [data[:10], data[:-8], b'XXXX' + data[4:], data[:4] + b'\xff' + data[5:]]
+    for corrupt in corrupt_inputs:
+        try:
+            serializer.deserialize_module(corrupt)
+        except ValueError:
+            continue
+        raise AssertionError('Corrupt data was loaded')
+
+def test_rejects_unknown_kinds() -> None:
+    data = serializer.serialize_module(typed_module('1'))
+    _, _, n_strings, blob_length, _, _, _ = serializer._header.unpack_from(data)
+    first_type = serializer._header.size + 8 * (n_strings + 1) + blob_length
+    last_node = len(data) - 8 * 6 # The Module, with its three fields
+    for position in [first_type, last_node]:
+        for code in [-1, 99]:
+            try:
+                serializer.deserialize_module(data[:position] + struct.pack('<q', code) + data[position + 8:])
+            except ValueError:
+                continue
+            raise AssertionError('A module with an unknown kind was loaded')
+
+def test_corrupt_bytes_raise_value_error() -> None:
+    data = serializer.serialize_module(typed_module(source))
+    rng = random.Random(0)
+    rejected = 0
+    for _ in range(500):
+        corrupt = bytearray(data)
+        for _ in range(rng.randint(1, 3)):
+            corrupt[rng.randrange(len(corrupt))] = rng.randrange(256)
+        try:
+            serializer.deserialize_module(corrupt)
+        except ValueError:
+            rejected += 1
+    # Some bytes, like those of line numbers, can change without making the module malformed
+    assert rejected > 250
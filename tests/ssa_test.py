@@ -0,0 +1,104 @@
+from compiler import cfg, dataflow, ssa
+from tests import assert_same_output, generate_string
+
+source = 'fun f(n: Int): Int { var x = 0; if n > 0 then x = 1 else x = 2; while x < 10 do x = x + n; return x; } f(1)'
+
+def test_dominators() -> None:
+    graph = cfg.build_cfg(generate_string(source)['f'])
+    # Blocks: entry, then, else, if_end, while_start, while_body, while_end, and the unreachable Return(None)
+    tree = ssa.dominator_tree(graph)
+    assert tree.idom == [-1, 0, 0, 0, 3, 4, 4, -1]
+    assert tree.children == [[1, 2, 3], [], [], [4], [5, 6], [], [], []]
+    assert tree.preorder() == [0, 1, 2, 3, 4, 5, 6]
+    assert tree.dominates(3, 5) and not tree.dominates(1, 3)
+    assert ssa.dominance_frontiers(graph, tree) == [set(), {3}, {3}, set(), {4}, {4}, set(), set()]
+
+def test_phis_where_definitions_join() -> None:
+    form = ssa.to_ssa(generate_string(source)['f'])
+    assert [[str(phi) for phi in phis] for phis in form.phis] == [
+        [],
+        [],
+        [],
+        ['Phi(x2.3, {1: x2.1, 2: x2.2})'],
+        ['Phi(x2.4, {3: x2.3, 5: x2.5})'],
+        [],
+        [],
+    ]
+    # The result of the if isn't used, so it gets no phi
+    assert [str(insn) for insn in form.cfg.blocks[5].instructions] == [
+        'Label(while_body)',
+        'Call(+, [x2.4, n], x10)',
+        'Copy(x10, x2.5)',
+        'Jump(Label(while_start))',
+    ]
+    written = [phi.dest for phis in form.phis for phi in phis]
+    written += [var for insn in form.cfg.instructions() if (var := dataflow.written(insn)) is not None]
+    assert len(written) == len(set(written))
+
+def test_phis_become_copies() -> None:
+    result = [str(insn) for insn in ssa.from_ssa(ssa.to_ssa(generate_string(source)['f']))]
+    assert result == [
+        'Fun(f, [n])',
+        'LoadIntConst(0, x)',
+        'Copy(x, x2)',
+        'LoadIntConst(0, x3)',
+        'Call(>, [n, x3], x4)',
+        'CondJump(x4, Label(then), Label(else))',
+        'Label(then)',
+        'LoadIntConst(1, x6)',
+        'Copy(x6, x2.1)',
+        'Copy(x2.1, x5)',
+        'Copy(x2.1, x2.3)',
+        'Jump(Label(if_end))',
+        'Label(else)',
+        'LoadIntConst(2, x7)',
+        'Copy(x7, x2.2)',
+        'Copy(x2.2, x5.1)',
+        'Copy(x2.2, x2.3)',
+        'Label(if_end)',
+        'Copy(x2.3, x2.4)',
+        'Label(while_start)',
+        'LoadIntConst(10, x8)',
+        'Call(<, [x2.4, x8], x9)',
+        'CondJump(x9, Label(while_body), Label(while_end))',
+        'Label(while_body)',
+        'Call(+, [x2.4, n], x10)',
+        'Copy(x10, x2.5)',
+        'Copy(x2.5, x2.4)',
+        'Jump(Label(while_start))',
+        'Label(while_end)',
+        'Return(x2.4)',
+    ]
+
+def test_critical_edges_are_split() -> None:
+    # The CondJump skipping the then branch leads to where x's definitions join
+    result = [str(insn) for insn in ssa.from_ssa(ssa.to_ssa(generate_string('fun f(n: Int): Int { var x = 0; if n > 0 then x = 1; return x; } f(9)')['f']))]
+    assert result[5:] == [
+        'CondJump(x4, Label(then), Label(edge))',
+        'Label(then)',
+        'LoadIntConst(1, x5)',
+        'Copy(x5, x2.1)',
+        'Copy(x2.1, x2.2)',
+        'Label(if_end)',
+        'Return(x2.2)',
+        'Label(edge)',
+        'Copy(x2, x2.2)',
+        'Jump(Label(if_end))',
+    ]
+
+def test_same_behaviour() -> None:
+    source = '''
+fun collatz(n: Int): Int {
+    var steps = 0;
+    while true do {
+        if n == 1 then break;
+        if n % 2 == 0 then n = n / 2 else n = 3 * n + 1;
+        steps = steps + 1;
+    }
+    return steps;
+}
+var i = 1;
+while i < 8 do { print_int(collatz(i)); i = i + 1; }
+'''
+    assert_same_output(source, '0\n1\n7\n2\n5\n8\n16\n',
+                       lambda program, _: {name: ssa.from_ssa(ssa.to_ssa(instructions)) for name, instructions in program.items()})
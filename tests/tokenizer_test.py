@@ -1,4 +1,6 @@
-from compiler.tokenizer import tokenize
+import io
+from compiler import tokenizer
+from compiler.tokenizer import tokenize, iter_tokens, TokenStream
 from compiler.classes import *
 
 def test_tokenizer_basics() -> None:
@@ -40,4 +42,69 @@ def test_tokenizer_basics() -> None:
         Token('1', 'int_literal', L),
         Token('false', 'bool_literal', L),
     ]
-    return
\ No newline at end of file
+    return
+
+def test_tokenizer_locations() -> None:
+    tokens = tokenize("a = 1;\n  # comment\r\n\tb  // another\nc", 'file')
+    assert [(t.text, t.location.file, t.location.line, t.location.column) for t in tokens] == [
+        ('a', 'file', 1, 1),
+        ('=', 'file', 1, 3),
+        ('1', 'file', 1, 5),
+        (';', 'file', 1, 6),
+        ('b', 'file', 3, 2),
+        ('c', 'file', 4, 1),
+    ]
+
+
+def test_tokenizer_comment_after_token() -> None:
+    L = DummyLocation()
+    assert tokenize("x// comment\ny#comment") == [
+        Token('x', 'identifier', L),
+        Token('y', 'identifier', L),
+    ]
+
+
+def test_tokenizer_unidentified_character() -> None:
+    try:
+        tokenize("a $ b")
+    except ValueError:
+        return
+    raise AssertionError("Tokenizing didn't fail with an unidentified character")
+
+
+def test_tokenizer_question_mark_is_not_punctuation() -> None:
+    try:
+        tokenize("1 ? 2")
+    except ValueError:
+        return
+    raise AssertionError("Tokenizing didn't fail with a question mark")
+
+
+def test_iter_tokens_sources() -> None:
+    source = "var x = 1 <= 2;\r\n# ä comment €\nwhile x != false do { x = 123 }\n"
+    expected = tokenize(source, 'file')
+    def coordinates(tokens: list[Token]) -> list[tuple[str, str, int, int]]:
+        return [(t.text, t.type, t.location.line, t.location.column) for t in tokens]
+
+    old_chunk_size = tokenizer.chunk_size
+    try:
+        # Tiny chunks split tokens, comments, line breaks and multi-byte characters between reads
+        for size in [1, 2, 3, 5, 1 << 16]:
+            tokenizer.chunk_size = size
+            sources: list[tokenizer.TokenSource] = [source, source.encode(), memoryview(source.encode()), io.StringIO(source), io.BytesIO(source.encode())]
+            for src in sources:
+                assert coordinates(list(iter_tokens(src, 'file'))) == coordinates(expected)
+    finally:
+        tokenizer.chunk_size = old_chunk_size
+
+
+def test_token_stream() -> None:
+    source = "fun f(x: Int): Bool {\r\n  x >= 10 // big\n}\n\nf(true)"
+    stream = TokenStream(source, 'file')
+    assert len(stream) == len(tokenize(source))
+    assert list(stream) == tokenize(source, 'file')
+    assert [(t.location.line, t.location.column) for t in stream] == \
+        [(t.location.line, t.location.column) for t in tokenize(source, 'file')]
+    assert stream.text(11) == '>='
+    assert stream.type(11) == 'operator'
+    assert stream.location(11) == Location('file', 2, 5)
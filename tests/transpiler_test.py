@@ -0,0 +1,69 @@
+import pytest
+from compiler import parser, tokenizer, transpiler, type_checker
+
+def run_string(s: str) -> object:
+    module = parser.parse(tokenizer.TokenStream(s))
+    type_checker.typecheck_module(module)
+    return transpiler.compile_module(module)()
+
+def test_functions_and_loops(capsys: pytest.CaptureFixture[str]) -> None:
+    assert run_string('''
+fun fact(n: Int): Int { if n <= 1 then { return 1; } return n * fact(n - 1); }
+fun fib(n: Int): Int { if n < 2 then return n; return fib(n - 1) + fib(n - 2); }
+fun show(b: Bool): Unit { print_bool(b); }
+var i = 0;
+var s = 0;
+while true do {
+    i = i + 1;
+    if i % 2 == 0 then continue;
+    if i > 20 then break;
+    s = s + i;
+}
+print_int(s);
+print_int(fib(15));
+show(s > 10 and not false);
+{ var x = 1; { var x = 2; print_int(x); } x }
+''') == 1
+    assert capsys.readouterr().out == '100\n610\ntrue\n2\n1\n'
+
+def test_machine_arithmetic(capsys: pytest.CaptureFixture[str]) -> None:
+    run_string('''
+fun fact(n: Int): Int { if n <= 1 then { return 1; } return n * fact(n - 1); }
+print_int(fact(21));
+print_int(9223372036854775807 + 1);
+print_int(-7 / 2); print_int(-7 % 2); print_int(7 % -2);
+''')
+    assert capsys.readouterr().out == '-4249290049419214848\n-9223372036854775808\n-3\n-1\n1\n'
+
+def test_jumps_inside_expressions(capsys: pytest.CaptureFixture[str]) -> None:
+    run_string('{ var i = 0; while i < 10 do { i = i + 1; print_int(i + { if i == 3 then break; 100 }); } i }')
+    assert capsys.readouterr().out == '101\n102\n3\n'
+    run_string('{ var i = 0; while { i = i + 1; if i < 3 then continue; i < 5 } do print_int(i); }')
+    assert capsys.readouterr().out == '3\n4\n'
+    run_string('{ var x = 5; if x > 3 then { return; } print_int(x); }')
+    assert capsys.readouterr().out == ''
+    run_string('fun t(): Bool { return true; } { var a = t() or { print_int(1); false }; t() and { print_int(2); false } }')
+    assert capsys.readouterr().out == '2\nfalse\n'
+
+def test_evaluation_order(capsys: pytest.CaptureFixture[str]) -> None:
+    assert run_string('{ var x = 1; x + { x = 10; x } }') == 11
+    assert run_string('fun f(a: Int, b: Int): Int { return a * 10 + b; } { var x = 1; f(x, { x = 2; x }) }') == 12
+    assert run_string('fun lambda(pass: Int): Int { var class = pass; return class; } lambda(3)') == 3
+
+def test_main_result_evaluated_once(capsys: pytest.CaptureFixture[str]) -> None:
+    assert run_string('fun f(): Int { print_int(1); return 2; } f()') == 2
+    assert capsys.readouterr().out == '1\n2\n'
+
+def test_code_cache(capsys: pytest.CaptureFixture[str]) -> None:
+    source = '{ var x = 123456; x * x }'
+    run_string(source)
+    hits = transpiler.cache_stats['hits']
+    run_string(source)
+    assert transpiler.cache_stats['hits'] == hits + 1
+
+def test_too_deeply_nested_for_python(capsys: pytest.CaptureFixture[str]) -> None:
+    assert run_string('{ ' + 'while false do ' * 30 + '{}; 5 }') == 5
+
+def test_break_outside_loop() -> None:
+    with pytest.raises(SyntaxError):
+        run_string('{ if true then break; }')
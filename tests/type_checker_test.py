@@ -1,4 +1,4 @@
-from compiler import tokenizer, parser, type_checker
+from compiler import ast, tokenizer, parser, type_checker
 from compiler.types import *
 
 def check_string(s: str) -> Type: return type_checker.typecheck_module(parser.parse(tokenizer.tokenize(s)))
@@ -32,4 +32,42 @@ def test_type_checking() -> None:
 }
     ''') == Unit()
     
-test_type_checking()
\ No newline at end of file
+test_type_checking()
+
+def test_deep_nesting() -> None:
+    n = 100000
+    assert check_string('{' * n + 'print_int(1); 1 < 2' + '}' * n) == Bool()
+    assert check_string('not ' * n + '(' * n + 'true' + ')' * n) == Bool()
+    assert_parse_fail('-' * n + 'true')
+
+def test_unresolved_identifiers() -> None:
+    module = parser.parse(tokenizer.tokenize('{ var x = 1; x }'))
+    assert module.expr is not None
+    try:
+        type_checker.typecheck(module.expr, [type_checker.new_scope(module.scope_size)])
+    except AssertionError:
+        return
+    raise AssertionError("Type checking didn't fail on an unresolved module")
+
+def test_parallel_type_checking() -> None:
+    funs = [f'fun f{i}(a: Int): Int {{\n  var b = a < {i};\n  if b then {{ return f{i + 1}(a); }}\n  return a * {i};\n}}' for i in range(20)]
+    source = '\n'.join(funs) + '\nfun f20(a: Int): Int { return a; }\nvar x = f1(3) == 3;\nx'
+    type_checker.parallel_workers = 2
+    try:
+        module = parser.parse(tokenizer.TokenStream(source))
+        serial = parser.parse(tokenizer.TokenStream(source))
+        assert type_checker.typecheck_module(module, parallel_threshold=0) == Bool()
+        assert type_checker.typecheck_module(serial, parallel_threshold=len(serial.defs) + 1) == Bool()
+        assert [node.type for node in ast.walk(module)] == [node.type for node in ast.walk(serial)]
+
+        # The first error in the module is reported, whichever worker finds it first
+        bad = source.replace('return a * 15', 'return a == 15').replace('return a * 3', 'return true').replace('x\n', 'x + 1')
+        errors = []
+        for threshold in [0, 100]:
+            try:
+                type_checker.typecheck_module(parser.parse(tokenizer.TokenStream(bad)), parallel_threshold=threshold)
+            except TypeError as e:
+                errors.append(str(e))
+        assert len(errors) == 2 and errors[0] == errors[1] and 'line=19' in errors[0]
+    finally:
+        type_checker.parallel_workers = None
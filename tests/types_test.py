@@ -0,0 +1,21 @@
+import copy
+import pickle
+from compiler.types import *
+
+def test_types_are_interned() -> None:
+    assert Int() is Int()
+    assert Int() is not Bool()
+    assert FnType([Int(), Bool()], Unit()) is FnType((Int(), Bool()), Unit())
+    assert FnType([Int()], Int()) is not FnType([Int()], Bool())
+    assert FnType([FnType([], Int())], Unit()).params[0] is FnType([], Int())
+
+def test_types_are_hashable() -> None:
+    names = {Int(): 'Int', FnType([Int()], Unit()): 'print_int'}
+    assert names[FnType([Int()], Unit())] == 'print_int'
+    assert len({Int(), Int(), Bool()}) == 2
+
+def test_copies_are_interned() -> None:
+    t = FnType([Int(), FnType([Bool()], Unit())], Int())
+    assert pickle.loads(pickle.dumps(t)) is t
+    assert copy.deepcopy(t) is t
+    assert copy.copy(Unit()) is Unit()